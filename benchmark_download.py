@@ -0,0 +1,130 @@
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import requests
+
+from core.downloader import Downloader
+
+# 默认测试文件大小（MB）
+DEFAULT_SIZE = 200
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """支持 Range 请求的本地文件服务"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', f'"{int(os.path.getmtime(path))}"')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(1024 * 1024, remaining))
+                if not data:
+                    break
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                remaining -= len(data)
+
+
+def legacy_download(url, save_path):
+    """原来 DownloadThread 的实现：单连接、8 KB 分块、每块 fsync 并回调进度"""
+    events = 0
+    response = requests.get(url, stream=True)
+    response.raise_for_status()
+    total_size = int(response.headers.get('content-length', 0))
+    downloaded = 0
+    with open(save_path, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=8192):
+            if chunk:
+                f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+                downloaded += len(chunk)
+                if total_size:
+                    events += 1
+    return events
+
+
+def new_download(url, save_path, connections, buffer_size):
+    """使用 core.downloader"""
+    counter = {'events': 0}
+
+    def progress(downloaded, total_size):
+        counter['events'] += 1
+
+    downloader = Downloader(connections=connections, buffer_size=buffer_size,
+                            download_dir=os.path.dirname(save_path))
+    downloader.download(url, save_path, progress=progress)
+    return counter['events']
+
+
+def run(name, func, size):
+    start = time.monotonic()
+    events = func()
+    elapsed = time.monotonic() - start
+    print(f"{name:<12} {elapsed:6.2f}s  {size / elapsed / (1024 * 1024):8.1f} MB/s  进度事件 {events}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比原下载方式与 core.downloader 的吞吐量")
+    parser.add_argument('--size', type=int, default=DEFAULT_SIZE, help="测试文件大小（MB）")
+    parser.add_argument('--connections', type=int, default=4, help="并发连接数")
+    parser.add_argument('--buffer', type=int, default=1024, help="写入缓冲区大小（KB）")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='idroidsim-bench-')
+    try:
+        serve_dir = os.path.join(work_dir, 'serve')
+        os.makedirs(serve_dir)
+        size = args.size * 1024 * 1024
+        with open(os.path.join(serve_dir, 'archive.zip'), 'wb') as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+
+        handler = lambda *a, **kw: RangeRequestHandler(*a, directory=serve_dir, **kw)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/archive.zip'
+
+        print(f"文件大小 {args.size} MB，连接数 {args.connections}，缓冲区 {args.buffer} KB")
+        run('legacy', lambda: legacy_download(url, os.path.join(work_dir, 'legacy.zip')), size)
+        run('downloader', lambda: new_download(url, os.path.join(work_dir, 'new.zip'),
+                                               args.connections, args.buffer * 1024), size)
+        server.shutdown()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+import os
+import io
+import stat
+import shutil
+import struct
+import bisect
+import zipfile
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.downloader import downloader as default_downloader, DownloadCancelled
+from core.package_cache import package_cache
+
+# 读取 zip 尾部时请求的字节数，需要包含目录结束记录和最长 64 KB 的注释
+TAIL_SIZE = 128 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_FORMAT = '<4s4H2LH'
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_LOCATOR_FORMAT = '<4sLQL'
+ZIP64_EOCD_FORMAT = '<4sQ2H2L4Q'
+
+
+def central_directory_offset(tail, tail_start):
+    """从文件尾部数据中找到中央目录的起始位置
+
+    返回 (中央目录偏移, 需要的尾部起始偏移)，找不到目录结束记录时返回 None。
+    """
+    index = tail.rfind(EOCD_SIGNATURE)
+    if index < 0 or len(tail) - index < struct.calcsize(EOCD_FORMAT):
+        return None
+    record = struct.unpack(EOCD_FORMAT, tail[index:index + struct.calcsize(EOCD_FORMAT)])
+    directory_offset = record[6]
+    if directory_offset != 0xFFFFFFFF:
+        return directory_offset, directory_offset
+
+    # ZIP64 格式的目录位置记录在 ZIP64 结束记录中
+    locator_index = index - struct.calcsize(ZIP64_LOCATOR_FORMAT)
+    if locator_index < 0:
+        return None
+    locator = struct.unpack(ZIP64_LOCATOR_FORMAT, tail[locator_index:index])
+    if locator[0] != ZIP64_LOCATOR_SIGNATURE:
+        return None
+    record_index = locator[2] - tail_start
+    if record_index < 0:
+        # ZIP64 结束记录不在已读取的尾部中，需要从该位置开始读取
+        return None, locator[2]
+    record = struct.unpack(ZIP64_EOCD_FORMAT, tail[record_index:record_index + struct.calcsize(ZIP64_EOCD_FORMAT)])
+    return record[9], min(record[9], locator[2])
+
+
+class PartialFile(io.RawIOBase):
+    """下载中的 zip 文件视图
+
+    尾部（中央目录）已提前读取到内存中，其余部分从正在下载的文件中读取。
+    下载完成后 .part 文件会被重命名，所以第一次读取文件时依次尝试给出的路径。
+    """
+
+    def __init__(self, paths, size, tail, tail_start):
+        super().__init__()
+        self.paths = paths
+        self.size = size
+        self.tail = tail
+        self.tail_start = tail_start
+        self.position = 0
+        self.f = None
+
+    def _file(self):
+        if self.f is None:
+            for path in self.paths:
+                try:
+                    self.f = open(path, 'rb')
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
+                raise FileNotFoundError(self.paths[0])
+        return self.f
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.size - self.position)
+        if size <= 0:
+            return 0
+        if self.position >= self.tail_start:
+            start = self.position - self.tail_start
+            data = self.tail[start:start + size]
+        else:
+            size = min(size, self.tail_start - self.position)
+            f = self._file()
+            f.seek(self.position)
+            data = f.read(size)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+        super().close()
+
+
+def member_target(dest, name, strip_components=0):
+    """计算 zip 成员的解压路径，去掉前几级目录并防止路径穿越"""
+    parts = [part for part in name.replace('\\', '/').split('/') if part and part != '.']
+    if '..' in parts:
+        raise Exception(f"压缩包中包含不安全的路径: {name}")
+    parts = parts[strip_components:]
+    if not parts:
+        return None
+    return os.path.join(dest, *parts)
+
+
+def is_inside(root, path):
+    """path 解析符号链接后是否仍在 root 目录中"""
+    root = os.path.realpath(root)
+    path = os.path.realpath(path)
+    return path == root or path.startswith(root + os.sep)
+
+
+def extract_member(archive, info, dest, strip_components=0):
+    """解压单个成员，保留可执行权限和符号链接
+
+    压缩包可能来自局域网节点，符号链接只能指向 dest 内部，
+    写入前检查所在目录解析符号链接后仍在 dest 中，防止通过链接写到外面。
+    """
+    target = member_target(dest, info.filename, strip_components)
+    if target is None:
+        return
+    mode = info.external_attr >> 16
+    if not is_inside(dest, target if info.is_dir() else os.path.dirname(target)):
+        raise Exception(f"压缩包中包含不安全的路径: {info.filename}")
+    if info.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if stat.S_ISLNK(mode):
+        link = archive.read(info).decode('utf-8')
+        resolved = os.path.normpath(os.path.join(os.path.dirname(target), link))
+        if os.path.isabs(link) or not is_inside(dest, resolved):
+            raise Exception(f"压缩包中包含不安全的符号链接: {info.filename} -> {link}")
+        if os.path.lexists(target):
+            os.remove(target)
+        os.symlink(link, target)
+        return
+
+    # 已经存在的同名符号链接先删除，不跟随链接写入
+    if os.path.islink(target):
+        os.remove(target)
+    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_NOFOLLOW', 0), 0o644)
+    with archive.open(info) as source, os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(source, f, COPY_BUFFER_SIZE)
+    if stat.S_IMODE(mode):
+        os.chmod(target, stat.S_IMODE(mode))
+
+
+def replace_directory(staging, dest):
+    """用解压好的目录替换目标目录
+
+    先把旧目录移开再把新目录移入，两次 rename 之间目标目录不会处于解压了一半的状态。
+    """
+    backup = None
+    if os.path.lexists(dest):
+        backup = tempfile.mkdtemp(prefix=f'.{os.path.basename(dest)}.old.', dir=os.path.dirname(dest))
+        os.rmdir(backup)
+        os.rename(dest, backup)
+    try:
+        os.rename(staging, dest)
+    except OSError:
+        if backup:
+            os.rename(backup, dest)
+        raise
+    if backup:
+        shutil.rmtree(backup, ignore_errors=True)
+
+
+class ZipPipeline:
+    """边下载边解压 zip
+
+    下载前先用 Range 读取文件尾部的中央目录，之后每当某个成员所在的字节区间
+    全部写入文件，就交给线程池解压到临时目录。下载和校验完成后解压剩余的成员，
+    再把临时目录整体替换到目标位置。服务器不支持 Range 时在下载完成后并行解压。
+    """
+
+    def __init__(self, dest, strip_components=0, max_workers=None, downloader=None):
+        self.dest = dest
+        self.strip_components = strip_components
+        self.downloader = downloader or default_downloader
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        self.staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(dest)}.', dir=os.path.dirname(dest))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, (os.cpu_count() or 2) + 2))
+        self._lock = threading.Lock()
+        self._written = []  # 已写入的区间 [start, end)，按 start 排序且互不重叠
+        self._pending = []  # (start, end, 成员名) 尚未提交解压的成员
+        self._futures = {}  # 成员名 -> Future
+        self._paths = None
+        self._size = 0
+        self._tail = None
+        self._tail_start = 0
+
+    def prepare(self, url, save_path):
+        """读取中央目录，返回 True 表示可以边下载边解压"""
+        self._paths = [f'{save_path}.part', save_path]
+        try:
+            tail, tail_start, size = self._fetch_tail(url, TAIL_SIZE)
+            if tail is None:
+                return False
+            located = central_directory_offset(tail, tail_start)
+            if located and (located[0] is None or located[1] < tail_start):
+                tail, tail_start, size = self._fetch_tail(url, size - located[1])
+                located = central_directory_offset(tail, tail_start)
+            if not located or located[0] is None:
+                return False
+
+            self._size = size
+            self._tail = tail
+            self._tail_start = tail_start
+            directory_offset = located[0]
+            with zipfile.ZipFile(self._open()) as archive:
+                infos = sorted(archive.infolist(), key=lambda info: info.header_offset)
+            for index, info in enumerate(infos):
+                end = infos[index + 1].header_offset if index + 1 < len(infos) else directory_offset
+                self._pending.append((info.header_offset, end, info.filename))
+            return True
+        except Exception as e:
+            print(f"读取压缩包目录失败，下载完成后再解压: {str(e)}")
+            self._tail = None
+            self._pending = []
+            return False
+
+    def _fetch_tail(self, url, length):
+        """读取文件最后 length 个字节，服务器不支持 Range 时返回 (None, 0, 0)"""
+        headers = {'Range': f'bytes=-{length}'}
+        with self.downloader.session.get(url, headers=headers, timeout=self.downloader.timeout) as response:
+            response.raise_for_status()
+            content_range = response.headers.get('Content-Range', '')
+            if response.status_code != 206 or '/' not in content_range:
+                return None, 0, 0
+            size = int(content_range.rsplit('/', 1)[1])
+            return response.content, size - len(response.content), size
+
+    def _open(self):
+        return PartialFile(self._paths, self._size, self._tail, self._tail_start)
+
+    def on_written(self, offset, size):
+        """下载器写入数据后调用，解压已经完整的成员"""
+        if not self._pending:
+            return
+        with self._lock:
+            self._add_written(offset, offset + size)
+            ready, pending = [], []
+            for member in self._pending:
+                (ready if self._covered(member[0], member[1]) else pending).append(member)
+            self._pending = pending
+            for _, _, name in ready:
+                self._futures[name] = self.executor.submit(self._extract_partial, name)
+
+    def _add_written(self, start, end):
+        index = bisect.bisect_left(self._written, [start, end])
+        self._written.insert(index, [start, end])
+        merged = []
+        for interval in self._written:
+            if merged and interval[0] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], interval[1])
+            else:
+                merged.append(interval)
+        self._written = merged
+
+    def _covered(self, start, end):
+        if end >= self._tail_start:
+            end = max(start, self._tail_start)
+        if start >= end:
+            return True
+        index = bisect.bisect_right(self._written, [start, float('inf')]) - 1
+        return index >= 0 and self._written[index][0] <= start and self._written[index][1] >= end
+
+    def _extract_partial(self, name):
+        with zipfile.ZipFile(self._open()) as archive:
+            extract_member(archive, archive.getinfo(name), self.staging, self.strip_components)
+
+    def finish(self, archive_path, before_replace=None):
+        """下载和校验完成后解压剩余成员并替换到目标位置
+
+        下载过程中解压失败的成员（例如数据损坏后被重新下载）会从完整的文件中重新解压。
+        before_replace(临时目录) 在替换前调用，可用来写入额外的文件。
+        """
+        with self._lock:
+            futures = dict(self._futures)
+            self._pending = []
+        retry = set()
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"重新解压 {name}: {str(e)}")
+                retry.add(name)
+
+        thread_local = threading.local()
+        archives = []
+
+        def extract(name):
+            # 每个线程使用自己的 ZipFile，避免共享文件位置
+            if not hasattr(thread_local, 'archive'):
+                thread_local.archive = zipfile.ZipFile(archive_path)
+                archives.append(thread_local.archive)
+            archive = thread_local.archive
+            extract_member(archive, archive.getinfo(name), self.staging, self.strip_components)
+
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                names = [info.filename for info in archive.infolist()
+                         if info.filename not in futures or info.filename in retry]
+            for future in [self.executor.submit(extract, name) for name in names]:
+                future.result()
+        finally:
+            self.executor.shutdown(wait=True)
+            for archive in archives:
+                archive.close()
+
+        if before_replace:
+            before_replace(self.staging)
+        replace_directory(self.staging, self.dest)
+        return self.dest
+
+    def abort(self):
+        """取消或失败时清理临时目录"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+def extract_archive(archive_path, dest, strip_components=0, before_replace=None, max_workers=None):
+    """把已经下载好的 zip 并行解压到 dest，返回 dest"""
+    pipeline = ZipPipeline(dest, strip_components, max_workers)
+    try:
+        return pipeline.finish(archive_path, before_replace)
+    except Exception:
+        pipeline.abort()
+        raise
+
+
+def download_and_extract(url, dest, strip_components=0, progress=None, cancelled=None,
+                         checksum=None, checksum_type='sha1', size=None, downloader=None, keep_archive=False,
+                         before_replace=None, throttle=None, cache=None):
+    """下载 zip 并解压到 dest，返回 dest
+
+    给出校验值时先查安装包缓存：本地已有则直接解压，局域网节点有则从节点下载，
+    都失败时再从 url 下载。校验通过的压缩包会加入缓存。
+    """
+    downloader = downloader or default_downloader
+    cache = cache or package_cache
+    cached = cache.lookup(checksum, checksum_type)
+    if cached:
+        extract_archive(cached, dest, strip_components, before_replace)
+        if progress:
+            progress(os.path.getsize(cached), os.path.getsize(cached))
+        return dest
+
+    sources = cache.sources(url, checksum, checksum_type)
+    for index, source in enumerate(sources):
+        save_path = downloader.default_path(source)
+        pipeline = ZipPipeline(dest, strip_components, downloader=downloader)
+        try:
+            overlapped = pipeline.prepare(source, save_path)
+            downloader.download(source, save_path, progress=progress, cancelled=cancelled,
+                                checksum=checksum, checksum_type=checksum_type, size=size,
+                                on_written=pipeline.on_written if overlapped else None, throttle=throttle)
+            pipeline.finish(save_path, before_replace)
+            break
+        except DownloadCancelled:
+            pipeline.abort()
+            raise
+        except Exception as e:
+            pipeline.abort()
+            if index == len(sources) - 1:
+                raise
+            print(f"从 {source} 下载失败，改用下一个地址: {str(e)}")
+
+    cache.store(save_path, checksum, checksum_type)
+    if not keep_archive:
+        os.remove(save_path)
+    return dest
@@ -0,0 +1,160 @@
+import os
+import re
+import shutil
+import tempfile
+
+from utils import ANDROID_HOME, AVD_HOME, find_emulator_home
+from core.avd_inventory import read_ini
+from core.device_index import device_index
+
+# 创建模拟器时统一使用的硬件配置
+DEFAULT_HARDWARE = {
+    'hw.keyboard': 'yes',  # 启用物理键盘
+    'disk.dataPartition.size': '2048M',  # 设置数据分区大小
+    'hw.gpu.enabled': 'yes',  # 启用 GPU 加速
+    'hw.gpu.mode': 'auto',
+    'hw.audioInput': 'yes',  # 启用音频输入
+    'hw.audioOutput': 'yes',  # 启用音频输出
+    'hw.camera.back': 'webcam0',  # 配置后置摄像头
+    'hw.camera.front': 'webcam0',  # 配置前置摄像头
+}
+
+# ABI 对应的 hw.cpu.arch
+CPU_ARCH = {
+    'arm64-v8a': 'arm64',
+    'armeabi-v7a': 'arm',
+    'armeabi': 'arm',
+    'x86': 'x86',
+    'x86_64': 'x86_64',
+}
+
+AVD_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9._-]+$')
+
+
+def validate_avd_name(name, avd_home=AVD_HOME):
+    """检查模拟器名称是否合法且未被使用"""
+    if not AVD_NAME_PATTERN.match(name):
+        raise Exception("模拟器名称只能包含字母、数字、点、下划线和横线")
+    if os.path.exists(os.path.join(avd_home, f'{name}.ini')) or \
+            os.path.exists(os.path.join(avd_home, f'{name}.avd')):
+        raise Exception(f"模拟器 {name} 已存在")
+
+
+def write_ini(path, values):
+    """按 key 排序写入 ini 文件，先写临时文件再替换"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for key in sorted(values):
+            f.write(f'{key}={values[key]}\n')
+    os.replace(tmp_path, path)
+
+
+def update_config_ini(path, values):
+    """合并配置项并一次写回，已有的 key 会被覆盖而不是重复追加"""
+    config = read_ini(path) if os.path.exists(path) else {}
+    config.update(values)
+    write_ini(path, config)
+
+
+class AvdBuilder:
+    """直接生成 AVD 文件的创建器
+
+    根据系统镜像的 source.properties 和设备定义生成 <name>.ini 与 config.ini，
+    不再启动 avdmanager。.avd 目录先在临时目录中完成再重命名，
+    最后写入 <name>.ini，其他组件不会看到创建了一半的模拟器。
+    """
+
+    def __init__(self, sdk_root=ANDROID_HOME, avd_home=AVD_HOME):
+        self.sdk_root = sdk_root
+        self.avd_home = avd_home
+
+    def image_dir(self, system_image):
+        """系统镜像 ID 对应的目录，如 system-images;android-34;google_apis;arm64-v8a"""
+        return os.path.join(self.sdk_root, *system_image.split(';'))
+
+    def build_config(self, name, system_image, device_id, hardware=None):
+        """生成 config.ini 的内容"""
+        parts = system_image.split(';')
+        if len(parts) != 4 or parts[0] != 'system-images':
+            raise Exception(f"无效的系统镜像: {system_image}")
+        image_dir = self.image_dir(system_image)
+        if not os.path.isdir(image_dir):
+            raise Exception(f"系统镜像未安装: {system_image}")
+        properties_path = os.path.join(image_dir, 'source.properties')
+        properties = read_ini(properties_path) if os.path.exists(properties_path) else {}
+
+        abi = properties.get('SystemImage.Abi', parts[3])
+        tag_id = properties.get('SystemImage.TagId', parts[2])
+        config = {
+            'AvdId': name,
+            'avd.ini.displayname': name.replace('_', ' '),
+            'avd.ini.encoding': 'UTF-8',
+            'abi.type': abi,
+            'hw.cpu.arch': CPU_ARCH.get(abi, abi),
+            'image.sysdir.1': '/'.join(parts) + '/',
+            'tag.id': tag_id,
+            'tag.display': properties.get('SystemImage.TagDisplay', tag_id),
+            'PlayStore.enabled': 'true' if 'playstore' in tag_id else 'false',
+            'hw.sdCard': 'no',
+            'showDeviceFrame': 'no',
+            'skin.dynamic': 'yes',
+            'skin.path': '_no_skin',
+        }
+        if properties.get('SystemImage.TagIds'):
+            config['tag.ids'] = properties['SystemImage.TagIds']
+            config['tag.displaynames'] = properties.get('SystemImage.TagDisplayNames', '')
+
+        device = device_index.get(device_id)
+        if device is None:
+            raise Exception(f"找不到设备定义: {device_id}")
+        config['hw.device.name'] = device['id']
+        config['hw.device.manufacturer'] = device['manufacturer']
+        if device['width'] and device['height']:
+            config['hw.lcd.width'] = str(device['width'])
+            config['hw.lcd.height'] = str(device['height'])
+            config['skin.name'] = f"{device['width']}x{device['height']}"
+        if device['density']:
+            config['hw.lcd.density'] = str(device['density'])
+        if device['ram']:
+            config['hw.ramSize'] = str(device['ram'])
+
+        config.update(DEFAULT_HARDWARE)
+        config.update(hardware or {})
+        return config, properties
+
+    def create(self, name, system_image, device_id, hardware=None):
+        """创建模拟器，返回 .avd 目录路径"""
+        validate_avd_name(name, self.avd_home)
+        config, properties = self.build_config(name, system_image, device_id, hardware)
+
+        os.makedirs(self.avd_home, exist_ok=True)
+        avd_dir = os.path.join(self.avd_home, f'{name}.avd')
+        tmp_dir = tempfile.mkdtemp(prefix=f'.{name}.avd.', dir=self.avd_home)
+        try:
+            os.chmod(tmp_dir, 0o755)
+            write_ini(os.path.join(tmp_dir, 'config.ini'), config)
+            os.rename(tmp_dir, avd_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        api_level = properties.get('AndroidVersion.ApiLevel') or system_image.split(';')[1].replace('android-', '')
+        ini = {
+            'avd.ini.encoding': 'UTF-8',
+            'path': avd_dir,
+            'target': f'android-{api_level}',
+        }
+        # 与 avdmanager 一致：AVD 目录在 .android 中时写入相对路径，自定义的 AVD 目录不写
+        emulator_home = os.path.abspath(find_emulator_home())
+        if os.path.commonpath([emulator_home, os.path.abspath(avd_dir)]) == emulator_home:
+            ini['path.rel'] = os.path.relpath(avd_dir, emulator_home).replace(os.sep, '/')
+        try:
+            write_ini(os.path.join(self.avd_home, f'{name}.ini'), ini)
+        except Exception:
+            shutil.rmtree(avd_dir, ignore_errors=True)
+            raise
+        return avd_dir
+
+
+# 全局共享的 AVD 创建器
+avd_builder = AvdBuilder()
@@ -0,0 +1,161 @@
+import os
+import threading
+
+from utils import AVD_HOME, find_emulator_home
+
+
+def read_ini(path):
+    """读取 AVD 使用的 key=value 格式配置文件"""
+    values = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            values[key.strip()] = value.strip()
+    return values
+
+
+def parse_size_mb(value):
+    """把 '2048'、'2048M'、'2G'、'6442450944' 之类的大小解析为 MB"""
+    if not value:
+        return None
+    value = value.strip().upper().rstrip('B')
+    units = {'K': 1 / 1024, 'M': 1, 'G': 1024, 'T': 1024 * 1024}
+    try:
+        if value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        number = int(value)
+    except (ValueError, IndexError):
+        return None
+    # 不带单位时，较大的数值是字节数（如 disk.dataPartition.size）
+    return number // (1024 * 1024) if number >= 1024 * 1024 else number
+
+
+def _api_level(target, sysdir):
+    """从 target 或 image.sysdir.1 中提取 API 级别"""
+    for value in (target, sysdir):
+        for part in (value or '').replace('\\', '/').split('/'):
+            if part.startswith('android-'):
+                return part[len('android-'):]
+    return None
+
+
+class AvdInventory:
+    """直接读取 AVD 目录的模拟器清单
+
+    解析 <name>.ini 和 <name>.avd/config.ini，不再启动 `emulator -list-avds`。
+    目录和配置文件的 mtime 未变化时直接返回缓存结果。
+    """
+
+    def __init__(self, avd_home=AVD_HOME):
+        self.avd_home = avd_home
+        self._lock = threading.Lock()
+        self._dir_mtime = None
+        self._entries = {}  # 名称 -> (mtime 键, 模拟器信息)
+
+    def list_avds(self):
+        """返回按名称排序的模拟器信息列表"""
+        with self._lock:
+            self._refresh()
+            return [info for _, info in sorted(self._entries.values(), key=lambda e: e[1]['name'])]
+
+    def names(self):
+        """返回按名称排序的模拟器名称列表"""
+        return [info['name'] for info in self.list_avds()]
+
+    def get(self, name):
+        """返回指定模拟器的信息，不存在时返回 None"""
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(name)
+            return entry[1] if entry else None
+
+    def _refresh(self):
+        try:
+            dir_mtime = os.stat(self.avd_home).st_mtime_ns
+        except OSError:
+            self._dir_mtime = None
+            self._entries = {}
+            return
+
+        if dir_mtime != self._dir_mtime:
+            # 目录内容有增删，重新列出 .ini 文件
+            names = [entry[:-4] for entry in os.listdir(self.avd_home) if entry.endswith('.ini')]
+            self._entries = {name: self._entries.get(name) for name in names}
+            self._dir_mtime = dir_mtime
+
+        for name, entry in list(self._entries.items()):
+            key = self._mtime_key(name, entry)
+            if entry is None or entry[0] != key:
+                info = self._load(name)
+                if info is None:
+                    del self._entries[name]
+                else:
+                    self._entries[name] = (self._mtime_key(name, (None, info)), info)
+
+    def _mtime_key(self, name, entry):
+        """配置文件的 mtime，用于判断缓存是否失效"""
+        paths = [os.path.join(self.avd_home, f'{name}.ini')]
+        if entry is not None:
+            paths.append(os.path.join(entry[1]['path'], 'config.ini'))
+        key = []
+        for path in paths:
+            try:
+                key.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                key.append(None)
+        return tuple(key)
+
+    def _resolve_path(self, name, ini):
+        """按 path、path.rel 和默认位置的顺序确定 .avd 目录
+
+        path.rel 与 avdmanager 和 avd_builder 写入时一致，相对于 .android 目录。
+        """
+        candidates = [ini.get('path')]
+        if ini.get('path.rel'):
+            candidates.append(os.path.join(find_emulator_home(), ini['path.rel']))
+        candidates.append(os.path.join(self.avd_home, f'{name}.avd'))
+        for path in candidates:
+            if path and os.path.isdir(path):
+                return path
+        return candidates[-1]
+
+    def _load(self, name):
+        """解析单个模拟器的配置"""
+        try:
+            ini = read_ini(os.path.join(self.avd_home, f'{name}.ini'))
+        except OSError:
+            return None
+
+        path = self._resolve_path(name, ini)
+        try:
+            config = read_ini(os.path.join(path, 'config.ini'))
+        except OSError:
+            config = {}
+
+        sysdir = config.get('image.sysdir.1', '')
+        try:
+            cores = int(config.get('hw.cpu.ncore', ''))
+        except ValueError:
+            cores = None
+
+        return {
+            'name': name,
+            'display_name': config.get('avd.ini.displayname', name),
+            'path': path,
+            'target': ini.get('target', ''),
+            'api_level': _api_level(ini.get('target'), sysdir),
+            'image': sysdir.rstrip('/\\'),
+            'tag': config.get('tag.id', ''),
+            'abi': config.get('abi.type', ''),
+            'device': config.get('hw.device.name', ''),
+            'ram': parse_size_mb(config.get('hw.ramSize')),
+            'cores': cores,
+            'disk_size': parse_size_mb(config.get('disk.dataPartition.size')),
+        }
+
+
+# 全局共享的模拟器清单
+avd_inventory = AvdInventory()
@@ -0,0 +1,129 @@
+import os
+
+from PyQt6.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+
+from core.process_index import process_index
+from core.emulator_supervisor import emulator_supervisor
+
+
+class AvdMonitor(QObject):
+    """模拟器状态监视器
+
+    监听 AVD 目录（新增/删除 .ini 与 .avd 目录）和每个 .avd 目录中的 *.lock 文件，
+    以及监管器报告的模拟器启动和退出，状态变化时发出细粒度事件，不再依赖定时刷新。
+    Qt 在 Linux 上使用 inotify，在 macOS 上使用 kqueue/FSEvents 实现文件监听。
+    """
+    CREATED = 'created'
+    STARTED = 'started'
+    BOOTED = 'booted'
+    STOPPED = 'stopped'
+    DELETED = 'deleted'
+
+    state_changed = pyqtSignal(str, str)  # 发送 (模拟器名称, 事件)
+
+    # 合并短时间内的多次文件变化
+    SCAN_DELAY = 50
+    # lock 文件与进程状态不一致时的重试间隔和次数
+    RETRY_DELAY = 250
+    MAX_RETRIES = 20
+
+    def __init__(self, avd_home, parent=None, supervisor=None):
+        super().__init__(parent)
+        self.avd_home = avd_home
+        self.supervisor = supervisor or emulator_supervisor
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_scan)
+
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.timeout.connect(self.scan)
+        self._retries = 0
+
+        self.supervisor.started.connect(self.handle_started)
+        self.supervisor.exited.connect(self.handle_exited)
+
+        self.avds = set()  # 已知的模拟器
+        self.running = set()  # 运行中的模拟器
+
+    def start(self):
+        """开始监听，接管已经在运行的模拟器，并以当前状态作为初始快照"""
+        os.makedirs(self.avd_home, exist_ok=True)
+        self.avds = self._list_avds()
+        self.supervisor.adopt_running()
+        self.running = self.supervisor.running() & self.avds
+        self._update_watch_paths()
+
+    def handle_started(self, name):
+        """监管器启动或接管了模拟器，立即报告"""
+        if name in self.avds and name not in self.running:
+            self.running.add(name)
+            self.state_changed.emit(name, self.STARTED)
+
+    def handle_exited(self, name, returncode):
+        """监管器回收了模拟器进程，立即报告"""
+        if name in self.running:
+            self.running.discard(name)
+            self.state_changed.emit(name, self.STOPPED)
+        self.schedule_scan()
+
+    def report_booted(self, name):
+        """报告模拟器已完成开机"""
+        if name in self.running:
+            self.state_changed.emit(name, self.BOOTED)
+
+    def schedule_scan(self, *args):
+        """延迟扫描，合并连续的变化通知"""
+        self._retries = 0
+        self.scan_timer.start(self.SCAN_DELAY)
+
+    def scan(self):
+        """扫描当前状态并发送差异事件"""
+        avds = self._list_avds()
+        # 在本应用之外启动的模拟器交给监管器等待退出
+        self.supervisor.adopt_running(process_index.refresh())
+        running = self.supervisor.running() & avds
+
+        for name in sorted(avds - self.avds):
+            self.state_changed.emit(name, self.CREATED)
+        for name in sorted(self.running - running):
+            self.state_changed.emit(name, self.STOPPED)
+        for name in sorted(running - self.running):
+            self.state_changed.emit(name, self.STARTED)
+        for name in sorted(self.avds - avds):
+            self.state_changed.emit(name, self.DELETED)
+
+        self.avds = avds
+        self.running = running
+        self._update_watch_paths()
+
+        # 进程启动/退出与 lock 文件的创建/删除不同步，状态不一致时稍后再检查
+        if self._retries < self.MAX_RETRIES and any(
+                self._has_lock(name) != (name in running) for name in avds):
+            self._retries += 1
+            self.scan_timer.start(self.RETRY_DELAY)
+
+    def _list_avds(self):
+        """列出 AVD 目录中的模拟器名称"""
+        try:
+            return {entry[:-4] for entry in os.listdir(self.avd_home) if entry.endswith('.ini')}
+        except OSError:
+            return set()
+
+    def _avd_dir(self, name):
+        return os.path.join(self.avd_home, f'{name}.avd')
+
+    def _has_lock(self, name):
+        try:
+            return any(entry.endswith('.lock') for entry in os.listdir(self._avd_dir(name)))
+        except OSError:
+            return False
+
+    def _update_watch_paths(self):
+        """同步监听路径: AVD 目录和每个 .avd 目录"""
+        paths = {self.avd_home}
+        paths.update(path for path in map(self._avd_dir, self.avds) if os.path.isdir(path))
+        current = set(self.watcher.directories())
+        if current - paths:
+            self.watcher.removePaths(list(current - paths))
+        if paths - current:
+            self.watcher.addPaths(list(paths - current))
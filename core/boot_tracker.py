@@ -0,0 +1,219 @@
+import re
+import time
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+from utils import ADB_PATH, sdk_tools
+from core.emulator_supervisor import emulator_supervisor
+
+# 开机阶段，按顺序依次到达
+PROCESS = 'process'  # 模拟器进程已启动
+DEVICE_ONLINE = 'device_online'  # adb 中设备状态为 device
+BOOT_COMPLETED = 'boot_completed'  # sys.boot_completed=1
+LAUNCHER_IDLE = 'launcher_idle'  # 开机动画结束，桌面已获得焦点
+STAGES = (PROCESS, DEVICE_ONLINE, BOOT_COMPLETED, LAUNCHER_IDLE)
+STAGE_NAMES = {
+    PROCESS: "进程启动",
+    DEVICE_ONLINE: "设备上线",
+    BOOT_COMPLETED: "系统启动",
+    LAUNCHER_IDLE: "桌面就绪",
+}
+
+# 轮询间隔（秒）：进入新阶段后从最短间隔开始，每次未变化时乘以 BACKOFF，不超过最长间隔
+MIN_INTERVAL = 0.25
+MAX_INTERVAL = 4
+BACKOFF = 1.5
+# 单次 adb 命令的超时（秒）
+ADB_TIMEOUT = 10
+# 每个模拟器保留的开机记录数
+HISTORY_SIZE = 20
+
+FOCUS_PATTERN = re.compile(r'mCurrentFocus=(.*)')
+
+
+class BootRecord:
+    """一次开机的阶段和耗时"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stage = PROCESS
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self.timings = {PROCESS: 0.0}  # 阶段 -> 从进程启动到该阶段的秒数
+        self.error = None
+        self.future = Future()  # 开机完成时结果为本记录，失败时为异常
+        self.stopped = threading.Event()
+
+    @property
+    def booted(self):
+        return self.stage == LAUNCHER_IDLE
+
+    @property
+    def elapsed(self):
+        return self.timings.get(LAUNCHER_IDLE, time.monotonic() - self._start)
+
+    def advance(self, stage):
+        self.stage = stage
+        self.timings[stage] = round(time.monotonic() - self._start, 2)
+
+    def summary(self):
+        return "，".join(f"{STAGE_NAMES[stage]} {self.timings[stage]:.1f}s"
+                        for stage in STAGES[1:] if stage in self.timings)
+
+
+class BootTracker(QObject):
+    """模拟器开机进度跟踪
+
+    监管器报告模拟器启动后，在后台线程中通过 adb 依次检查设备上线、
+    sys.boot_completed 和桌面就绪，每个阶段的到达时间都会记录下来。
+    轮询间隔随等待时间增加，开机初期不会频繁调用 adb。
+    界面通过 booted 信号异步获取结果，自动化脚本可以调用 wait_until_booted 阻塞等待，
+    或用 boot_future 得到 Future（asyncio 中可配合 asyncio.wrap_future 使用）。
+    """
+    stage_changed = pyqtSignal(str, str)  # 模拟器名称, 阶段
+    booted = pyqtSignal(str)  # 模拟器名称
+
+    def __init__(self, supervisor=None, adb_path=None):
+        super().__init__()
+        self.supervisor = supervisor or emulator_supervisor
+        self._adb_path = adb_path
+        self._lock = threading.Lock()
+        self._records = {}  # 名称 -> 当前这次开机的 BootRecord
+        self._history = {}  # 名称 -> 最近几次开机的 BootRecord
+        # 直接连接：没有 Qt 事件循环的脚本中也能开始跟踪
+        self.supervisor.started.connect(self.track, Qt.ConnectionType.DirectConnection)
+        self.supervisor.exited.connect(self.handle_exited, Qt.ConnectionType.DirectConnection)
+
+    @property
+    def adb_path(self):
+        return self._adb_path or sdk_tools.adb() or ADB_PATH
+
+    def get(self, name):
+        with self._lock:
+            return self._records.get(name)
+
+    def history(self, name):
+        """最近几次开机的记录，最早的在前"""
+        with self._lock:
+            return list(self._history.get(name, ()))
+
+    def is_booted(self, name):
+        record = self.get(name)
+        return record is not None and record.booted
+
+    def track(self, name):
+        """开始跟踪模拟器的开机进度，已在跟踪时返回已有的记录"""
+        emulator = self.supervisor.get(name)
+        with self._lock:
+            record = self._records.get(name)
+            if record is not None and not record.stopped.is_set():
+                return record
+            record = BootRecord(name)
+            self._records[name] = record
+            self._history.setdefault(name, deque(maxlen=HISTORY_SIZE)).append(record)
+        threading.Thread(target=self._run, args=(record, emulator), daemon=True).start()
+        return record
+
+    def handle_exited(self, name, returncode):
+        with self._lock:
+            record = self._records.pop(name, None)
+        if record is not None and not record.booted:
+            self._fail(record, f"模拟器已退出，退出码 {returncode}")
+        elif record is not None:
+            record.stopped.set()
+
+    def boot_future(self, name):
+        """返回开机完成时结束的 Future，模拟器未在运行时抛出异常"""
+        record = self.get(name)
+        if record is None:
+            if self.supervisor.get(name) is None:
+                raise Exception(f"模拟器 {name} 未在运行")
+            record = self.track(name)
+        return record.future
+
+    def wait_until_booted(self, name, timeout=None):
+        """阻塞等待模拟器开机完成，返回 BootRecord
+
+        Args:
+            timeout: 最长等待秒数，为 None 时一直等待
+        """
+        future = self.boot_future(name)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            raise Exception(f"等待模拟器 {name} 开机超时（{timeout} 秒）")
+
+    def _run(self, record, emulator):
+        interval = MIN_INTERVAL
+        while not record.stopped.is_set():
+            if emulator is None or self.supervisor.get(record.name) is not emulator:
+                self._fail(record, "模拟器已退出")
+                return
+            try:
+                reached = self._check(record.stage, emulator.serial)
+            except FileNotFoundError:
+                self._fail(record, "未找到 adb")
+                return
+            if reached:
+                record.advance(STAGES[STAGES.index(record.stage) + 1])
+                self.stage_changed.emit(record.name, record.stage)
+                if record.booted:
+                    print(f"模拟器 {record.name} 开机完成：{record.summary()}")
+                    record.stopped.set()
+                    record.future.set_result(record)
+                    self.booted.emit(record.name)
+                    return
+                interval = MIN_INTERVAL
+                continue
+            record.stopped.wait(interval)
+            interval = min(MAX_INTERVAL, interval * BACKOFF)
+
+    def _check(self, stage, serial):
+        """是否已经到达 stage 的下一个阶段"""
+        # 端口未知时还无法通过 adb 访问，等监管器从输出中读到端口
+        if not serial:
+            return False
+        if stage == PROCESS:
+            return self._adb(serial, 'get-state') == 'device'
+        if stage == DEVICE_ONLINE:
+            return self._adb(serial, 'shell', 'getprop', 'sys.boot_completed') == '1'
+        if stage == BOOT_COMPLETED:
+            return self._launcher_idle(serial)
+        return True
+
+    def _launcher_idle(self, serial):
+        """开机动画已结束，并且有窗口获得了焦点（通常是桌面）"""
+        if self._adb(serial, 'shell', 'getprop', 'init.svc.bootanim') not in ('stopped', ''):
+            return False
+        output = self._adb(serial, 'shell', 'dumpsys', 'window') or ''
+        match = FOCUS_PATTERN.search(output)
+        if not match:
+            return False
+        focus = match.group(1).strip()
+        # 开机后系统界面短时间无响应时，获得焦点的是 ANR 对话框
+        return focus not in ('', 'null') and 'Not Responding' not in focus
+
+    def _adb(self, serial, *args):
+        """执行 adb 命令，返回去掉首尾空白的输出，失败时返回 None"""
+        try:
+            result = subprocess.run([self.adb_path, '-s', serial, *args], capture_output=True,
+                                    text=True, timeout=ADB_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    def _fail(self, record, error):
+        record.error = error
+        record.stopped.set()
+        if not record.future.done():
+            record.future.set_exception(Exception(f"模拟器 {record.name} 开机失败：{error}"))
+
+
+# 全局共享的开机进度跟踪器
+boot_tracker = BootTracker()
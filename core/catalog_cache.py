@@ -0,0 +1,69 @@
+import os
+import json
+import time
+import threading
+
+from utils import CACHE_DIR, get_setting
+
+# 默认缓存有效期（秒），可通过配置项 catalog_ttl 修改
+DEFAULT_CATALOG_TTL = 6 * 60 * 60
+
+
+class CatalogCache:
+    """镜像目录的磁盘缓存
+
+    保存上次加载的可用镜像列表，打开镜像管理时先显示缓存内容，
+    超过有效期后再在后台重新加载。
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or os.path.join(CACHE_DIR, 'catalog.json')
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        try:
+            return int(get_setting('catalog_ttl', DEFAULT_CATALOG_TTL))
+        except (TypeError, ValueError):
+            return DEFAULT_CATALOG_TTL
+
+    def load(self):
+        """读取缓存，返回 {'timestamp': 保存时间, 'images': 镜像列表}，没有缓存时返回 None"""
+        with self._lock:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+        if not isinstance(data, dict) or not isinstance(data.get('images'), list):
+            return None
+        return data
+
+    def save(self, images):
+        """保存镜像列表"""
+        data = {'timestamp': time.time(), 'images': images}
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+    def is_stale(self, data):
+        """缓存是否已超过有效期"""
+        return data is None or time.time() - data.get('timestamp', 0) > self.ttl
+
+    def clear(self):
+        """删除缓存"""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+# 全局共享的镜像目录缓存
+catalog_cache = CatalogCache()
@@ -0,0 +1,192 @@
+import os
+import glob
+import json
+import zipfile
+import threading
+from xml.etree import ElementTree
+
+from utils import ANDROID_HOME, CACHE_DIR, find_avdmanager
+
+# SDK 中内置设备定义所在的 jar 包目录
+DEVICES_PREFIX = 'com/android/sdklib/devices/'
+
+# 密度名称对应的 dpi
+DENSITY_BUCKETS = {
+    'ldpi': 120, 'mdpi': 160, 'tvdpi': 213, 'hdpi': 240,
+    'xhdpi': 320, 'xxhdpi': 480, 'xxxhdpi': 640,
+}
+
+# RAM 单位换算为 MB
+RAM_UNITS = {'B': 1 / (1024 * 1024), 'KiB': 1 / 1024, 'MiB': 1, 'GiB': 1024, 'TiB': 1024 * 1024}
+
+
+def _local_name(tag):
+    """去掉 XML 命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _find(element, *names):
+    """按层级查找子元素，忽略命名空间"""
+    for name in names:
+        if element is None:
+            return None
+        element = next((child for child in element if _local_name(child.tag) == name), None)
+    return element
+
+
+def _text(element, *names):
+    element = _find(element, *names)
+    return (element.text or '').strip() if element is not None else ''
+
+
+def _parse_density(value):
+    if value in DENSITY_BUCKETS:
+        return DENSITY_BUCKETS[value]
+    try:
+        return int(value.replace('dpi', ''))
+    except ValueError:
+        return None
+
+
+def parse_devices_xml(content, source=''):
+    """解析 devices.xml 内容，返回设备信息列表"""
+    root = ElementTree.fromstring(content)
+    devices = []
+    for device in root.iter():
+        if _local_name(device.tag) != 'device':
+            continue
+        name = _text(device, 'name')
+        if not name:
+            continue
+        hardware = _find(device, 'hardware')
+        screen = _find(hardware, 'screen')
+        ram = _find(hardware, 'ram')
+
+        try:
+            diagonal = float(_text(screen, 'diagonal-length'))
+        except ValueError:
+            diagonal = None
+        try:
+            width = int(_text(screen, 'dimensions', 'x-dimension'))
+            height = int(_text(screen, 'dimensions', 'y-dimension'))
+        except ValueError:
+            width = height = None
+        try:
+            ram_mb = int(float(ram.text) * RAM_UNITS.get(ram.get('unit', 'MiB'), 1)) if ram is not None else None
+        except ValueError:
+            ram_mb = None
+
+        devices.append({
+            'id': _text(device, 'id') or name,
+            'name': name,
+            'manufacturer': _text(device, 'manufacturer'),
+            'screen_size': diagonal,
+            'width': width,
+            'height': height,
+            'density': _parse_density(_text(screen, 'pixel-density')),
+            'ram': ram_mb,
+            'tag': _text(device, 'tag-id'),
+            'source': source,
+        })
+    return devices
+
+
+def user_devices_path():
+    """用户自定义设备文件 ~/.android/devices.xml"""
+    user_home = os.getenv('ANDROID_USER_HOME') or os.path.expanduser('~/.android')
+    return os.path.join(user_home, 'devices.xml')
+
+
+class DeviceIndex:
+    """设备定义索引
+
+    读取 cmdline-tools 内置的设备定义、系统镜像自带的 devices.xml
+    和用户的 ~/.android/devices.xml，代替 `avdmanager list device`。
+    解析结果按文件 mtime 缓存在内存和磁盘中。
+    """
+
+    def __init__(self, sdk_root=ANDROID_HOME, cache_path=None):
+        self.sdk_root = sdk_root
+        self.cache_path = cache_path or os.path.join(CACHE_DIR, 'devices.json')
+        self._lock = threading.Lock()
+        self._cache = None  # 源文件路径 -> {'mtime': ..., 'devices': [...]}
+
+    def _sources(self):
+        """按优先级从低到高列出设备定义文件，后面的同名设备会覆盖前面的"""
+        sources = []
+        avdmanager = find_avdmanager()
+        if avdmanager:
+            lib_dir = os.path.join(os.path.dirname(os.path.dirname(avdmanager)), 'lib')
+            jars = glob.glob(os.path.join(lib_dir, '**', '*.jar'), recursive=True)
+            # 设备定义在 sdklib 中，优先只扫描它
+            sdklib = [jar for jar in jars if 'sdklib' in os.path.basename(jar)]
+            sources.extend(sorted(sdklib or jars))
+        sources.extend(sorted(glob.glob(os.path.join(self.sdk_root, 'system-images', '*', '*', '*', 'devices.xml'))))
+        sources.append(user_devices_path())
+        return [path for path in sources if os.path.isfile(path)]
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _save_cache(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f'{self.cache_path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"保存设备缓存失败: {str(e)}")
+
+    def _parse_source(self, path):
+        """解析单个来源文件中的设备定义"""
+        if not path.endswith('.jar'):
+            with open(path, 'rb') as f:
+                return parse_devices_xml(f.read(), path)
+        devices = []
+        with zipfile.ZipFile(path) as jar:
+            for name in jar.namelist():
+                if name.startswith(DEVICES_PREFIX) and name.endswith('.xml'):
+                    devices.extend(parse_devices_xml(jar.read(name), f'{path}!{name}'))
+        return devices
+
+    def devices(self):
+        """返回所有设备定义，手机在前，手表/电视/车机在后"""
+        with self._lock:
+            cache = self._load_cache()
+            updated = {}
+            changed = False
+            for path in self._sources():
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    entry = cache.get(path)
+                    if not entry or entry.get('mtime') != mtime:
+                        entry = {'mtime': mtime, 'devices': self._parse_source(path)}
+                        changed = True
+                except (OSError, zipfile.BadZipFile, ElementTree.ParseError) as e:
+                    print(f"读取设备定义 {path} 时出错: {str(e)}")
+                    continue
+                updated[path] = entry
+            if changed or set(updated) != set(cache):
+                self._cache = updated
+                self._save_cache()
+
+            devices = {}
+            for entry in updated.values():
+                for device in entry['devices']:
+                    devices[device['id']] = device
+            return sorted(devices.values(), key=lambda d: (bool(d['tag']), d['name'].lower()))
+
+    def get(self, device_id):
+        """按 ID 查找设备定义"""
+        return next((d for d in self.devices() if d['id'] == device_id), None)
+
+
+# 全局共享的设备索引
+device_index = DeviceIndex()
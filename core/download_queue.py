@@ -0,0 +1,229 @@
+import time
+import threading
+from collections import deque
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from utils import get_setting
+from core.downloader import RateLimiter, DownloadCancelled
+
+# 默认同时进行的下载数，可通过配置项 download_concurrency 修改
+DEFAULT_CONCURRENCY = 2
+# 计算速度时使用的时间窗口（秒）
+SPEED_WINDOW = 5
+
+
+class DownloadTask:
+    """下载队列中的一项任务"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, task_id, name, run, discard=None):
+        """
+        Args:
+            run: 执行下载的函数，参数为 (progress, cancelled, throttle)，同 Downloader.download
+            discard: 取消时删除已下载部分的函数
+        """
+        self.id = task_id
+        self.name = name
+        self.run = run
+        self.discard = discard
+        self.state = self.QUEUED
+        self.downloaded = 0
+        self.total = 0
+        self.error = ''
+        self._stop = None  # None / PAUSED / CANCELLED
+
+    @property
+    def active(self):
+        return self.state in (self.QUEUED, self.RUNNING, self.PAUSED)
+
+
+class DownloadQueue(QObject):
+    """下载队列
+
+    多个系统镜像或 SDK 组件按顺序排队，同时最多运行 concurrency 个，
+    所有任务共享同一个限速器。暂停即中止下载并保留已下载的部分，
+    继续时由下载器从断点续传。
+    """
+    task_changed = pyqtSignal(str)  # 任务 ID
+    task_finished = pyqtSignal(str, bool)  # 任务 ID, 是否成功
+
+    def __init__(self, concurrency=None, rate_limit=None):
+        super().__init__()
+        self._concurrency = concurrency
+        self.limiter = RateLimiter()
+        self._rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._tasks = {}  # 任务 ID -> DownloadTask，保持加入顺序
+        self._samples = deque()  # (时间, 累计下载字节数)
+        self._total_downloaded = 0
+
+    @property
+    def concurrency(self):
+        if self._concurrency is not None:
+            return self._concurrency
+        try:
+            return max(1, int(get_setting('download_concurrency', DEFAULT_CONCURRENCY)))
+        except (TypeError, ValueError):
+            return DEFAULT_CONCURRENCY
+
+    def rate_limit(self):
+        """总带宽上限（字节/秒），配置项 download_rate_limit 的单位为 KB/s，0 表示不限速"""
+        if self._rate_limit is not None:
+            return self._rate_limit
+        try:
+            return max(0, int(get_setting('download_rate_limit', 0))) * 1024
+        except (TypeError, ValueError):
+            return 0
+
+    def tasks(self):
+        with self._lock:
+            return list(self._tasks.values())
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def add(self, task_id, name, run, discard=None):
+        """加入队列，同一任务正在进行时直接返回已有任务"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task and task.active:
+                return task
+            task = DownloadTask(task_id, name, run, discard)
+            self._tasks.pop(task_id, None)
+            self._tasks[task_id] = task
+        self.task_changed.emit(task_id)
+        self._schedule()
+        return task
+
+    def pause(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task or task.state not in (task.QUEUED, task.RUNNING):
+                return
+            if task.state == task.QUEUED:
+                task.state = task.PAUSED
+            else:
+                # 运行中的任务在下载线程中停止后变为暂停状态
+                task._stop = task.PAUSED
+        self.task_changed.emit(task_id)
+
+    def resume(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task or task.state not in (task.PAUSED, task.FAILED):
+                return
+            task.state = task.QUEUED
+            task.error = ''
+            task._stop = None
+        self.task_changed.emit(task_id)
+        self._schedule()
+
+    def cancel(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task or not task.active:
+                return
+            if task.state == task.RUNNING:
+                task._stop = task.CANCELLED
+                return
+            task.state = task.CANCELLED
+        self._discard(task)
+        self.task_changed.emit(task_id)
+
+    def remove(self, task_id):
+        """从列表中移除已结束的任务"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task and not task.active:
+                del self._tasks[task_id]
+        self.task_changed.emit(task_id)
+
+    def stats(self):
+        """汇总速度（字节/秒）、剩余时间（秒，未知时为 None）和任务数"""
+        with self._lock:
+            now = time.monotonic()
+            while self._samples and now - self._samples[0][0] > SPEED_WINDOW:
+                self._samples.popleft()
+            speed = 0
+            if len(self._samples) >= 2:
+                (start_time, start_bytes), (end_time, end_bytes) = self._samples[0], self._samples[-1]
+                if now - end_time < SPEED_WINDOW and end_time > start_time:
+                    speed = (end_bytes - start_bytes) / (end_time - start_time)
+            active = [task for task in self._tasks.values() if task.state in (task.QUEUED, task.RUNNING)]
+            remaining = sum(max(0, task.total - task.downloaded) for task in active)
+            unknown = any(not task.total for task in active)
+            return {
+                'speed': speed,
+                'eta': remaining / speed if speed and not unknown else None,
+                'running': sum(1 for task in active if task.state == task.RUNNING),
+                'queued': sum(1 for task in active if task.state == task.QUEUED),
+            }
+
+    def _schedule(self):
+        """启动排队中的任务，直到达到并发上限"""
+        started = []
+        with self._lock:
+            running = sum(1 for task in self._tasks.values() if task.state == task.RUNNING)
+            for task in self._tasks.values():
+                if running >= self.concurrency:
+                    break
+                if task.state == task.QUEUED:
+                    task.state = task.RUNNING
+                    running += 1
+                    started.append(task)
+        for task in started:
+            threading.Thread(target=self._run, args=(task,), daemon=True).start()
+            self.task_changed.emit(task.id)
+
+    def _progress(self, task, downloaded, total_size):
+        with self._lock:
+            self._total_downloaded += max(0, downloaded - task.downloaded)
+            task.downloaded = downloaded
+            task.total = total_size
+            self._samples.append((time.monotonic(), self._total_downloaded))
+        self.task_changed.emit(task.id)
+
+    def _throttle(self, size):
+        self.limiter.rate = self.rate_limit()
+        self.limiter.consume(size)
+
+    def _run(self, task):
+        success = False
+        try:
+            task.run(progress=lambda downloaded, total: self._progress(task, downloaded, total),
+                     cancelled=lambda: task._stop is not None,
+                     throttle=self._throttle)
+            task.state = task.DONE
+            success = True
+        except DownloadCancelled:
+            if task._stop == task.CANCELLED:
+                task.state = task.CANCELLED
+                self._discard(task)
+            else:
+                task.state = task.PAUSED
+        except Exception as e:
+            task.state = task.FAILED
+            task.error = str(e)
+        finally:
+            task._stop = None
+        self.task_changed.emit(task.id)
+        if task.state in (task.DONE, task.FAILED, task.CANCELLED):
+            self.task_finished.emit(task.id, success)
+        self._schedule()
+
+    def _discard(self, task):
+        if task.discard:
+            try:
+                task.discard()
+            except Exception as e:
+                print(f"删除未完成的下载失败: {str(e)}")
+
+
+# 全局共享的下载队列
+download_queue = DownloadQueue()
@@ -0,0 +1,577 @@
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from utils import CACHE_DIR, get_setting
+from core.http_client import http_client, backoff_delay, is_retryable
+
+# 默认并发连接数，可通过配置项 download_connections 修改
+DEFAULT_CONNECTIONS = 4
+# 小于该大小的分段不再拆分
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# 写入缓冲区大小，可通过配置项 download_buffer_size 修改
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+# 进度回调的最小间隔（秒），即最多每秒 10 次
+PROGRESS_INTERVAL = 0.1
+# 补算校验值时每次读取的大小
+HASH_BLOCK_SIZE = 1024 * 1024
+# 每个分段的最大重试次数
+MAX_RETRIES = 5
+# 下载状态文件的保存间隔（秒）
+STATE_SAVE_INTERVAL = 1
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadCancelled(Exception):
+    """下载被用户取消"""
+
+
+class RemoteChanged(Exception):
+    """服务器上的文件已变化，已下载的部分不能继续使用"""
+
+
+class SegmentError(Exception):
+    """分段下载失败，可以重试"""
+
+
+class ChecksumMismatch(Exception):
+    """下载的文件与仓库中的校验值不一致"""
+
+
+def split_segments(total_size, connections, min_segment_size=MIN_SEGMENT_SIZE):
+    """把文件划分为若干 [start, end] 区间（包含 end）"""
+    if total_size <= 0:
+        return []
+    count = max(1, min(connections, total_size // min_segment_size))
+    segment_size = -(-total_size // count)
+    return [(start, min(start + segment_size, total_size) - 1)
+            for start in range(0, total_size, segment_size)]
+
+
+class RateLimiter:
+    """令牌桶限速，多个下载共享同一个实例即可限制总带宽
+
+    rate 为每秒字节数，0 表示不限速。
+    """
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._tokens = 0
+        self._last = time.monotonic()
+
+    def consume(self, size):
+        """取走 size 个字节的额度，额度不足时等待"""
+        rate = self.rate
+        if not rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(rate, self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= size
+            wait = -self._tokens / rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ProgressThrottle:
+    """把频繁的进度回调合并为固定频率，完成时的进度总会送出"""
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._last = 0
+
+    def __call__(self, downloaded, total_size):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last < self.interval and downloaded != total_size:
+                return
+            self._last = now
+        self.callback(downloaded, total_size)
+
+
+class BufferedWriter:
+    """把网络上收到的小块数据攒成大块后再写入文件
+
+    每次真正写入文件后调用 on_flush(文件偏移, 数据)，
+    下载状态中记录的进度因此总是已经写入文件的数据。
+    """
+
+    def __init__(self, f, buffer_size, on_flush=None, offset=0):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.on_flush = on_flush
+        self.offset = offset
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        size = len(self._buffer)
+        with memoryview(self._buffer) as view:
+            # 无缓冲的文件可能只写入一部分
+            written = 0
+            while written < size:
+                written += self.f.write(view[written:])
+        if self.on_flush:
+            self.on_flush(self.offset, self._buffer)
+        self.offset += size
+        self._buffer.clear()
+
+
+class HashFrontier:
+    """按文件顺序增量计算校验值
+
+    分段下载时数据不是按顺序到达的：正好接在已计算位置之后的数据在写入时直接计算，
+    提前到达的数据等前面的部分完成后再从文件（通常还在页缓存中）补算。
+    """
+
+    def __init__(self, checksum_type='sha1'):
+        self.hasher = hashlib.new(checksum_type)
+        self.offset = 0
+        self._lock = threading.Lock()
+
+    def update(self, offset, data):
+        with self._lock:
+            if offset == self.offset:
+                self.hasher.update(data)
+                self.offset += len(data)
+
+    def catch_up(self, path, limit):
+        """从文件中补算到 limit 位置"""
+        with self._lock:
+            if self.offset >= limit:
+                return
+            with open(path, 'rb') as f:
+                f.seek(self.offset)
+                while self.offset < limit:
+                    data = f.read(min(HASH_BLOCK_SIZE, limit - self.offset))
+                    if not data:
+                        break
+                    self.hasher.update(data)
+                    self.offset += len(data)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def file_checksum(path, checksum_type='sha1'):
+    """计算整个文件的校验值"""
+    frontier = HashFrontier(checksum_type)
+    frontier.catch_up(path, os.path.getsize(path))
+    return frontier.hexdigest()
+
+
+def find_corrupt_ranges(path):
+    """根据 zip 中每个文件的 CRC 找出损坏的字节区间
+
+    返回 [(start, end)] 列表；文件不是 zip 或目录区已损坏、无法定位时返回 None。
+    """
+    try:
+        with zipfile.ZipFile(path) as archive:
+            infos = sorted(archive.infolist(), key=lambda info: info.header_offset)
+            directory_start = getattr(archive, 'start_dir', os.path.getsize(path))
+            ranges = []
+            for index, info in enumerate(infos):
+                end = infos[index + 1].header_offset if index + 1 < len(infos) else directory_start
+                try:
+                    with archive.open(info) as member:
+                        while member.read(HASH_BLOCK_SIZE):
+                            pass
+                except (zipfile.BadZipFile, zlib.error, EOFError, ValueError):
+                    ranges.append((info.header_offset, end - 1))
+            return ranges
+    except (OSError, zipfile.BadZipFile):
+        return None
+
+
+def fsync_file(path):
+    """下载完成后把文件一次性同步到磁盘"""
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def preallocate(path, size):
+    """预先分配文件空间"""
+    with open(path, 'wb') as f:
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError:
+                pass
+        f.truncate(size)
+
+
+class Downloader:
+    """多连接分段下载器
+
+    服务器支持 Range 时把文件拆成多个分段，通过共享的连接池并行下载，
+    各分段直接写入预先分配好的文件中对应的位置；不支持时退回单连接下载。
+
+    下载中的数据保存在 <文件>.part，进度保存在 <文件>.part.json
+    （URL、ETag、每个分段已完成的字节数），失败、取消或重启程序后
+    再次下载同一文件时带上 If-Range 从断点继续。
+    """
+
+    def __init__(self, session=None, connections=None, chunk_size=CHUNK_SIZE, timeout=None,
+                 max_retries=MAX_RETRIES, download_dir=None, buffer_size=None):
+        self._connections = connections
+        self._buffer_size = buffer_size
+        self.chunk_size = chunk_size
+        self.timeout = timeout or http_client.timeout
+        self.max_retries = max_retries
+        self.download_dir = download_dir or os.path.join(CACHE_DIR, 'downloads')
+        # 默认与其他网络请求共用连接池
+        self.session = session or http_client.session
+
+    @property
+    def connections(self):
+        if self._connections is not None:
+            return self._connections
+        try:
+            return max(1, int(get_setting('download_connections', DEFAULT_CONNECTIONS)))
+        except (TypeError, ValueError):
+            return DEFAULT_CONNECTIONS
+
+    @property
+    def buffer_size(self):
+        if self._buffer_size is not None:
+            return self._buffer_size
+        try:
+            return max(self.chunk_size, int(get_setting('download_buffer_size', DEFAULT_BUFFER_SIZE)))
+        except (TypeError, ValueError):
+            return DEFAULT_BUFFER_SIZE
+
+    def default_path(self, url):
+        """URL 对应的固定下载位置，同一文件每次都下载到同一路径以便断点续传
+
+        不同目录下的系统镜像压缩包同名（如 google_apis/x86_64-34_r01.zip 和 default/x86_64-34_r01.zip），
+        文件名前加上完整 URL 的哈希，同时下载时不会共用 .part 文件和区间记录。
+        """
+        os.makedirs(self.download_dir, exist_ok=True)
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.download_dir, f'{digest}-{os.path.basename(urlparse(url).path)}')
+
+    def probe(self, url):
+        """请求第一个字节，判断服务器是否支持 Range
+
+        返回 (响应, 文件大小, 是否支持分段, 校验信息)。不支持分段时响应中就是完整内容，可直接继续读取。
+        """
+        response = self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        validator = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        if response.status_code == 206:
+            match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+            if match and match.group(3) != '*':
+                response.close()
+                return None, int(match.group(3)), True, validator
+        return response, int(response.headers.get('Content-Length', 0) or 0), False, validator
+
+    def download(self, url, save_path=None, progress=None, cancelled=None,
+                 checksum=None, checksum_type='sha1', size=None, on_written=None, throttle=None):
+        """下载文件，返回保存路径
+
+        Args:
+            save_path: 保存路径，默认为 default_path(url)
+            progress: 进度回调，参数为 (已下载字节数, 总字节数)，每秒最多调用 10 次
+            cancelled: 返回 True 时中止下载，已下载的部分会保留
+            checksum: 仓库中给出的校验值，下载时同步计算，不一致时不会生成 save_path
+            checksum_type: 校验算法，如 sha1、sha256
+            size: 仓库中给出的文件大小
+            on_written: 数据写入文件后调用，参数为 (文件偏移, 字节数)，在下载线程中调用
+            throttle: 每收到一块数据调用一次，参数为字节数，可在其中等待以限制速度
+        """
+        save_path = save_path or self.default_path(url)
+        progress = ProgressThrottle(progress) if progress else None
+        options = {'checksum': checksum.lower() if checksum else None,
+                   'checksum_type': checksum_type or 'sha1', 'size': size, 'on_written': on_written,
+                   'throttle': throttle}
+        try:
+            return self._download(url, save_path, progress, cancelled, options)
+        except RemoteChanged:
+            # 文件在两次下载之间被更新，丢弃旧数据重新下载
+            print(f"{url} 已更新，重新下载")
+            self.discard(save_path)
+            return self._download(url, save_path, progress, cancelled, options)
+
+    def discard(self, save_path):
+        """删除未完成的下载"""
+        for path in (f'{save_path}.part', f'{save_path}.part.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _load_state(self, save_path, url, total_size, validator):
+        """读取可以继续使用的下载状态"""
+        part_path = f'{save_path}.part'
+        try:
+            with open(f'{part_path}.json', 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('url') != url or state.get('size') != total_size:
+            return None
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != total_size:
+            return None
+        for key in ('etag', 'last_modified'):
+            if state.get(key) and validator.get(key) and state[key] != validator[key]:
+                return None
+        return state
+
+    def _save_state(self, save_path, state):
+        state_path = f'{save_path}.part.json'
+        tmp_path = f'{state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _download(self, url, save_path, progress, cancelled, options):
+        response, total_size, ranged, validator = self._with_retry(lambda: self.probe(url), cancelled)
+        part_path = f'{save_path}.part'
+        if options['size'] and total_size and options['size'] != total_size:
+            if response:
+                response.close()
+            raise Exception(f"文件大小与仓库信息不一致: {total_size} != {options['size']}")
+
+        if not (ranged and total_size):
+            self.discard(save_path)
+            holder = {'response': response}
+
+            def stream():
+                # 第一次直接使用探测时的响应，重试时重新请求并重新计算校验值
+                current = holder.pop('response', None) or self.session.get(url, stream=True, timeout=self.timeout)
+                current.raise_for_status()
+                holder['frontier'] = HashFrontier(options['checksum_type']) if options['checksum'] else None
+                self._download_stream(current, part_path, progress, cancelled, holder['frontier'],
+                                      options['on_written'], options['throttle'])
+
+            self._with_retry(stream, cancelled)
+            if total_size and os.path.getsize(part_path) != total_size:
+                raise Exception("文件下载不完整")
+            if options['checksum'] and holder['frontier'].hexdigest() != options['checksum']:
+                self.discard(save_path)
+                raise Exception("文件校验失败，请重新下载")
+            fsync_file(part_path)
+            os.replace(part_path, save_path)
+            return save_path
+
+        state = self._load_state(save_path, url, total_size, validator)
+        if state is None:
+            self.discard(save_path)
+            state = {
+                'url': url,
+                'size': total_size,
+                'etag': validator['etag'],
+                'last_modified': validator['last_modified'],
+                'segments': [{'start': start, 'end': end, 'done': 0}
+                             for start, end in split_segments(total_size, self.connections)],
+            }
+            preallocate(part_path, total_size)
+            self._save_state(save_path, state)
+        else:
+            print(f"继续下载 {url}")
+
+        lock = threading.Lock()
+        counters = {
+            'downloaded': sum(segment['done'] for segment in state['segments']),
+            'saved_at': time.monotonic(),
+        }
+        frontier = HashFrontier(options['checksum_type']) if options['checksum'] else None
+
+        def completed_prefix():
+            """从文件开头起连续写入完成的字节数"""
+            with lock:
+                prefix = 0
+                for segment in sorted(state['segments'], key=lambda s: s['start']):
+                    prefix = segment['start'] + segment['done']
+                    if segment['done'] < segment['end'] - segment['start'] + 1:
+                        break
+                return prefix
+
+        def fetch(segment):
+            self._download_segment(url, part_path, segment, state, report, cancelled, frontier,
+                                   options['on_written'], options['throttle'])
+            if frontier:
+                frontier.catch_up(part_path, completed_prefix())
+
+        def report(segment, size):
+            with lock:
+                segment['done'] += size
+                counters['downloaded'] += size
+                downloaded = counters['downloaded']
+                if time.monotonic() - counters['saved_at'] >= STATE_SAVE_INTERVAL:
+                    counters['saved_at'] = time.monotonic()
+                    self._save_state(save_path, state)
+            if progress:
+                progress(downloaded, total_size)
+
+        if progress:
+            progress(counters['downloaded'], total_size)
+        if options['on_written']:
+            # 继续下载时先通知已经写入的部分
+            for segment in state['segments']:
+                if segment['done']:
+                    options['on_written'](segment['start'], segment['done'])
+
+        pending = [segment for segment in state['segments']
+                   if segment['done'] < segment['end'] - segment['start'] + 1]
+        errors = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = [executor.submit(self._with_retry, lambda segment=segment: fetch(segment), cancelled)
+                           for segment in pending]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors.append(e)
+
+        with lock:
+            self._save_state(save_path, state)
+        if errors:
+            # 优先报告取消和文件变化，其次是网络错误
+            errors.sort(key=lambda e: not isinstance(e, (DownloadCancelled, RemoteChanged)))
+            raise errors[0]
+
+        if os.path.getsize(part_path) != total_size:
+            raise Exception("文件下载不完整")
+        if frontier:
+            frontier.catch_up(part_path, total_size)
+            if frontier.hexdigest() != options['checksum']:
+                try:
+                    self._repair(url, part_path, state, options, cancelled)
+                except ChecksumMismatch:
+                    self.discard(save_path)
+                    raise Exception("文件校验失败，请重新下载")
+        fsync_file(part_path)
+        os.replace(part_path, save_path)
+        os.remove(f'{part_path}.json')
+        return save_path
+
+    def _repair(self, url, part_path, state, options, cancelled):
+        """校验失败时根据 zip 中各文件的 CRC 找到损坏的区间，只重新下载这些区间"""
+        ranges = find_corrupt_ranges(part_path)
+        if not ranges:
+            raise ChecksumMismatch()
+        print(f"{url} 校验失败，重新下载 {len(ranges)} 个损坏的区间")
+        for start, end in ranges:
+            segment = {'start': start, 'end': end, 'done': 0}
+            self._with_retry(lambda: self._download_segment(
+                url, part_path, segment, state, lambda s, size: s.update(done=s['done'] + size), cancelled), cancelled)
+        if file_checksum(part_path, options['checksum_type']) != options['checksum']:
+            raise ChecksumMismatch()
+
+    def _with_retry(self, func, cancelled):
+        """网络错误时按带随机抖动的指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            self._check_cancelled(cancelled)
+            try:
+                return func()
+            except (requests.RequestException, SegmentError) as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"下载出错，{delay:.1f} 秒后重试: {str(e)}")
+                self._sleep(delay, cancelled)
+
+    def _sleep(self, seconds, cancelled):
+        """等待期间也能响应取消"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._check_cancelled(cancelled)
+            time.sleep(min(0.1, deadline - time.monotonic()))
+
+    def _check_cancelled(self, cancelled):
+        if cancelled and cancelled():
+            raise DownloadCancelled("下载已取消")
+
+    def _download_segment(self, url, part_path, segment, state, report, cancelled, frontier=None,
+                          on_written=None, throttle=None):
+        """从断点下载一个分段并写入文件中对应的位置"""
+        start = segment['start'] + segment['done']
+        end = segment['end']
+        if start > end:
+            return
+        headers = {'Range': f'bytes={start}-{end}'}
+        # 文件已变化时服务器会返回完整内容而不是 206
+        if state.get('etag') or state.get('last_modified'):
+            headers['If-Range'] = state.get('etag') or state.get('last_modified')
+
+        def on_flush(offset, data):
+            if frontier:
+                frontier.update(offset, data)
+            report(segment, len(data))
+            if on_written:
+                on_written(offset, len(data))
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 200:
+                raise RemoteChanged(f"{url} 已变化")
+            if response.status_code != 206:
+                raise SegmentError(f"分段下载失败: HTTP {response.status_code}")
+            with open(part_path, 'r+b', buffering=0) as f:
+                f.seek(start)
+                writer = BufferedWriter(f, self.buffer_size, on_flush, offset=start)
+                try:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        self._check_cancelled(cancelled)
+                        if throttle:
+                            throttle(len(chunk))
+                        writer.write(chunk)
+                finally:
+                    # 出错或取消时也写入已收到的数据，下次从这里继续
+                    writer.flush()
+        if segment['done'] != end - segment['start'] + 1:
+            raise SegmentError("分段下载不完整")
+
+    def _download_stream(self, response, part_path, progress, cancelled, frontier=None, on_written=None,
+                         throttle=None):
+        """服务器不支持 Range 时单连接下载"""
+        counters = {'downloaded': 0}
+        total_size = int(response.headers.get('Content-Length', 0) or 0)
+
+        def report(offset, data):
+            if frontier:
+                frontier.update(offset, data)
+            counters['downloaded'] += len(data)
+            if on_written:
+                on_written(offset, len(data))
+            if progress:
+                progress(counters['downloaded'], total_size)
+
+        with response, open(part_path, 'wb', buffering=0) as f:
+            writer = BufferedWriter(f, self.buffer_size, report)
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                self._check_cancelled(cancelled)
+                if throttle:
+                    throttle(len(chunk))
+                writer.write(chunk)
+            writer.flush()
+
+
+# 全局共享的下载器
+downloader = Downloader()
@@ -0,0 +1,115 @@
+import os
+import re
+import socket
+
+# 连接控制台和等待普通命令响应的超时（秒）
+CONSOLE_TIMEOUT = 5
+# 保存快照需要把内存写入磁盘，内存较大时需要更长时间
+SNAPSHOT_TIMEOUT = 120
+DEFAULT_TOKEN_PATH = os.path.expanduser('~/.emulator_console_auth_token')
+
+# 欢迎信息中给出的令牌文件路径，如 'you can find your <auth_token> in\n'/home/user/.emulator_console_auth_token''
+TOKEN_PATH_PATTERN = re.compile(r"'([^']*emulator_console_auth_token)'")
+
+
+class EmulatorConsole:
+    """模拟器控制台客户端
+
+    控制台监听在 127.0.0.1 的偶数端口（5554 + 2n），每条命令以换行结束，
+    响应的最后一行为 OK 或 KO: <错误信息>。新版模拟器要求先用
+    ~/.emulator_console_auth_token 中的令牌执行 auth。
+
+    用法:
+        with EmulatorConsole(5554) as console:
+            console.snapshot_save('clean')
+    """
+
+    def __init__(self, port, host='127.0.0.1', timeout=CONSOLE_TIMEOUT, token_path=None):
+        self.port = port
+        self.host = host
+        self.timeout = timeout
+        self.token_path = token_path
+        self._sock = None
+        self._file = None
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        """连接控制台，需要时完成认证"""
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._file = self._sock.makefile('rb')
+        greeting = self._read_response()
+        if 'Authentication required' in greeting:
+            self.command(f'auth {self._read_token(greeting)}')
+        return self
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+    def command(self, command, timeout=None):
+        """执行一条命令，返回 OK 之前的输出，命令失败时抛出异常"""
+        if self._sock is None:
+            self.connect()
+        self._sock.settimeout(timeout or self.timeout)
+        self._sock.sendall(f'{command}\n'.encode('utf-8'))
+        return self._read_response()
+
+    def kill(self):
+        """让模拟器正常退出，与关闭窗口相同，会按 AVD 设置保存快速启动快照"""
+        try:
+            self.command('kill')
+        except OSError:
+            # 模拟器可能在回复之前就关闭了连接
+            pass
+        finally:
+            self.close()
+
+    def snapshot_list(self):
+        """控制台返回的快照列表原文"""
+        return self.command('avd snapshot list')
+
+    def snapshot_save(self, name='default_boot'):
+        self.command(f'avd snapshot save {name}', timeout=SNAPSHOT_TIMEOUT)
+
+    def snapshot_load(self, name='default_boot'):
+        self.command(f'avd snapshot load {name}', timeout=SNAPSHOT_TIMEOUT)
+
+    def snapshot_delete(self, name):
+        self.command(f'avd snapshot delete {name}')
+
+    def _read_token(self, greeting):
+        """读取认证令牌，优先使用欢迎信息中给出的路径"""
+        match = TOKEN_PATH_PATTERN.search(greeting)
+        paths = [self.token_path, match.group(1) if match else None, DEFAULT_TOKEN_PATH]
+        for path in paths:
+            if not path:
+                continue
+            try:
+                with open(path, 'r') as f:
+                    return f.read().strip()
+            except OSError:
+                continue
+        raise Exception("未找到模拟器控制台认证令牌 ~/.emulator_console_auth_token")
+
+    def _read_response(self):
+        lines = []
+        while True:
+            line = self._file.readline()
+            if not line:
+                raise ConnectionError("模拟器控制台连接已断开")
+            text = line.decode('utf-8', 'replace').rstrip('\r\n')
+            # kill 等命令的回复为 "OK: killing emulator, bye bye"
+            if text == 'OK' or text.startswith('OK:'):
+                return '\n'.join(lines)
+            if text.startswith('KO'):
+                raise Exception(f"控制台命令失败: {text[3:].strip() or text}")
+            lines.append(text)
@@ -0,0 +1,446 @@
+import re
+import sys
+import signal
+import json
+import time
+import argparse
+import threading
+from urllib.parse import unquote
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from PyQt6.QtCore import Qt
+
+from utils import get_setting
+from core.emulator_supervisor import emulator_supervisor
+from core.boot_tracker import boot_tracker
+from core.snapshot_manager import snapshot_manager, launch_args
+
+# 每个配置默认保持的空闲实例数
+DEFAULT_POOL_SIZE = 1
+# 超出 size 的空闲实例在空闲多久后关闭（秒）
+IDLE_TIMEOUT = 30 * 60
+# 等待实例开机的最长时间（秒）
+BOOT_TIMEOUT = 10 * 60
+# 启动失败后多久再尝试补充（秒），避免 AVD 损坏时反复启动
+RETRY_DELAY = 30
+# 后台维护的检查间隔（秒），租用和归还时会立即检查
+MAINTAIN_INTERVAL = 5
+# 关闭池时通过控制台等待实例退出的时间（秒），实例不保存快照，退出很快
+STOP_TIMEOUT = 10
+# 通过 HTTP 租用实例的默认端口，可通过配置项 emulator_pool_port 修改
+DEFAULT_SERVE_PORT = 8766
+
+POOL_PATH_PATTERN = re.compile(r'^/(acquire|release)/([\w.@-]+)$')
+
+
+class PoolProfile:
+    """池中一类模拟器的配置
+
+    配置项 emulator_pools 的格式:
+        {"pixel33": {"avd": "Pixel_6_API_33", "size": 2, "max": 4,
+                     "idle_timeout": 1800, "snapshot": "clean", "headless": true}}
+    """
+
+    def __init__(self, name, avd, size=DEFAULT_POOL_SIZE, max_size=None, idle_timeout=IDLE_TIMEOUT,
+                 snapshot=None, headless=True, args=()):
+        self.name = name
+        self.avd = avd
+        self.size = size  # 保持开机空闲的实例数
+        self.max_size = max(max_size or size, size, 1)  # 实例总数上限，包括已租出的
+        self.idle_timeout = idle_timeout
+        self.snapshot = snapshot  # 归还时恢复到的快照，为 None 时重启实例
+        self.headless = headless
+        self.args = list(args)
+
+    @classmethod
+    def from_setting(cls, name, config):
+        def number(key, default):
+            try:
+                return int(config.get(key, default))
+            except (TypeError, ValueError):
+                return default
+
+        size = max(0, number('size', DEFAULT_POOL_SIZE))
+        return cls(name, config.get('avd') or name, size, number('max', size),
+                   number('idle_timeout', IDLE_TIMEOUT), config.get('snapshot'),
+                   bool(config.get('headless', True)), config.get('args') or [])
+
+    def launch_args(self):
+        """同一 AVD 启动多个实例需要 -read-only，退出时不保存快照"""
+        args = ['-read-only', '-no-boot-anim', *launch_args(self.snapshot, save=False)]
+        if self.headless:
+            args.append('-no-window')
+        return args + self.args
+
+
+class PoolInstance:
+    """池中的一个模拟器实例"""
+    BOOTING = 'booting'
+    IDLE = 'idle'
+    LEASED = 'leased'
+    RESETTING = 'resetting'
+
+    def __init__(self, name, profile):
+        self.name = name  # 监管器中的实例名称，如 Pixel_6_API_33@1
+        self.profile = profile
+        self.state = self.BOOTING
+        self.since = time.monotonic()  # 进入当前状态的时间
+        self.leases = 0
+
+    @property
+    def serial(self):
+        emulator = emulator_supervisor.get(self.name)
+        return emulator.serial if emulator else None
+
+    def set_state(self, state):
+        self.state = state
+        self.since = time.monotonic()
+
+    def to_dict(self):
+        return {'id': self.name, 'profile': self.profile, 'state': self.state,
+                'serial': self.serial, 'leases': self.leases}
+
+
+class EmulatorPool:
+    """预先开机的模拟器池
+
+    每个配置以 -read-only 启动同一 AVD 的多个实例并等待开机完成，
+    acquire 直接交出空闲实例，release 时恢复到干净快照后放回池中
+    （没有配置快照时关闭实例，由后台重新补充）。后台线程按配置补足空闲实例，
+    并关闭超出 size 且空闲超过 idle_timeout 的实例。
+    """
+
+    def __init__(self, profiles=None, supervisor=None, tracker=None):
+        self._profiles = profiles
+        self.supervisor = supervisor or emulator_supervisor
+        self.tracker = tracker or boot_tracker
+        self._cond = threading.Condition()
+        self._instances = {}  # 实例名称 -> PoolInstance
+        self._waiting = {}  # 配置名称 -> 正在等待的 acquire 数
+        self._failed = {}  # 配置名称 -> 最近一次启动失败的时间
+        self._thread = None
+        self._stopping = False
+        self._server = None
+        self.supervisor.exited.connect(self.handle_exited, Qt.ConnectionType.DirectConnection)
+
+    def profiles(self):
+        """{配置名称: PoolProfile}"""
+        if self._profiles is not None:
+            return {profile.name: profile for profile in self._profiles}
+        config = get_setting('emulator_pools', {})
+        if not isinstance(config, dict):
+            return {}
+        return {name: PoolProfile.from_setting(name, value)
+                for name, value in config.items() if isinstance(value, dict)}
+
+    def start(self):
+        """开始在后台维护实例，没有配置时返回 False"""
+        if not self.profiles():
+            return False
+        with self._cond:
+            self._stopping = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._maintain, daemon=True)
+                self._thread.start()
+        return True
+
+    def stop(self, wait=False, timeout=STOP_TIMEOUT):
+        """停止维护并关闭池中的所有实例
+
+        Args:
+            wait: 等待实例退出。池中的实例没有窗口，退出程序前必须等待，
+                  超过 timeout 秒仍未退出的实例直接 SIGKILL，不会留在后台
+        """
+        with self._cond:
+            self._stopping = True
+            names = list(self._instances)
+            self._cond.notify_all()
+        threads = [threading.Thread(target=self.supervisor.shutdown, args=(name, timeout), daemon=True)
+                   for name in names]
+        for thread in threads:
+            thread.start()
+        if wait:
+            deadline = time.monotonic() + timeout
+            for thread in threads:
+                thread.join(max(0, deadline - time.monotonic()))
+            for name in names:
+                if self.supervisor.send_signal(name, signal.SIGKILL):
+                    print(f"模拟器池实例 {name} 没有及时退出，已强制结束")
+        self.stop_serving()
+
+    def status(self):
+        """池中所有实例的状态"""
+        with self._cond:
+            return [instance.to_dict() for instance in self._instances.values()]
+
+    def acquire(self, profile_name, timeout=None):
+        """租用一个开机完成的实例，没有空闲实例时等待后台启动
+
+        Args:
+            timeout: 最长等待秒数，为 None 时一直等待
+        """
+        profile = self.profiles().get(profile_name)
+        if profile is None:
+            raise Exception(f"模拟器池中没有配置 {profile_name}")
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._waiting[profile_name] = self._waiting.get(profile_name, 0) + 1
+            try:
+                while True:
+                    idle = [instance for instance in self._instances.values()
+                            if instance.profile == profile_name and instance.state == PoolInstance.IDLE]
+                    if idle:
+                        instance = min(idle, key=lambda instance: instance.since)
+                        instance.set_state(PoolInstance.LEASED)
+                        instance.leases += 1
+                        return instance
+                    if self._stopping:
+                        raise Exception("模拟器池已停止")
+                    # 让后台立即补充实例
+                    self._cond.notify_all()
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Exception(f"等待模拟器池 {profile_name} 的空闲实例超时")
+                    self._cond.wait(remaining if remaining is not None else MAINTAIN_INTERVAL)
+            finally:
+                self._waiting[profile_name] -= 1
+                # 补充已租出的实例
+                self._cond.notify_all()
+
+    def release(self, instance):
+        """归还实例，在后台恢复快照后重新变为空闲"""
+        with self._cond:
+            if isinstance(instance, str):
+                instance = self._instances.get(instance)
+            if instance is None or self._instances.get(instance.name) is not instance:
+                return
+            if instance.state != PoolInstance.LEASED:
+                return
+            instance.set_state(PoolInstance.RESETTING)
+        threading.Thread(target=self._reset, args=(instance,), daemon=True).start()
+
+    @contextmanager
+    def lease(self, profile_name, timeout=None):
+        """with emulator_pool.lease('pixel33') as instance: ... instance.serial"""
+        instance = self.acquire(profile_name, timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def handle_exited(self, name, returncode):
+        """实例退出（崩溃或被关闭）后从池中移除，由后台补充"""
+        with self._cond:
+            if self._instances.pop(name, None) is not None:
+                self._cond.notify_all()
+
+    def _maintain(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+                self._top_up()
+                self._cond.wait(MAINTAIN_INTERVAL)
+
+    def _top_up(self):
+        """补足空闲实例并关闭空闲太久的多余实例，调用时持有锁"""
+        profiles = self.profiles()
+        now = time.monotonic()
+        for name, instance in list(self._instances.items()):
+            # 配置已删除的实例在空闲时关闭
+            if instance.profile not in profiles and instance.state == PoolInstance.IDLE:
+                self._retire(instance)
+
+        for profile in profiles.values():
+            instances = [instance for instance in self._instances.values() if instance.profile == profile.name]
+            available = [instance for instance in instances if instance.state != PoolInstance.LEASED]
+            waiting = self._waiting.get(profile.name, 0)
+            needed = min(profile.size + waiting - len(available), profile.max_size - len(instances))
+            if needed > 0 and now - self._failed.get(profile.name, -RETRY_DELAY) >= RETRY_DELAY:
+                for _ in range(needed):
+                    self._spawn(profile)
+                continue
+
+            if waiting:
+                continue
+            idle = sorted((instance for instance in available if instance.state == PoolInstance.IDLE),
+                          key=lambda instance: instance.since)
+            surplus = len(available) - profile.size
+            for instance in idle[:max(0, surplus)]:
+                if now - instance.since >= profile.idle_timeout:
+                    self._retire(instance)
+
+    def _spawn(self, profile):
+        """启动一个新实例，调用时持有锁"""
+        index = 1
+        while f'{profile.avd}@{index}' in self._instances or self.supervisor.get(f'{profile.avd}@{index}'):
+            index += 1
+        instance = PoolInstance(f'{profile.avd}@{index}', profile.name)
+        self._instances[instance.name] = instance
+        threading.Thread(target=self._boot, args=(instance, profile), daemon=True).start()
+
+    def _boot(self, instance, profile):
+        try:
+            # 持有锁启动，与 stop 互斥：stop 之前启动的实例一定会被 stop 关闭，
+            # stop 之后不会再启动没有人管理的实例
+            with self._cond:
+                if self._stopping or self._instances.get(instance.name) is not instance:
+                    if self._instances.get(instance.name) is instance:
+                        del self._instances[instance.name]
+                    return
+                self.supervisor.launch(instance.name, profile.launch_args(), avd=profile.avd)
+            self.tracker.wait_until_booted(instance.name, BOOT_TIMEOUT)
+        except Exception as e:
+            if not self._stopping:
+                print(f"模拟器池 {profile.name} 启动实例失败: {str(e)}")
+            with self._cond:
+                self._failed[profile.name] = time.monotonic()
+                self._instances.pop(instance.name, None)
+            self.supervisor.shutdown(instance.name)
+            return
+        with self._cond:
+            if self._instances.get(instance.name) is instance:
+                instance.set_state(PoolInstance.IDLE)
+                self._cond.notify_all()
+
+    def _reset(self, instance):
+        """恢复到干净快照，失败或没有配置快照时关闭实例"""
+        profile = self.profiles().get(instance.profile)
+        if profile and profile.snapshot and not self._stopping:
+            try:
+                snapshot_manager.reset(instance.name, profile.snapshot)
+                with self._cond:
+                    if self._instances.get(instance.name) is instance:
+                        instance.set_state(PoolInstance.IDLE)
+                        self._cond.notify_all()
+                return
+            except Exception as e:
+                print(f"实例 {instance.name} 恢复快照失败，重新启动: {str(e)}")
+        # -read-only 实例退出时丢弃所有改动，关闭后由后台补充一个新实例
+        with self._cond:
+            self._instances.pop(instance.name, None)
+            self._cond.notify_all()
+        self.supervisor.shutdown(instance.name)
+
+    def _retire(self, instance):
+        """关闭空闲实例，调用时持有锁"""
+        self._instances.pop(instance.name, None)
+        print(f"关闭空闲的模拟器池实例 {instance.name}")
+        threading.Thread(target=self.supervisor.shutdown, args=(instance.name,), daemon=True).start()
+
+    def serve(self, port=None, host='127.0.0.1'):
+        """提供 HTTP 接口，其他进程（如测试脚本）可以租用实例，返回实际监听的端口
+
+        POST /acquire/<配置名称>?timeout=秒 返回 {"id": ..., "serial": ...}
+        POST /release/<实例 id>
+        GET /status 返回所有实例的状态
+        """
+        if self._server:
+            return self._server.server_address[1]
+        if port is None:
+            try:
+                port = int(get_setting('emulator_pool_port', DEFAULT_SERVE_PORT))
+            except (TypeError, ValueError):
+                port = DEFAULT_SERVE_PORT
+        server = ThreadingHTTPServer((host, port), PoolRequestHandler)
+        server.daemon_threads = True
+        server.pool = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._server = server
+        return server.server_address[1]
+
+    def start_serving(self):
+        """配置项 emulator_pool_serve 打开时提供 HTTP 接口，返回端口，未开启或失败时返回 None"""
+        if not get_setting('emulator_pool_serve', False):
+            return None
+        try:
+            port = self.serve()
+            print(f"模拟器池接口已开启，端口 {port}")
+            return port
+        except OSError as e:
+            print(f"开启模拟器池接口失败: {str(e)}")
+            return None
+
+    def stop_serving(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class PoolRequestHandler(BaseHTTPRequestHandler):
+    """通过 HTTP 租用和归还池中的实例"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != '/status':
+            self.send_json(404, {'error': '未知的路径'})
+            return
+        self.send_json(200, self.server.pool.status())
+
+    def do_POST(self):
+        path, _, query = self.path.partition('?')
+        match = POOL_PATH_PATTERN.match(unquote(path))
+        if not match:
+            self.send_json(404, {'error': '未知的路径'})
+            return
+        action, name = match.groups()
+        if action == 'release':
+            self.server.pool.release(name)
+            self.send_json(200, {'id': name})
+            return
+        timeout = None
+        for item in query.split('&'):
+            key, _, value = item.partition('=')
+            if key == 'timeout':
+                try:
+                    timeout = float(value)
+                except ValueError:
+                    pass
+        try:
+            instance = self.server.pool.acquire(name, timeout)
+        except Exception as e:
+            self.send_json(503, {'error': str(e)})
+            return
+        self.send_json(200, instance.to_dict())
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# 全局共享的模拟器池
+emulator_pool = EmulatorPool()
+
+
+def main():
+    """不启动界面，单独运行模拟器池，例如在 CI 节点上运行：python -m core.emulator_pool"""
+    parser = argparse.ArgumentParser(description="维护预先开机的模拟器池，通过 HTTP 租用实例")
+    parser.add_argument('--port', type=int, default=None, help=f"监听端口，默认 {DEFAULT_SERVE_PORT}")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认只允许本机访问")
+    args = parser.parse_args()
+
+    if not emulator_pool.start():
+        print("没有配置模拟器池，请在配置项 emulator_pools 中添加")
+        return 1
+    port = emulator_pool.serve(args.port, args.host)
+    print(f"模拟器池已启动，接口端口 {port}，按 Ctrl+C 退出")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("正在关闭模拟器池中的实例...")
+        emulator_pool.stop(wait=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
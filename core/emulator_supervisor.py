@@ -0,0 +1,399 @@
+import os
+import re
+import time
+import select
+import signal
+import socket
+import tempfile
+import threading
+import subprocess
+from collections import deque
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from utils import CACHE_DIR, EMULATOR_PATH, sdk_tools, get_setting
+from core.process_index import process_index
+from core.emulator_console import EmulatorConsole
+
+# 模拟器控制台端口范围，adb 端口为控制台端口 + 1
+FIRST_CONSOLE_PORT = 5554
+LAST_CONSOLE_PORT = 5682
+# 每个模拟器在内存中保留的最后几行输出，启动失败时用来显示原因
+LOG_TAIL_LINES = 200
+# 无法使用 pidfd/kqueue 时检查外部进程是否存在的间隔（秒）
+POLL_INTERVAL = 1
+# 通过控制台关闭后等待退出的默认时间（秒），可通过配置项 emulator_shutdown_timeout 修改，
+# 退出时要保存快速启动快照，不能太短
+SHUTDOWN_TIMEOUT = 30
+# 发送 SIGTERM 后等待退出的时间（秒），超时后发送 SIGKILL
+TERM_TIMEOUT = 10
+# 关闭过程中检查进程是否退出的间隔（秒）
+SHUTDOWN_POLL_INTERVAL = 0.2
+
+
+class ManagedEmulator:
+    """监管器中的一个模拟器进程"""
+
+    def __init__(self, name, pid, console_port=None, process=None, start_time=None, log_path=None, avd=None):
+        self.name = name  # 实例名称，通常与 AVD 名称相同，同一 AVD 的多个只读实例名称不同
+        self.avd = avd or name
+        self.pid = pid
+        self.console_port = console_port
+        self.process = process  # 由本应用启动时为 Popen，接管的外部进程为 None
+        self.start_time = start_time  # 进程启动时间，用来识别 pid 复用
+        self.started_at = time.time()
+        self.log_path = log_path
+        self.log_tail = deque(maxlen=LOG_TAIL_LINES)
+        self.returncode = None
+
+    @property
+    def adopted(self):
+        return self.process is None
+
+    @property
+    def adb_port(self):
+        return self.console_port + 1 if self.console_port else None
+
+    @property
+    def serial(self):
+        """adb 中的设备序列号，端口未知时为 None"""
+        return f'emulator-{self.console_port}' if self.console_port else None
+
+
+def port_available(port):
+    """本机端口是否可以监听"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('127.0.0.1', port))
+            return True
+        except OSError:
+            return False
+
+
+def discovery_dirs():
+    """模拟器写入 pid_<pid>.ini 发现文件的目录"""
+    dirs = []
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        dirs.append(os.path.join(runtime_dir, 'avd', 'running'))
+    dirs.append(os.path.expanduser('~/Library/Caches/TemporaryItems/avd/running'))
+    dirs.append(os.path.join(tempfile.gettempdir(), 'avd', 'running'))
+    return dirs
+
+
+def console_port_from_argv(argv):
+    """从启动参数中读取 -port 或 -ports 指定的控制台端口"""
+    for index, arg in enumerate(argv[:-1]):
+        if arg == '-port' and argv[index + 1].isdigit():
+            return int(argv[index + 1])
+        if arg == '-ports':
+            port = argv[index + 1].split(',')[0]
+            if port.isdigit():
+                return int(port)
+    return None
+
+
+def console_port_from_discovery(pid):
+    """读取模拟器的发现文件中的控制台端口"""
+    for directory in discovery_dirs():
+        try:
+            with open(os.path.join(directory, f'pid_{pid}.ini'), 'r') as f:
+                for line in f:
+                    key, _, value = line.partition('=')
+                    if key.strip() == 'port.serial' and value.strip().isdigit():
+                        return int(value.strip())
+        except OSError:
+            continue
+    return None
+
+
+class EmulatorSupervisor(QObject):
+    """模拟器进程监管器
+
+    由本应用启动的模拟器保留 Popen、控制台端口和输出，启动后立即报告，
+    进程退出时由等待线程回收（waitpid）并立即报告，不需要再扫描进程列表。
+    启动前已经在运行的模拟器会被接管，通过 pidfd（Linux）或 kqueue（macOS）
+    等待其退出，两者都不可用时定时检查进程是否存在。
+    关闭时优先通过控制台让模拟器正常退出，超时后才发送信号。
+    """
+    started = pyqtSignal(str)  # 模拟器名称
+    exited = pyqtSignal(str, int)  # 模拟器名称, 退出码（接管的进程为 -1）
+
+    def __init__(self, emulator_path=None, log_dir=None):
+        super().__init__()
+        self._emulator_path = emulator_path
+        self.log_dir = log_dir or os.path.join(CACHE_DIR, 'logs')
+        self._lock = threading.Lock()
+        self._emulators = {}  # 名称 -> ManagedEmulator
+        self._exited = {}  # 名称 -> 最近一次退出的 ManagedEmulator，用来查看退出前的输出
+        self._reaped = set()  # 已确认退出的外部进程 (pid, 启动时间)
+        self._launch_lock = threading.Lock()  # 分配端口到进程登记之间不能有其他启动
+
+    @property
+    def emulator_path(self):
+        return self._emulator_path or sdk_tools.emulator() or EMULATOR_PATH
+
+    def get(self, name):
+        with self._lock:
+            return self._emulators.get(name)
+
+    def running(self):
+        """返回监管中的模拟器名称集合"""
+        with self._lock:
+            return set(self._emulators)
+
+    def allocate_port(self):
+        """找到一个空闲的控制台端口，控制台和 adb 两个端口都要空闲"""
+        with self._lock:
+            used = {emulator.console_port for emulator in self._emulators.values()}
+        for port in range(FIRST_CONSOLE_PORT, LAST_CONSOLE_PORT + 1, 2):
+            if port not in used and port_available(port) and port_available(port + 1):
+                return port
+        raise Exception("没有空闲的模拟器端口")
+
+    def launch(self, name, args=(), avd=None):
+        """启动模拟器并开始监管，已在运行时返回已有的记录
+
+        Args:
+            args: 额外的启动参数，如 ['-no-snapshot-save']
+            avd: AVD 名称，默认与实例名称相同；同一 AVD 启动多个实例时需要不同的实例名称和 -read-only
+        """
+        with self._launch_lock:
+            existing = self.get(name)
+            if existing:
+                return existing
+
+            port = self.allocate_port()
+            os.makedirs(self.log_dir, exist_ok=True)
+            log_path = os.path.join(self.log_dir, f'{name}.log')
+            process = subprocess.Popen(
+                [self.emulator_path, '-avd', avd or name, '-port', str(port), *args],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                # 独立的会话，关闭终端或本应用时模拟器不会收到信号
+                start_new_session=True
+            )
+            emulator = ManagedEmulator(name, process.pid, port, process, log_path=log_path, avd=avd)
+            with self._lock:
+                self._emulators[name] = emulator
+        threading.Thread(target=self._read_output, args=(emulator,), daemon=True).start()
+        threading.Thread(target=self._wait_child, args=(emulator,), daemon=True).start()
+        self.started.emit(name)
+        return emulator
+
+    def adopt(self, process):
+        """接管一个在本应用之外启动的模拟器进程（process_index.EmulatorProcess）"""
+        with self._lock:
+            if process.avd in self._emulators:
+                return self._emulators[process.avd]
+            if (process.pid, process.start_time) in self._reaped:
+                return None
+            port = console_port_from_argv(process.argv or []) or console_port_from_discovery(process.pid)
+            emulator = ManagedEmulator(process.avd, process.pid, port, start_time=process.start_time)
+            self._emulators[process.avd] = emulator
+        threading.Thread(target=self._wait_external, args=(emulator,), daemon=True).start()
+        self.started.emit(process.avd)
+        return emulator
+
+    def adopt_running(self, processes=None):
+        """接管所有正在运行但不在监管中的模拟器，返回新接管的名称"""
+        if processes is None:
+            processes = process_index.refresh()
+        adopted = []
+        with self._lock:
+            # 同一 AVD 的只读实例由本应用启动时，进程索引中的进程属于这些实例
+            instances = {emulator.avd for emulator in self._emulators.values() if emulator.name != emulator.avd}
+        for name, process in processes.items():
+            if name in instances:
+                continue
+            current = self.get(name)
+            # 由本应用启动的模拟器，记录的是 emulator 启动器，补充 qemu 进程的端口信息
+            if current is not None:
+                if current.console_port is None:
+                    current.console_port = console_port_from_argv(process.argv or [])
+                continue
+            if self.adopt(process):
+                adopted.append(name)
+        return adopted
+
+    def stop(self, name, snapshot=None):
+        """在后台关闭模拟器，返回是否找到了进程，关闭过程见 shutdown"""
+        if not self._is_running(name):
+            return False
+        threading.Thread(target=self.shutdown, args=(name,), kwargs={'snapshot': snapshot},
+                         daemon=True).start()
+        return True
+
+    def shutdown(self, name, timeout=None, snapshot=None):
+        """关闭模拟器并等待退出，返回最终使用的方式: 'console'、'SIGTERM' 或 'SIGKILL'
+
+        先通过控制台 kill 让模拟器正常退出（会保存快速启动快照，下次启动不用冷启动），
+        超时或控制台不可用时才发送 SIGTERM，仍不退出时发送 SIGKILL。
+
+        Args:
+            timeout: 通过控制台关闭后等待的秒数，默认读取配置项 emulator_shutdown_timeout
+            snapshot: 退出前额外保存的快照名称
+        """
+        if timeout is None:
+            try:
+                timeout = float(get_setting('emulator_shutdown_timeout', SHUTDOWN_TIMEOUT))
+            except (TypeError, ValueError):
+                timeout = SHUTDOWN_TIMEOUT
+
+        port = self.console_port(name)
+        if port:
+            try:
+                with EmulatorConsole(port) as console:
+                    if snapshot:
+                        console.snapshot_save(snapshot)
+                    console.kill()
+                if self._wait_stopped(name, timeout):
+                    return 'console'
+                print(f"模拟器 {name} 在 {timeout:.0f} 秒内没有退出，发送 SIGTERM")
+            except Exception as e:
+                print(f"无法通过控制台关闭模拟器 {name}，发送 SIGTERM: {str(e)}")
+
+        self.send_signal(name, signal.SIGTERM)
+        if self._wait_stopped(name, TERM_TIMEOUT):
+            return 'SIGTERM'
+        print(f"模拟器 {name} 没有响应 SIGTERM，发送 SIGKILL")
+        self.send_signal(name, signal.SIGKILL)
+        self._wait_stopped(name, TERM_TIMEOUT)
+        return 'SIGKILL'
+
+    def console_port(self, name):
+        """模拟器的控制台端口，未知时返回 None"""
+        emulator = self.get(name)
+        if emulator and emulator.console_port:
+            return emulator.console_port
+        process = self.find_process(name)
+        if process:
+            return console_port_from_argv(process.argv or []) or console_port_from_discovery(process.pid)
+        return None
+
+    def send_signal(self, name, sig):
+        """向模拟器进程发送信号，返回是否找到了进程"""
+        # 由本应用启动时记录的是 emulator 启动器，实际的 qemu 进程需要从进程索引中查找
+        process = self.find_process(name)
+        emulator = self.get(name)
+        pids = {process.pid} if process else set()
+        if emulator and emulator.returncode is None:
+            pids.add(emulator.pid)
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+        return bool(pids)
+
+    def find_process(self, name):
+        """实例对应的 qemu 进程，同一 AVD 有多个实例时按控制台端口区分"""
+        emulator = self.get(name)
+        processes = process_index.find_all(emulator.avd if emulator else name)
+        if emulator is None or not emulator.console_port:
+            # 排除属于其他实例的进程
+            with self._lock:
+                others = [other for other in self._emulators.values() if other is not emulator]
+            pids = {other.pid for other in others}
+            ports = {other.console_port for other in others if other.console_port}
+            return next((process for process in processes if process.pid not in pids
+                         and console_port_from_argv(process.argv or []) not in ports), None)
+        for process in processes:
+            if process.pid == emulator.pid or console_port_from_argv(process.argv or []) == emulator.console_port:
+                return process
+        # ps 后端读不到完整参数时无法按端口区分，只有一个进程时才能确定
+        if len(processes) == 1 and console_port_from_argv(processes[0].argv or []) is None:
+            return processes[0]
+        return None
+
+    def log_tail(self, name):
+        """模拟器最近的输出，已退出时为退出前的输出"""
+        with self._lock:
+            emulator = self._emulators.get(name) or self._exited.get(name)
+        return '\n'.join(emulator.log_tail) if emulator else ''
+
+    def _is_running(self, name):
+        emulator = self.get(name)
+        return (emulator is not None and emulator.returncode is None) or self.find_process(name) is not None
+
+    def _wait_stopped(self, name, timeout):
+        """等待模拟器的所有进程退出，返回是否已退出"""
+        deadline = time.monotonic() + timeout
+        while self._is_running(name):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(SHUTDOWN_POLL_INTERVAL)
+        return True
+
+    def _read_output(self, emulator):
+        """把模拟器输出写入日志文件，同时保留最后几行"""
+        with open(emulator.log_path, 'w', encoding='utf-8', errors='replace') as log:
+            for line in iter(emulator.process.stdout.readline, b''):
+                text = line.decode('utf-8', 'replace').rstrip('\n')
+                emulator.log_tail.append(text)
+                log.write(text + '\n')
+                log.flush()
+                if emulator.console_port is None:
+                    match = re.search(r'emulator-(\d+)', text)
+                    if match:
+                        emulator.console_port = int(match.group(1))
+        emulator.process.stdout.close()
+
+    def _wait_child(self, emulator):
+        """等待并回收子进程"""
+        emulator.returncode = emulator.process.wait()
+        self._finish(emulator)
+
+    def _wait_external(self, emulator):
+        """等待外部进程退出，外部进程不是子进程，无法 waitpid"""
+        try:
+            if hasattr(os, 'pidfd_open'):
+                fd = os.pidfd_open(emulator.pid)
+                try:
+                    select.select([fd], [], [])
+                finally:
+                    os.close(fd)
+            elif hasattr(select, 'kqueue'):
+                kq = select.kqueue()
+                try:
+                    event = select.kevent(emulator.pid, select.KQ_FILTER_PROC, select.KQ_EV_ADD,
+                                          select.KQ_NOTE_EXIT)
+                    kq.control([event], 1, None)
+                finally:
+                    kq.close()
+            else:
+                while self._is_alive(emulator):
+                    time.sleep(POLL_INTERVAL)
+        except OSError:
+            # 进程已经不存在
+            pass
+        emulator.returncode = -1
+        self._finish(emulator)
+
+    def _is_alive(self, emulator):
+        try:
+            os.kill(emulator.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        # pid 可能已被其他进程复用
+        process = self.find_process(emulator.name)
+        return process is not None and process.pid == emulator.pid
+
+    def _finish(self, emulator):
+        with self._lock:
+            if self._emulators.get(emulator.name) is not emulator:
+                return
+            del self._emulators[emulator.name]
+            self._exited[emulator.name] = emulator
+            if emulator.adopted:
+                self._reaped.add((emulator.pid, emulator.start_time))
+        if not emulator.adopted and emulator.returncode:
+            print(f"模拟器 {emulator.name} 已退出，退出码 {emulator.returncode}")
+        self.exited.emit(emulator.name, emulator.returncode)
+
+
+# 全局共享的模拟器监管器
+emulator_supervisor = EmulatorSupervisor()
@@ -0,0 +1,125 @@
+import time
+import random
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils import get_setting
+
+# 官方仓库地址，配置项 repository_mirrors 中的镜像会排在它前面
+REPOSITORY_URL = "https://dl.google.com/android/repository/"
+# 连接超时和读取超时（秒），读取超时是两次收到数据之间的最长间隔
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+# 每个请求的最大重试次数和退避时间（秒）
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1
+MAX_BACKOFF = 30
+# 连接池中每个主机保留的连接数，需要大于下载队列并发数乘以每个下载的连接数
+POOL_SIZE = 16
+# 镜像连接失败后排到列表末尾的时间（秒）
+MIRROR_COOLDOWN = 5 * 60
+# 服务器临时不可用，可以重试的状态码
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt, base=RETRY_BACKOFF, cap=MAX_BACKOFF):
+    """第 attempt 次重试前等待的秒数
+
+    指数退避并加入随机抖动，多个连接同时出错时不会在同一时刻一起重试。
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def is_retryable(error):
+    """网络错误、超时和服务器临时错误可以重试，404 等客户端错误重试也没有用"""
+    response = getattr(error, 'response', None)
+    if isinstance(error, requests.HTTPError) and response is not None:
+        return response.status_code in RETRY_STATUS
+    return True
+
+
+class HttpClient:
+    """共享的 HTTP 客户端
+
+    所有请求共用一个带连接池的 Session（keep-alive），默认带连接和读取超时，
+    连接失败、超时和 5xx 时按带抖动的指数退避重试。
+    仓库地址可以配置多个镜像，按顺序尝试，官方地址始终在最后。
+    """
+
+    def __init__(self, mirrors=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, pool_size=POOL_SIZE):
+        self._mirrors = mirrors
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self._failed = {}  # 镜像地址 -> 最近一次连接失败的时间
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def mirrors(self):
+        """仓库地址列表，按尝试顺序排列"""
+        mirrors = self._mirrors if self._mirrors is not None else get_setting('repository_mirrors', [])
+        if isinstance(mirrors, str):
+            mirrors = mirrors.split(',')
+        result = []
+        for mirror in list(mirrors or []) + [REPOSITORY_URL]:
+            mirror = str(mirror).strip()
+            if not mirror:
+                continue
+            if not mirror.endswith('/'):
+                mirror += '/'
+            if mirror not in result:
+                result.append(mirror)
+        # 最近连接失败的镜像排到后面，不必每次都等它超时
+        now = time.monotonic()
+        return sorted(result, key=lambda mirror: now - self._failed.get(mirror, -MIRROR_COOLDOWN) < MIRROR_COOLDOWN)
+
+    def mark_failed(self, url):
+        """记录 url 所在的镜像连接失败"""
+        for mirror in self.mirrors():
+            if url.startswith(mirror):
+                self._failed[mirror] = time.monotonic()
+
+    def request(self, method, url, **kwargs):
+        """发送请求，网络错误和 5xx 时重试，重试用完后返回最后一次的响应或抛出异常"""
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    return response
+                response.close()
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                error = str(e)
+            delay = backoff_delay(attempt)
+            print(f"请求 {url} 出错，{delay:.1f} 秒后重试: {error}")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def alternatives(self, url):
+        """同一文件在各个镜像上的地址，url 本身排在最前面
+
+        url 不在任何已配置的镜像下时只返回它本身。
+        """
+        mirrors = self.mirrors()
+        for base in mirrors:
+            if url.startswith(base):
+                relative = url[len(base):]
+                return [url] + [urljoin(mirror, relative) for mirror in mirrors if mirror != base]
+        return [url]
+
+
+# 全局共享的 HTTP 客户端
+http_client = HttpClient()
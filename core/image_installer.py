@@ -0,0 +1,65 @@
+import os
+
+from utils import ANDROID_HOME
+from core.sdk_repository import sdk_repository
+from core.archive_pipeline import download_and_extract
+from core.downloader import downloader
+from core.sdk_installer import sdkmanager_install
+from core.sdk_packages import build_package_xml
+
+
+class SystemImageInstaller:
+    """直接安装系统镜像
+
+    从仓库 XML 中找到镜像压缩包地址，用多连接下载器边下载边解压到
+    system-images/android-N/<tag>/<abi>，并写入 package.xml，不再启动 sdkmanager。
+    """
+
+    def __init__(self, sdk_root=ANDROID_HOME, repository=None):
+        self.sdk_root = sdk_root
+        self.repository = repository or sdk_repository
+
+    def find_package(self, system_image):
+        """在仓库中查找系统镜像，如 system-images;android-34;google_apis;arm64-v8a"""
+        for package in self.repository.system_images():
+            if package.path == system_image:
+                return package
+        raise Exception(f"仓库中找不到系统镜像: {system_image}")
+
+    def install_path(self, system_image):
+        return os.path.join(self.sdk_root, *system_image.split(';'))
+
+    def install(self, system_image, progress=None, cancelled=None, throttle=None):
+        """下载并安装系统镜像，返回安装目录
+
+        Args:
+            progress: 进度回调，参数为 (已下载字节数, 总字节数)
+            cancelled: 返回 True 时中止安装，已下载的部分会保留
+            throttle: 限速回调，见 Downloader.download
+        """
+        if not self.sdk_root:
+            raise Exception("未找到 Android SDK 目录")
+        package = self.find_package(system_image)
+
+        def write_package_xml(staging):
+            with open(os.path.join(staging, 'package.xml'), 'wb') as f:
+                f.write(build_package_xml(package))
+
+        # 压缩包中只有一级 ABI 目录，如 arm64-v8a/system.img
+        return download_and_extract(package.url, self.install_path(system_image), strip_components=1,
+                                    progress=progress, cancelled=cancelled,
+                                    checksum=package.checksum, checksum_type=package.checksum_type,
+                                    size=package.size, before_replace=write_package_xml, throttle=throttle)
+
+    def discard(self, system_image):
+        """删除未完成的下载"""
+        package = self.find_package(system_image)
+        downloader.discard(downloader.default_path(package.url))
+
+    def install_with_sdkmanager(self, sdkmanager, system_image, cancelled=None):
+        """通过 sdkmanager 安装，仓库不可用时使用"""
+        sdkmanager_install(sdkmanager, [system_image], cancelled)
+
+
+# 全局共享的系统镜像安装器
+image_installer = SystemImageInstaller()
@@ -0,0 +1,271 @@
+import os
+import re
+import sys
+import shutil
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from utils import CACHE_DIR, get_setting
+from core.downloader import downloader as default_downloader, DownloadCancelled
+from core.http_client import http_client
+
+# 局域网共享缓存的默认端口，可通过配置项 package_cache_port 修改
+DEFAULT_SERVE_PORT = 8765
+# 询问局域网节点是否有缓存时的超时（秒），节点不在线时不能拖慢正常下载
+PEER_TIMEOUT = 2
+COPY_BUFFER_SIZE = 1024 * 1024
+
+CHECKSUM_PATTERN = re.compile(r'^[0-9a-f]{32,128}$')
+PACKAGE_PATH_PATTERN = re.compile(r'^/packages/(\w+)/([0-9a-fA-F]+)$')
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def link_or_copy(source, target):
+    """把文件放到 target，同一文件系统上使用硬链接，否则复制"""
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    tmp_path = f'{target}.{threading.get_ident()}.tmp'
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+class PackageCache:
+    """按校验值保存的安装包缓存
+
+    仓库 XML 中每个压缩包都有校验值，校验通过的下载以 <算法>/<校验值>
+    保存在缓存目录中，之后安装同一个包时直接使用，不再联网下载。
+    配置了局域网节点（package_cache_peers）时，本地没有的包先向节点询问，
+    节点上有就从节点下载，数据同样经过校验。
+    """
+
+    def __init__(self, cache_dir=None, peers=None, downloader=None):
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, 'packages')
+        self._peers = peers
+        self._downloader = downloader
+        self._server = None
+
+    @property
+    def downloader(self):
+        return self._downloader or default_downloader
+
+    def peers(self):
+        """局域网节点的地址列表，配置项中可以写 host:port 或完整 URL"""
+        peers = self._peers if self._peers is not None else get_setting('package_cache_peers', [])
+        if isinstance(peers, str):
+            peers = peers.split(',')
+        result = []
+        for peer in peers or []:
+            peer = str(peer).strip().rstrip('/')
+            if not peer:
+                continue
+            if '://' not in peer:
+                peer = f'http://{peer}'
+            result.append(peer)
+        return result
+
+    def path(self, checksum, checksum_type='sha1'):
+        """校验值对应的缓存路径，校验值格式不正确时返回 None"""
+        checksum = (checksum or '').lower()
+        checksum_type = (checksum_type or 'sha1').lower()
+        if checksum_type not in hashlib.algorithms_available or not CHECKSUM_PATTERN.match(checksum):
+            return None
+        return os.path.join(self.cache_dir, checksum_type, checksum)
+
+    def lookup(self, checksum, checksum_type='sha1'):
+        """返回本地缓存中的文件路径，没有时返回 None"""
+        path = self.path(checksum, checksum_type)
+        return path if path and os.path.isfile(path) else None
+
+    def store(self, source, checksum, checksum_type='sha1'):
+        """把校验通过的文件加入缓存，返回缓存路径"""
+        path = self.path(checksum, checksum_type)
+        if not path or os.path.isfile(path):
+            return path
+        try:
+            return link_or_copy(source, path)
+        except OSError as e:
+            print(f"保存安装包缓存失败: {str(e)}")
+            return None
+
+    def find_peer(self, checksum, checksum_type='sha1'):
+        """向局域网节点询问，返回第一个有该文件的节点上的下载地址"""
+        if not self.path(checksum, checksum_type):
+            return None
+        for peer in self.peers():
+            url = f'{peer}/packages/{checksum_type.lower()}/{checksum.lower()}'
+            try:
+                response = self.downloader.session.head(url, timeout=PEER_TIMEOUT)
+                if response.status_code == 200:
+                    return url
+            except requests.RequestException:
+                continue
+        return None
+
+    def sources(self, url, checksum, checksum_type='sha1'):
+        """依次尝试的下载地址：有缓存的局域网节点在前，然后是原始地址和其他镜像上的地址"""
+        peer_url = self.find_peer(checksum, checksum_type)
+        urls = http_client.alternatives(url)
+        return [peer_url] + urls if peer_url else urls
+
+    def download(self, url, save_path=None, checksum=None, checksum_type='sha1', progress=None, **options):
+        """下载文件到 save_path，先查本地缓存和局域网节点，返回保存路径
+
+        其余参数同 Downloader.download。下载完成的文件会加入缓存。
+        """
+        save_path = save_path or self.downloader.default_path(url)
+        cached = self.lookup(checksum, checksum_type)
+        if cached:
+            link_or_copy(cached, save_path)
+            if progress:
+                size = os.path.getsize(save_path)
+                progress(size, size)
+            return save_path
+
+        sources = self.sources(url, checksum, checksum_type)
+        for index, source in enumerate(sources):
+            try:
+                self.downloader.download(source, save_path, progress=progress, checksum=checksum,
+                                         checksum_type=checksum_type, **options)
+                break
+            except DownloadCancelled:
+                raise
+            except Exception as e:
+                if index == len(sources) - 1:
+                    raise
+                print(f"从 {source} 下载失败，改用下一个地址: {str(e)}")
+        self.store(save_path, checksum, checksum_type)
+        return save_path
+
+    def serve(self, port=None, host=''):
+        """在局域网中提供缓存下载，返回实际监听的端口
+
+        只提供 /packages/<算法>/<校验值>，支持 HEAD 和 Range 请求。
+        """
+        if self._server:
+            return self._server.server_address[1]
+        if port is None:
+            try:
+                port = int(get_setting('package_cache_port', DEFAULT_SERVE_PORT))
+            except (TypeError, ValueError):
+                port = DEFAULT_SERVE_PORT
+        server = ThreadingHTTPServer((host, port), PackageRequestHandler)
+        server.daemon_threads = True
+        server.cache = self
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._server = server
+        return server.server_address[1]
+
+    def start_sharing(self):
+        """配置项 package_cache_serve 打开时开始共享，返回端口，未开启或失败时返回 None"""
+        if not get_setting('package_cache_serve', False):
+            return None
+        try:
+            port = self.serve()
+            print(f"安装包缓存共享已开启，端口 {port}")
+            return port
+        except OSError as e:
+            print(f"开启安装包缓存共享失败: {str(e)}")
+            return None
+
+    def stop_serving(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class PackageRequestHandler(BaseHTTPRequestHandler):
+    """局域网节点请求缓存文件"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_package(head=True)
+
+    def do_GET(self):
+        self.send_package(head=False)
+
+    def send_package(self, head):
+        match = PACKAGE_PATH_PATTERN.match(self.path)
+        path = self.server.cache.lookup(match.group(2), match.group(1)) if match else None
+        if not path:
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end, status = 0, size - 1, 200
+
+        match = RANGE_PATTERN.match(self.headers.get('Range', '').strip())
+        if match and (match.group(1) or match.group(2)):
+            if not match.group(1):
+                # 后缀范围，如 bytes=-1024 表示最后 1024 个字节
+                start = max(0, size - int(match.group(2)))
+            else:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        # 内容由校验值决定，可以直接作为 ETag
+        self.send_header('ETag', f'"{os.path.basename(path)}"')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        if head:
+            return
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(COPY_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                remaining -= len(data)
+
+
+# 全局共享的安装包缓存
+package_cache = PackageCache()
+
+
+def main():
+    """不启动界面，单独共享缓存目录，例如在 CI 节点上运行：python -m core.package_cache"""
+    parser = argparse.ArgumentParser(description="在局域网中共享 iDroidSim 安装包缓存")
+    parser.add_argument('--port', type=int, default=None, help=f"监听端口，默认 {DEFAULT_SERVE_PORT}")
+    parser.add_argument('--dir', default=None, help="缓存目录，默认为 ~/.cache/idroidsim/packages")
+    args = parser.parse_args()
+
+    cache = PackageCache(cache_dir=args.dir) if args.dir else package_cache
+    port = cache.serve(args.port)
+    print(f"正在共享 {cache.cache_dir}，端口 {port}，按 Ctrl+C 退出")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        cache.stop_serving()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
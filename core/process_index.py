@@ -0,0 +1,246 @@
+import os
+import sys
+import ctypes
+import ctypes.util
+import subprocess
+import threading
+from collections import namedtuple
+
+# 运行中的模拟器进程信息
+EmulatorProcess = namedtuple('EmulatorProcess', ['pid', 'start_time', 'avd', 'argv'])
+
+
+def parse_avd_name(argv):
+    """从 qemu 进程的参数列表中解析 AVD 名称，不是模拟器进程时返回 None"""
+    if not argv or not os.path.basename(argv[0]).startswith('qemu-system-'):
+        return None
+    for i, arg in enumerate(argv[1:], start=1):
+        if arg == '-avd' and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith('@') and len(arg) > 1:
+            return arg[1:]
+    return None
+
+
+class _ProcBackend:
+    """基于 /proc 的进程读取 (Linux)"""
+
+    def list_pids(self):
+        return [int(name) for name in os.listdir('/proc') if name.isdigit()]
+
+    def start_time(self, pid):
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+        # 进程名可能包含空格和括号，从最后一个 ')' 之后开始解析
+        fields = stat[stat.rfind(b')') + 2:].split()
+        # 已退出但还没被父进程回收的僵尸进程视为不存在
+        if fields[0] == b'Z':
+            raise OSError(f"进程 {pid} 已退出")
+        # starttime 是第 22 个字段，去掉 pid 和 comm 后下标为 19
+        return int(fields[19])
+
+    def argv(self, pid):
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            data = f.read()
+        return [arg.decode('utf-8', 'replace') for arg in data.split(b'\0')[:-1]]
+
+
+class _ProcBsdInfo(ctypes.Structure):
+    _fields_ = [
+        ('pbi_flags', ctypes.c_uint32),
+        ('pbi_status', ctypes.c_uint32),
+        ('pbi_xstatus', ctypes.c_uint32),
+        ('pbi_pid', ctypes.c_uint32),
+        ('pbi_ppid', ctypes.c_uint32),
+        ('pbi_uid', ctypes.c_uint32),
+        ('pbi_gid', ctypes.c_uint32),
+        ('pbi_ruid', ctypes.c_uint32),
+        ('pbi_rgid', ctypes.c_uint32),
+        ('pbi_svuid', ctypes.c_uint32),
+        ('pbi_svgid', ctypes.c_uint32),
+        ('rfu_1', ctypes.c_uint32),
+        ('pbi_comm', ctypes.c_char * 16),
+        ('pbi_name', ctypes.c_char * 32),
+        ('pbi_nfiles', ctypes.c_uint32),
+        ('pbi_pgid', ctypes.c_uint32),
+        ('pbi_pjobc', ctypes.c_uint32),
+        ('e_tdev', ctypes.c_uint32),
+        ('e_tpgid', ctypes.c_uint32),
+        ('pbi_nice', ctypes.c_int32),
+        ('pbi_start_tvsec', ctypes.c_uint64),
+        ('pbi_start_tvusec', ctypes.c_uint64),
+    ]
+
+
+class _LibprocBackend:
+    """基于 libproc 和 sysctl(KERN_PROCARGS2) 的进程读取 (macOS)"""
+    PROC_PIDTBSDINFO = 3
+    SZOMB = 5
+    CTL_KERN = 1
+    KERN_ARGMAX = 8
+    KERN_PROCARGS2 = 49
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libproc = ctypes.CDLL(ctypes.util.find_library('proc') or ctypes.util.find_library('c'))
+        self.arg_max = self._sysctl_int([self.CTL_KERN, self.KERN_ARGMAX]) or 262144
+        # start_time 读取到的进程名，argv 用来跳过非 qemu 进程
+        self._comm = {}
+
+    def _sysctl_int(self, mib):
+        value = ctypes.c_int(0)
+        size = ctypes.c_size_t(ctypes.sizeof(value))
+        mib_arr = (ctypes.c_int * len(mib))(*mib)
+        if self.libc.sysctl(mib_arr, len(mib), ctypes.byref(value), ctypes.byref(size), None, 0) != 0:
+            return None
+        return value.value
+
+    def list_pids(self):
+        self._comm = {}
+        count = self.libproc.proc_listallpids(None, 0)
+        if count <= 0:
+            return []
+        # 预留余量，防止两次调用之间有新进程出现
+        buf = (ctypes.c_int * (count + 64))()
+        count = self.libproc.proc_listallpids(buf, ctypes.sizeof(buf))
+        return [pid for pid in buf[:max(count, 0)] if pid > 0]
+
+    def start_time(self, pid):
+        info = _ProcBsdInfo()
+        size = self.libproc.proc_pidinfo(pid, self.PROC_PIDTBSDINFO, 0,
+                                         ctypes.byref(info), ctypes.sizeof(info))
+        if size != ctypes.sizeof(info):
+            raise OSError(f"无法读取进程 {pid} 的信息")
+        # 已退出但还没被父进程回收的僵尸进程视为不存在
+        if info.pbi_status == self.SZOMB:
+            raise OSError(f"进程 {pid} 已退出")
+        self._comm[pid] = info.pbi_comm.decode('utf-8', 'replace')
+        return info.pbi_start_tvsec * 1000000 + info.pbi_start_tvusec
+
+    def argv(self, pid):
+        # 进程名不是 qemu 时无需读取参数
+        if not self._comm.pop(pid, '').startswith('qemu-system'):
+            return []
+        buf = ctypes.create_string_buffer(self.arg_max)
+        size = ctypes.c_size_t(self.arg_max)
+        mib = (ctypes.c_int * 3)(self.CTL_KERN, self.KERN_PROCARGS2, pid)
+        if self.libc.sysctl(mib, 3, buf, ctypes.byref(size), None, 0) != 0:
+            raise OSError(f"无法读取进程 {pid} 的参数")
+        data = buf.raw[:size.value]
+        # 格式: argc(int) + 可执行文件路径 + 若干 '\0' 填充 + argv[0..argc-1]
+        argc = int.from_bytes(data[:4], sys.byteorder)
+        rest = data[4:]
+        rest = rest[rest.find(b'\0'):].lstrip(b'\0')
+        args = rest.split(b'\0')[:argc]
+        return [arg.decode('utf-8', 'replace') for arg in args]
+
+
+class _PsBackend:
+    """无法直接读取进程信息时回退到 ps 命令"""
+
+    def __init__(self):
+        self._snapshot = {}
+
+    def list_pids(self):
+        result = subprocess.run(['ps', '-axww', '-o', 'pid=,lstart=,args='],
+                                capture_output=True, text=True)
+        self._snapshot = {}
+        for line in result.stdout.split('\n'):
+            parts = line.split(None, 6)
+            if len(parts) < 7 or not parts[0].isdigit():
+                continue
+            # lstart 固定为 5 个字段，例如 "Mon Oct 18 10:00:00 2026"
+            self._snapshot[int(parts[0])] = (' '.join(parts[1:6]), parts[6])
+        return list(self._snapshot)
+
+    def start_time(self, pid):
+        return self._snapshot[pid][0]
+
+    def argv(self, pid):
+        args = self._snapshot[pid][1]
+        if 'qemu-system-' not in args or '-avd ' not in args:
+            return args.split()[:1]
+        # ps 输出无法区分参数边界，只能按旧方式截取到下一个参数之前
+        executable = args.split()[0]
+        avd = args.split('-avd ', 1)[1].split(' -')[0].strip()
+        return [executable, '-avd', avd]
+
+
+def _create_backend():
+    """根据平台选择进程读取方式"""
+    if os.path.exists('/proc/self/cmdline'):
+        return _ProcBackend()
+    if sys.platform == 'darwin':
+        try:
+            return _LibprocBackend()
+        except Exception as e:
+            print(f"无法加载 libproc，回退到 ps: {str(e)}")
+    return _PsBackend()
+
+
+class EmulatorProcessIndex:
+    """运行中模拟器进程的索引
+
+    每次刷新只列出当前 pid 并读取启动时间，参数列表按 (pid, 启动时间) 缓存，
+    只有新出现的进程才会读取 cmdline，避免 pid 复用时误判。
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or _create_backend()
+        self._lock = threading.Lock()
+        self._cache = {}  # pid -> (start_time, avd 或 None, argv)
+        self._running = {}  # avd -> EmulatorProcess
+        self._processes = []  # 所有模拟器进程，同一 AVD 可能有多个只读实例
+
+    def refresh(self):
+        """重新扫描进程，返回 {AVD 名称: EmulatorProcess}"""
+        with self._lock:
+            cache = {}
+            running = {}
+            processes = []
+            for pid in self.backend.list_pids():
+                try:
+                    start_time = self.backend.start_time(pid)
+                    cached = self._cache.get(pid)
+                    if cached and cached[0] == start_time:
+                        entry = cached
+                    else:
+                        argv = self.backend.argv(pid)
+                        avd = parse_avd_name(argv)
+                        entry = (start_time, avd, argv if avd else None)
+                except (OSError, IndexError, KeyError, ValueError):
+                    # 进程已退出或无权限读取
+                    continue
+                cache[pid] = entry
+                if entry[1]:
+                    running[entry[1]] = EmulatorProcess(pid, entry[0], entry[1], entry[2])
+                    processes.append(running[entry[1]])
+            self._cache = cache
+            self._running = running
+            self._processes = processes
+            return dict(running)
+
+    def running_avds(self, refresh=True):
+        """返回正在运行的 AVD 名称集合"""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return set(self._running)
+
+    def find(self, avd_name, refresh=True):
+        """查找指定 AVD 的模拟器进程，未运行时返回 None"""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return self._running.get(avd_name)
+
+    def find_all(self, avd_name, refresh=True):
+        """查找指定 AVD 的所有模拟器进程（以 -read-only 启动的多个实例）"""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return [process for process in self._processes if process.avd == avd_name]
+
+
+# 全局共享的进程索引
+process_index = EmulatorProcessIndex()
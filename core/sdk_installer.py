@@ -0,0 +1,291 @@
+import os
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils import ANDROID_HOME, sdk_tools
+from core.sdk_repository import sdk_repository
+from core.sdk_packages import build_package_xml
+from core.archive_pipeline import download_and_extract
+from core.downloader import DownloadCancelled
+
+CMDLINE_TOOLS = 'cmdline-tools;latest'
+# 一键安装中的组件名称 -> 仓库中的路径，platform 在安装时解析为最新的 platforms;android-N
+COMPONENT_PATHS = {
+    'cmdline-tools': CMDLINE_TOOLS,
+    'platform-tools': 'platform-tools',
+    'emulator': 'emulator',
+    'platform': None,
+}
+
+
+def sdkmanager_install(sdkmanager, paths, cancelled=None, sdk_root=None):
+    """用一次 sdkmanager 调用安装多个组件，等待期间响应取消"""
+    command = [sdkmanager, '--install', *paths]
+    if sdk_root:
+        command.append(f'--sdk_root={sdk_root}')
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True
+    )
+    # 每个组件都可能需要确认许可协议，自动输入 'y'
+    confirm = 'y\n' * (len(paths) + 1)
+    while True:
+        try:
+            _, error = process.communicate(input=confirm, timeout=0.5)
+            break
+        except subprocess.TimeoutExpired:
+            confirm = None
+            if cancelled and cancelled():
+                process.terminate()
+                process.wait()
+                raise DownloadCancelled("下载已取消")
+    if process.returncode != 0:
+        raise Exception(f"下载失败: {error}")
+
+
+class InstallTask:
+    """安装计划中的一项"""
+
+    def __init__(self, name, run, depends=(), size=0):
+        """
+        Args:
+            run: 执行安装的函数，参数为 (progress, cancelled)，progress 的参数为 (已下载字节数, 总字节数)
+            depends: 必须先安装成功的任务名称，不在计划中的依赖视为已安装
+            size: 预计下载的字节数，用于计算总进度
+        """
+        self.name = name
+        self.run = run
+        self.depends = tuple(depends)
+        self.size = size
+
+
+class InstallScheduler:
+    """按依赖关系安装
+
+    依赖都已完成的任务立即在线程池中开始，互不依赖的任务并行执行，
+    总耗时接近最慢的一条依赖链。某个任务失败时，依赖它的任务不会执行。
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+
+    def run(self, tasks, progress=None, cancelled=None):
+        """执行安装计划，返回 {任务名称: 错误信息}，全部成功时为空
+
+        Args:
+            progress: 总进度回调，参数为 (已下载字节数, 总字节数, 正在安装的任务名称列表)
+            cancelled: 返回 True 时中止，正在运行的任务结束后抛出 DownloadCancelled
+        """
+        tasks = {task.name: task for task in tasks}
+        if not tasks:
+            return {}
+        lock = threading.Lock()
+        downloaded = {name: 0 for name in tasks}
+        totals = {name: task.size for name, task in tasks.items()}
+        states = {}  # 任务名称 -> True 成功 / False 失败
+        errors = {}
+        running = {}  # Future -> 任务名称
+
+        def report(name, current, total):
+            with lock:
+                downloaded[name] = current
+                totals[name] = max(total or 0, tasks[name].size)
+                snapshot = (sum(downloaded.values()), sum(totals.values()), sorted(running.values()))
+            if progress:
+                progress(*snapshot)
+
+        def execute(task):
+            task.run(lambda current, total: report(task.name, current, total), cancelled)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(tasks)) as executor:
+            while len(states) < len(tasks):
+                stopping = cancelled is not None and cancelled()
+                for name, task in tasks.items():
+                    if name in states or name in running.values() or stopping:
+                        continue
+                    depends = [depend for depend in task.depends if depend in tasks]
+                    failed = [depend for depend in depends if states.get(depend) is False]
+                    if failed:
+                        states[name] = False
+                        errors[name] = f"依赖的 {failed[0]} 安装失败"
+                    elif all(states.get(depend) for depend in depends):
+                        with lock:
+                            running[executor.submit(execute, task)] = name
+                if not running:
+                    # 已取消，或剩余任务存在循环依赖
+                    for name in tasks:
+                        if name not in states:
+                            states[name] = False
+                            errors[name] = "已取消" if stopping else "存在循环依赖"
+                    break
+                if progress:
+                    progress(sum(downloaded.values()), sum(totals.values()), sorted(running.values()))
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    with lock:
+                        name = running.pop(future)
+                    try:
+                        future.result()
+                        states[name] = True
+                        with lock:
+                            downloaded[name] = totals[name]
+                    except DownloadCancelled:
+                        states[name] = False
+                        errors[name] = "已取消"
+                    except Exception as e:
+                        states[name] = False
+                        errors[name] = str(e)
+
+        if cancelled and cancelled():
+            raise DownloadCancelled("安装已取消")
+        return errors
+
+
+class SdkComponentInstaller:
+    """一键安装 SDK 组件
+
+    cmdline-tools、platform-tools、emulator 和最新的 platform 直接从仓库下载，
+    并行边下载边解压，不依赖 sdkmanager。直接安装失败的组件在 cmdline-tools
+    安装完成后合并为一次 sdkmanager --install 调用，只启动一次 JVM。
+    """
+
+    def __init__(self, sdk_root=ANDROID_HOME, repository=None, scheduler=None):
+        self.sdk_root = sdk_root
+        self.repository = repository or sdk_repository
+        self.scheduler = scheduler or InstallScheduler()
+
+    def install_path(self, path):
+        return os.path.join(self.sdk_root, *path.split(';'))
+
+    def resolve(self, components):
+        """把组件名称解析为仓库中的组件，仓库不可用时返回空字典"""
+        try:
+            packages = {package.path: package for package in self.repository.packages()}
+        except Exception as e:
+            print(f"获取 SDK 组件列表失败: {str(e)}")
+            return {}
+        resolved = {}
+        for name in components:
+            path = COMPONENT_PATHS.get(name)
+            if name == 'platform':
+                path = latest_platform(packages)
+            if path in packages:
+                resolved[name] = packages[path]
+        return resolved
+
+    def install_package(self, package, progress=None, cancelled=None):
+        """下载并解压一个组件，返回安装目录
+
+        同时写入 package.xml，sdkmanager 和 installed_packages 才能识别直接安装的组件。
+        """
+
+        def write_package_xml(staging):
+            with open(os.path.join(staging, 'package.xml'), 'wb') as f:
+                f.write(build_package_xml(package))
+
+        # 压缩包中有一级顶层目录，如 platform-tools/adb
+        return download_and_extract(package.url, self.install_path(package.path), strip_components=1,
+                                    progress=progress, cancelled=cancelled,
+                                    checksum=package.checksum, checksum_type=package.checksum_type,
+                                    size=package.size, before_replace=write_package_xml)
+
+    def find_sdkmanager(self):
+        sdkmanager = os.path.join(self.install_path(CMDLINE_TOOLS), 'bin', 'sdkmanager')
+        if os.path.exists(sdkmanager):
+            return sdkmanager
+        sdk_tools.invalidate()
+        return sdk_tools.sdkmanager()
+
+    def install_all(self, components, progress=None, cancelled=None):
+        """安装缺失的组件，返回 {组件名称: 错误信息}
+
+        Args:
+            components: 组件名称列表，取值见 COMPONENT_PATHS
+            progress: 总进度回调，参数同 InstallScheduler.run
+        """
+        packages = self.resolve(components)
+        fallback = []  # 需要由 sdkmanager 安装的组件名称
+        fallback_lock = threading.Lock()
+
+        def direct(name):
+            def run(progress, cancelled):
+                try:
+                    self.install_package(packages[name], progress, cancelled)
+                except DownloadCancelled:
+                    raise
+                except Exception as e:
+                    if name == 'cmdline-tools':
+                        raise
+                    print(f"直接安装 {name} 失败，改用 sdkmanager: {str(e)}")
+                    with fallback_lock:
+                        fallback.append(name)
+            return run
+
+        def batch(progress, cancelled):
+            if not fallback:
+                return
+            sdkmanager = self.find_sdkmanager()
+            if not sdkmanager:
+                raise Exception("未找到 sdkmanager")
+            paths = []
+            for name in fallback:
+                if name in packages:
+                    paths.append(packages[name].path)
+                elif name == 'platform':
+                    paths.append(latest_platform_with_sdkmanager(sdkmanager))
+                else:
+                    paths.append(COMPONENT_PATHS[name])
+            sdkmanager_install(sdkmanager, paths, cancelled, self.sdk_root)
+
+        tasks = []
+        for name in components:
+            if name in packages:
+                tasks.append(InstallTask(name, direct(name), size=packages[name].size))
+            elif name == 'cmdline-tools':
+                raise Exception("无法获取 Command-line Tools 下载地址")
+            else:
+                fallback.append(name)
+        # sdkmanager 需要 cmdline-tools，并且要等直接安装的结果才知道要安装哪些组件
+        tasks.append(InstallTask('sdkmanager', batch, depends=[task.name for task in tasks]))
+
+        errors = self.scheduler.run(tasks, progress, cancelled)
+        if 'sdkmanager' in errors:
+            message = errors.pop('sdkmanager')
+            for name in fallback:
+                errors.setdefault(name, message)
+        return errors
+
+
+def latest_platform(packages):
+    """在仓库组件中找到最新的正式版 platform 路径"""
+    latest = None
+    for path in packages:
+        if not path.startswith('platforms;android-'):
+            continue
+        version = path.split('platforms;android-', 1)[1]
+        if version.isdigit() and (latest is None or int(version) > latest):
+            latest = int(version)
+    return f'platforms;android-{latest}' if latest else None
+
+
+def latest_platform_with_sdkmanager(sdkmanager):
+    """通过 sdkmanager --list 找到最新的 platform 路径"""
+    result = subprocess.run([sdkmanager, '--list'], capture_output=True, text=True)
+    latest = None
+    for line in result.stdout.split('\n'):
+        if 'platforms;android-' in line:
+            version = line.split('platforms;android-')[1].split()[0].split('-')[0]
+            if version.isdigit() and (latest is None or int(version) > latest):
+                latest = int(version)
+    if not latest:
+        raise Exception("无法获取最新平台版本")
+    return f'platforms;android-{latest}'
+
+
+# 全局共享的 SDK 组件安装器
+sdk_installer = SdkComponentInstaller()
@@ -0,0 +1,169 @@
+import os
+import glob
+import threading
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from utils import ANDROID_HOME
+
+# SDK 中各组件 package.xml 的位置
+PACKAGE_PATTERNS = [
+    'system-images/*/*/*/package.xml',
+    'platforms/*/package.xml',
+    'platform-tools/package.xml',
+    'emulator/package.xml',
+    'cmdline-tools/*/package.xml',
+    'build-tools/*/package.xml',
+    'sources/*/package.xml',
+    'add-ons/*/package.xml',
+    'tools/package.xml',
+]
+
+PACKAGE_XML_TEMPLATE = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<ns2:repository xmlns:ns2="http://schemas.android.com/repository/android/common/02" \
+xmlns:ns3="http://schemas.android.com/repository/android/generic/02" \
+xmlns:ns5="http://schemas.android.com/sdk/android/repo/repository2/03" \
+xmlns:sys-img="http://schemas.android.com/sdk/android/repo/sys-img2/03">
+<localPackage path="{path}" obsolete="false">
+<type-details xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:type="{details_type}">\
+{details}</type-details>
+<revision>{revision}</revision>
+<display-name>{display_name}</display-name>
+</localPackage>
+</ns2:repository>
+"""
+
+
+def _local_name(tag):
+    """去掉 XML 命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip()
+    return ''
+
+
+def parse_package_xml(path):
+    """解析已安装组件的 package.xml，返回组件信息"""
+    root = ElementTree.parse(path).getroot()
+    package = next((e for e in root.iter() if _local_name(e.tag) == 'localPackage'), None)
+    if package is None:
+        return None
+
+    revision = ''
+    for child in package:
+        if _local_name(child.tag) == 'revision':
+            parts = [_child_text(child, key) for key in ('major', 'minor', 'micro')]
+            revision = '.'.join(p for p in parts if p)
+            preview = _child_text(child, 'preview')
+            if preview:
+                revision += f' rc{preview}'
+
+    return {
+        'path': package.get('path', ''),
+        'revision': revision,
+        'display_name': _child_text(package, 'display-name'),
+        'location': os.path.dirname(path),
+        'obsolete': package.get('obsolete') == 'true',
+    }
+
+
+def build_package_xml(package):
+    """根据仓库中的组件生成 package.xml，格式与 sdkmanager 安装后写入的一致
+
+    package 为 SystemImagePackage 或 SdkPackage，platforms 需要 API 级别，
+    其他组件（platform-tools、emulator 等）使用通用类型。
+    """
+    number, _, preview = package.revision.partition(' rc')
+    revision = ''.join(f'<{key}>{value}</{key}>' for key, value in zip(('major', 'minor', 'micro'), number.split('.')))
+    if preview:
+        revision += f'<preview>{preview}</preview>'
+
+    if hasattr(package, 'abi'):
+        details_type = 'sys-img:sysImgDetailsType'
+        details = (f'<api-level>{escape(package.api_level or package.version.split("-")[0])}</api-level>'
+                   f'<tag><id>{escape(package.tag)}</id><display>{escape(package.tag_display)}</display></tag>'
+                   f'<abi>{escape(package.abi)}</abi>')
+    elif package.api_level:
+        details_type = 'ns5:platformDetailsType'
+        details = f'<api-level>{escape(package.api_level)}</api-level>'
+        if package.layoutlib_api:
+            details += f'<layoutlib api="{escape(package.layoutlib_api)}"/>'
+    else:
+        details_type = 'ns3:genericDetailsType'
+        details = ''
+
+    return PACKAGE_XML_TEMPLATE.format(
+        path=escape(package.path, {'"': '&quot;'}),
+        details_type=details_type,
+        details=details,
+        revision=revision,
+        display_name=escape(package.display_name),
+    ).encode('utf-8')
+
+
+def version_sort_key(version):
+    """获取版本号的排序键值，如 '34-ext8' 取 34"""
+    try:
+        return int(version.split('-')[0])
+    except ValueError:
+        return 0
+
+
+class InstalledPackages:
+    """扫描 SDK 目录中已安装的组件
+
+    直接读取各组件的 package.xml，代替启动 JVM 的 `sdkmanager --list_installed`，
+    每个 package.xml 按 mtime 缓存，只有新增或修改的文件才会重新解析。
+    """
+
+    def __init__(self, sdk_root=ANDROID_HOME):
+        self.sdk_root = sdk_root
+        self._lock = threading.Lock()
+        self._cache = {}  # package.xml 路径 -> (mtime, 组件信息)
+
+    def packages(self):
+        """返回所有已安装组件的列表"""
+        with self._lock:
+            cache = {}
+            for pattern in PACKAGE_PATTERNS:
+                for path in glob.glob(os.path.join(self.sdk_root, pattern)):
+                    try:
+                        mtime = os.stat(path).st_mtime_ns
+                        cached = self._cache.get(path)
+                        if cached and cached[0] == mtime:
+                            cache[path] = cached
+                        else:
+                            cache[path] = (mtime, parse_package_xml(path))
+                    except (OSError, ElementTree.ParseError) as e:
+                        print(f"读取 {path} 时出错: {str(e)}")
+            self._cache = cache
+            return [info for _, info in cache.values() if info]
+
+    def paths(self):
+        """返回已安装组件路径的集合，如 'platforms;android-34'"""
+        return {package['path'] for package in self.packages()}
+
+    def system_images(self):
+        """返回已安装的系统镜像，格式与镜像管理和创建对话框一致，按版本号从大到小排序"""
+        images = []
+        for package in self.packages():
+            parts = package['path'].split(';')
+            if len(parts) != 4 or parts[0] != 'system-images':
+                continue
+            version = parts[1].replace('android-', '')
+            images.append({
+                'version': version,
+                'type': parts[2],
+                'arch': parts[3],
+                'full_name': package['path'],
+            })
+        images.sort(key=lambda x: -version_sort_key(x['version']))
+        return images
+
+
+# 全局共享的已安装组件扫描器
+installed_packages = InstalledPackages()
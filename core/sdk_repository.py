@@ -0,0 +1,408 @@
+import os
+import json
+import hashlib
+import platform
+import threading
+from dataclasses import dataclass, asdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+import requests
+
+from utils import CACHE_DIR
+from core.http_client import http_client
+
+ADDONS_LIST = "addons_list-5.xml"
+# cmdline-tools、platform-tools、emulator、platforms 等组件所在的仓库
+PACKAGES_XML = "repository2-1.xml"
+
+# 无法获取 addons 列表时使用的系统镜像站点
+DEFAULT_SYS_IMG_SITES = [
+    "sys-img/android/sys-img2-3.xml",
+    "sys-img/google_apis/sys-img2-3.xml",
+    "sys-img/google_apis_playstore/sys-img2-3.xml",
+    "sys-img/android-tv/sys-img2-3.xml",
+    "sys-img/android-wear/sys-img2-3.xml",
+    "sys-img/android-automotive/sys-img2-3.xml",
+]
+
+
+def host_os_name():
+    """返回仓库 XML 中使用的 host-os 名称"""
+    system = platform.system().lower()
+    if system == "darwin":
+        return "macosx"
+    if system == "windows":
+        return "windows"
+    return "linux"
+
+
+def host_arch_name():
+    """返回仓库 XML 中使用的 host-arch 名称，如 x64、aarch64"""
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "aarch64"
+    if machine in ("x86_64", "amd64"):
+        return "x64"
+    return machine
+
+
+def _local_name(tag):
+    """去掉 XML 命名空间前缀"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(element, name):
+    return [child for child in element if _local_name(child.tag) == name]
+
+
+def _child(element, name):
+    children = _children(element, name)
+    return children[0] if children else None
+
+
+def _child_text(element, name, default=''):
+    child = _child(element, name) if element is not None else None
+    if child is None or child.text is None:
+        return default
+    return child.text.strip()
+
+
+def _revision(element):
+    """解析 <revision>，返回可比较的元组"""
+    if element is None:
+        return (0, 0, 0, 0)
+    parts = [int(_child_text(element, key, '0') or 0) for key in ('major', 'minor', 'micro')]
+    preview = _child_text(element, 'preview')
+    # 正式版排在同版本的预览版之后
+    parts.append(int(preview) if preview else 1 << 30)
+    return tuple(parts)
+
+
+def format_revision(revision):
+    """把版本元组格式化为字符串"""
+    parts = list(revision[:3])
+    while len(parts) > 1 and parts[-1] == 0:
+        parts.pop()
+    text = '.'.join(str(p) for p in parts)
+    if revision[3] != 1 << 30:
+        text += f' rc{revision[3]}'
+    return text
+
+
+@dataclass
+class SystemImagePackage:
+    """远程仓库中的系统镜像"""
+    path: str
+    version: str
+    api_level: str
+    tag: str
+    tag_display: str
+    abi: str
+    revision: str
+    display_name: str
+    size: int
+    checksum: str
+    checksum_type: str
+    url: str
+    channel: str = 'stable'
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def parse_system_images(content, base_url, host_os=None, channels=('stable',), host_arch=None):
+    """解析 sys-img2-*.xml，返回 SystemImagePackage 列表"""
+    host_os = host_os or host_os_name()
+    root = ElementTree.fromstring(content)
+
+    channel_names = {c.get('id'): (c.text or '').strip() for c in root.iter() if _local_name(c.tag) == 'channel'}
+
+    images = []
+    for package in root.iter():
+        if _local_name(package.tag) != 'remotePackage':
+            continue
+        path = package.get('path', '')
+        parts = path.split(';')
+        if len(parts) != 4 or parts[0] != 'system-images':
+            continue
+
+        channel_ref = _child(package, 'channelRef')
+        channel = channel_names.get(channel_ref.get('ref') if channel_ref is not None else None, 'stable')
+        if channels and channel not in channels:
+            continue
+
+        details = _child(package, 'type-details')
+        tag = _child(details, 'tag') if details is not None else None
+        if tag is None and details is not None and _child(details, 'tags') is not None:
+            tag = _child(_child(details, 'tags'), 'tag')
+        abi = _child_text(details, 'abi')
+        if not abi and details is not None and _child(details, 'abis') is not None:
+            abi = _child_text(_child(details, 'abis'), 'abi')
+
+        archive = _select_archive(package, host_os, host_arch)
+        complete = _child(archive, 'complete') if archive is not None else None
+        if complete is None:
+            continue
+        checksum = _child(complete, 'checksum')
+
+        images.append(SystemImagePackage(
+            path=path,
+            version=parts[1].replace('android-', ''),
+            api_level=_child_text(details, 'api-level'),
+            tag=_child_text(tag, 'id', parts[2]),
+            tag_display=_child_text(tag, 'display', parts[2]),
+            abi=abi or parts[3],
+            revision=format_revision(_revision(_child(package, 'revision'))),
+            display_name=_child_text(package, 'display-name'),
+            size=int(_child_text(complete, 'size', '0') or 0),
+            checksum=(checksum.text or '').strip() if checksum is not None else '',
+            checksum_type=checksum.get('type', 'sha1') if checksum is not None else 'sha1',
+            url=urljoin(base_url, _child_text(complete, 'url')),
+            channel=channel,
+        ))
+    return images
+
+
+@dataclass
+class SdkPackage:
+    """远程仓库中的 SDK 组件，如 platform-tools、emulator、platforms;android-34"""
+    path: str
+    revision: str
+    display_name: str
+    size: int
+    checksum: str
+    checksum_type: str
+    url: str
+    channel: str = 'stable'
+    api_level: str = ''  # platforms 的 API 级别，写入 package.xml 时使用
+    layoutlib_api: str = ''
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _select_archive(package, host_os, host_arch=None):
+    """选择与当前系统匹配的压缩包，未指定 host-os 的适用于所有系统
+
+    macOS 上 emulator 等组件按 host-arch 分为 x64 和 aarch64 两个压缩包，
+    优先选择架构一致的，其次选择未指定 host-arch 的。
+    """
+    host_arch = host_arch or host_arch_name()
+    archives = _child(package, 'archives')
+    fallback = None
+    for candidate in (_children(archives, 'archive') if archives is not None else []):
+        candidate_os = _child_text(candidate, 'host-os')
+        if candidate_os and candidate_os != host_os:
+            continue
+        candidate_arch = _child_text(candidate, 'host-arch')
+        if candidate_arch == host_arch:
+            return candidate
+        if not candidate_arch and fallback is None:
+            fallback = candidate
+    return fallback
+
+
+def parse_packages(content, base_url, host_os=None, channels=('stable',), host_arch=None):
+    """解析 repository2-*.xml，返回 SdkPackage 列表"""
+    host_os = host_os or host_os_name()
+    root = ElementTree.fromstring(content)
+
+    channel_names = {c.get('id'): (c.text or '').strip() for c in root.iter() if _local_name(c.tag) == 'channel'}
+
+    packages = []
+    for package in root.iter():
+        if _local_name(package.tag) != 'remotePackage':
+            continue
+        channel_ref = _child(package, 'channelRef')
+        channel = channel_names.get(channel_ref.get('ref') if channel_ref is not None else None, 'stable')
+        if channels and channel not in channels:
+            continue
+
+        archive = _select_archive(package, host_os, host_arch)
+        complete = _child(archive, 'complete') if archive is not None else None
+        if complete is None:
+            continue
+        checksum = _child(complete, 'checksum')
+        details = _child(package, 'type-details')
+        layoutlib = _child(details, 'layoutlib') if details is not None else None
+
+        packages.append(SdkPackage(
+            path=package.get('path', ''),
+            revision=format_revision(_revision(_child(package, 'revision'))),
+            display_name=_child_text(package, 'display-name'),
+            size=int(_child_text(complete, 'size', '0') or 0),
+            checksum=(checksum.text or '').strip() if checksum is not None else '',
+            checksum_type=checksum.get('type', 'sha1') if checksum is not None else 'sha1',
+            url=urljoin(base_url, _child_text(complete, 'url')),
+            channel=channel,
+            api_level=_child_text(details, 'api-level'),
+            layoutlib_api=layoutlib.get('api', '') if layoutlib is not None else '',
+        ))
+    return packages
+
+
+def parse_sys_img_sites(content):
+    """解析 addons_list-*.xml 中的系统镜像站点地址"""
+    root = ElementTree.fromstring(content)
+    sites = []
+    for site in root.iter():
+        if _local_name(site.tag) != 'site':
+            continue
+        site_type = next((v for k, v in site.attrib.items() if _local_name(k) == 'type'), '')
+        url = _child_text(site, 'url')
+        if url and 'sysImgSiteType' in site_type:
+            sites.append(url)
+    return sites
+
+
+class SdkRepository:
+    """直接读取 Android SDK 仓库 XML
+
+    XML 保存在磁盘缓存中，再次请求时带上 ETag/Last-Modified 做条件请求，
+    服务器返回 304 或网络不可用时使用缓存内容。未指定 base_url 时
+    按顺序尝试 HttpClient 中配置的各个镜像。
+    """
+
+    def __init__(self, base_url=None, cache_dir=None, client=None):
+        self._base_url = base_url if not base_url or base_url.endswith('/') else base_url + '/'
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, 'repository')
+        self.client = client or http_client
+        self._lock = threading.Lock()
+
+    def base_urls(self):
+        """仓库地址列表，按尝试顺序排列"""
+        return [self._base_url] if self._base_url else self.client.mirrors()
+
+    def _cache_paths(self, relative_url):
+        name = hashlib.sha1(relative_url.encode('utf-8')).hexdigest()
+        return (os.path.join(self.cache_dir, f'{name}.xml'),
+                os.path.join(self.cache_dir, f'{name}.json'))
+
+    def fetch(self, relative_url):
+        """获取仓库中的 XML 内容"""
+        return self.fetch_with_url(relative_url)[0]
+
+    def fetch_with_url(self, relative_url):
+        """获取仓库中的 XML 内容，返回 (内容, 实际使用的地址)
+
+        包中的相对下载地址需要基于实际使用的镜像地址解析。
+        """
+        body_path, meta_path = self._cache_paths(relative_url)
+
+        meta = {}
+        cached = os.path.exists(body_path) and os.path.exists(meta_path)
+        if cached:
+            try:
+                with open(meta_path, 'r') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                cached = False
+
+        error = None
+        for base_url in self.base_urls():
+            url = urljoin(base_url, relative_url)
+            headers = {}
+            # 缓存来自同一个地址时才做条件请求
+            if cached and meta.get('url') == url:
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+            try:
+                response = self.client.get(url, headers=headers)
+            except requests.RequestException as e:
+                error = e
+                self.client.mark_failed(url)
+                continue
+
+            if response.status_code == 304 and headers:
+                with open(body_path, 'rb') as f:
+                    return f.read(), url
+            if response.status_code != 200:
+                error = Exception(f"获取 {url} 失败: HTTP {response.status_code}")
+                continue
+
+            content = response.content
+            self._store(body_path, meta_path, content, {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            })
+            return content, url
+
+        if cached:
+            # 所有地址都不可用时使用上次的结果
+            with open(body_path, 'rb') as f:
+                return f.read(), meta.get('url') or urljoin(self.base_urls()[0], relative_url)
+        raise error
+
+    def _store(self, body_path, meta_path, content, meta):
+        """先写临时文件再替换，避免并发请求读到不完整的缓存"""
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for path, data, mode in ((body_path, content, 'wb'), (meta_path, json.dumps(meta), 'w')):
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, mode) as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+    def sys_img_sites(self):
+        """获取系统镜像站点列表"""
+        try:
+            sites = parse_sys_img_sites(self.fetch(ADDONS_LIST))
+            if sites:
+                return sites
+        except Exception as e:
+            print(f"获取系统镜像站点失败: {str(e)}")
+        return list(DEFAULT_SYS_IMG_SITES)
+
+    def system_images(self, host_os=None, channels=('stable',), max_workers=8, host_arch=None):
+        """并发获取所有站点的系统镜像，同一路径只保留最新版本"""
+        sites = self.sys_img_sites()
+
+        def load(site):
+            content, url = self.fetch_with_url(site)
+            return parse_system_images(content, url, host_os=host_os, channels=channels, host_arch=host_arch)
+
+        errors = []
+        images = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(load, site) for site in sites]
+            for future in futures:
+                try:
+                    for image in future.result():
+                        current = images.get(image.path)
+                        if current is None or _revision_key(image.revision) > _revision_key(current.revision):
+                            images[image.path] = image
+                except Exception as e:
+                    errors.append(str(e))
+
+        if not images and errors:
+            raise Exception(f"获取系统镜像列表失败: {errors[0]}")
+        return list(images.values())
+
+    def packages(self, host_os=None, channels=('stable',), host_arch=None):
+        """获取 SDK 组件列表，同一路径只保留最新版本"""
+        packages = {}
+        content, url = self.fetch_with_url(PACKAGES_XML)
+        for package in parse_packages(content, url, host_os=host_os, channels=channels, host_arch=host_arch):
+            current = packages.get(package.path)
+            if current is None or _revision_key(package.revision) > _revision_key(current.revision):
+                packages[package.path] = package
+        return list(packages.values())
+
+
+def _revision_key(text):
+    """把 format_revision 的结果转换为可比较的元组"""
+    number, _, preview = text.partition(' rc')
+    parts = [int(p) for p in number.split('.') if p.isdigit()]
+    parts += [0] * (3 - len(parts))
+    parts.append(int(preview) if preview else 1 << 30)
+    return tuple(parts)
+
+
+# 全局共享的仓库客户端
+sdk_repository = SdkRepository()
@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import shutil
+
+from core.avd_inventory import avd_inventory
+from core.emulator_console import EmulatorConsole
+from core.emulator_supervisor import emulator_supervisor
+
+# 快速启动使用的快照，正常关闭模拟器时自动保存
+QUICKBOOT_SNAPSHOT = 'default_boot'
+# 快照名称只允许字母、数字、下划线、点和横线，避免路径穿越和控制台命令解析问题
+SNAPSHOT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def validate_snapshot_name(tag):
+    """检查快照名称，不合法时抛出异常"""
+    if not tag or not SNAPSHOT_NAME_PATTERN.match(tag) or tag in ('.', '..'):
+        raise Exception("快照名称只能包含字母、数字、下划线、点和横线")
+
+
+def launch_args(tag=None, save=True):
+    """启动模拟器时的快照参数
+
+    Args:
+        tag: 启动时加载的快照，为 None 时使用快速启动快照
+        save: 退出时是否保存快照，从干净快照启动时通常为 False，保证快照不被改动
+    """
+    args = ['-snapshot', tag] if tag else []
+    if not save:
+        args.append('-no-snapshot-save')
+    return args
+
+
+def dir_size(path):
+    """目录中所有文件的大小之和"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class Snapshot:
+    """模拟器的一个快照"""
+
+    def __init__(self, name, path, size, created):
+        self.name = name
+        self.path = path
+        self.size = size  # 字节数
+        self.created = created  # 保存时间（时间戳）
+
+    @property
+    def age(self):
+        """距离保存的秒数"""
+        return max(0, time.time() - self.created)
+
+    @property
+    def quickboot(self):
+        return self.name == QUICKBOOT_SNAPSHOT
+
+
+class SnapshotManager:
+    """模拟器快照管理
+
+    快照保存在 <name>.avd/snapshots/<快照名称> 目录中。模拟器运行时通过控制台
+    保存、加载和删除快照，加载只需几秒，可以代替清除数据后冷启动；
+    未运行时直接读写快照目录，启动时用 -snapshot 指定要加载的快照。
+    """
+
+    def __init__(self, inventory=None, supervisor=None):
+        self.inventory = inventory or avd_inventory
+        self.supervisor = supervisor or emulator_supervisor
+
+    def snapshots_dir(self, name):
+        info = self.inventory.get(name)
+        if info is None:
+            raise Exception(f"模拟器 {name} 不存在")
+        return os.path.join(info['path'], 'snapshots')
+
+    def list(self, name):
+        """返回模拟器的快照列表，最近保存的在前"""
+        snapshots_dir = self.snapshots_dir(name)
+        try:
+            entries = os.listdir(snapshots_dir)
+        except OSError:
+            return []
+        snapshots = []
+        for entry in entries:
+            path = os.path.join(snapshots_dir, entry)
+            if not os.path.isdir(path):
+                continue
+            # snapshot.pb 是快照的元数据，保存完成时写入
+            try:
+                created = os.path.getmtime(os.path.join(path, 'snapshot.pb'))
+            except OSError:
+                created = os.path.getmtime(path)
+            snapshots.append(Snapshot(entry, path, dir_size(path), created))
+        return sorted(snapshots, key=lambda snapshot: snapshot.created, reverse=True)
+
+    def get(self, name, tag):
+        for snapshot in self.list(name):
+            if snapshot.name == tag:
+                return snapshot
+        return None
+
+    def save(self, name, tag):
+        """保存运行中模拟器的当前状态"""
+        validate_snapshot_name(tag)
+        with self._console(name) as console:
+            console.snapshot_save(tag)
+
+    def load(self, name, tag):
+        """运行中的模拟器恢复到快照，未运行时从快照启动"""
+        validate_snapshot_name(tag)
+        if self.supervisor.console_port(name) is None:
+            self.launch(name, tag)
+            return
+        with self._console(name) as console:
+            console.snapshot_load(tag)
+
+    def reset(self, name, tag):
+        """把运行中的模拟器恢复到干净快照，代替清除数据后冷启动
+
+        name 可以是同一 AVD 的只读实例名称，快照从实例对应的 AVD 中查找。
+        """
+        emulator = self.supervisor.get(name)
+        avd = emulator.avd if emulator else name
+        if not self.get(avd, tag):
+            raise Exception(f"模拟器 {avd} 没有快照 {tag}")
+        with self._console(name) as console:
+            console.snapshot_load(tag)
+
+    def delete(self, name, tag):
+        """删除快照，模拟器运行时通过控制台删除"""
+        validate_snapshot_name(tag)
+        if self.supervisor.console_port(name) is not None:
+            with self._console(name) as console:
+                console.snapshot_delete(tag)
+            return
+        path = os.path.join(self.snapshots_dir(name), tag)
+        if not os.path.isdir(path):
+            raise Exception(f"快照 {tag} 不存在")
+        shutil.rmtree(path)
+
+    def launch(self, name, tag=None, save=None):
+        """从快照启动模拟器
+
+        Args:
+            save: 退出时是否保存快照，默认只在使用快速启动快照时保存，
+                  从指定的快照启动时不保存，快照保持不变
+        """
+        if tag:
+            validate_snapshot_name(tag)
+        if save is None:
+            save = tag in (None, QUICKBOOT_SNAPSHOT)
+        return self.supervisor.launch(name, launch_args(tag, save))
+
+    def _console(self, name):
+        port = self.supervisor.console_port(name)
+        if port is None:
+            raise Exception(f"模拟器 {name} 未在运行")
+        return EmulatorConsole(port)
+
+
+# 全局共享的快照管理器
+snapshot_manager = SnapshotManager()
@@ -1,9 +1,9 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit,
                             QComboBox, QSpinBox, QFormLayout, QCheckBox)
-import subprocess
 from ui.toast import Toast
 from ui.styled_button import StyledButton
-from utils import find_avdmanager
+from core.sdk_packages import installed_packages
+from core.device_index import device_index
 
 class EmulatorConfigDialog(QDialog):
     def __init__(self, parent=None):
@@ -109,29 +109,9 @@ class EmulatorConfigDialog(QDialog):
     def load_devices(self):
         """加载可用设备列表"""
         try:
-            avdmanager = find_avdmanager()
-            if not avdmanager:
-                raise Exception("找不到 avdmanager 工具")
-            
-            # 获取设备列表
-            list_cmd = [avdmanager, 'list', 'device']
-            result = subprocess.run(list_cmd, capture_output=True, text=True)
-            
-            # 解析输出
-            current_id = None
-            current_name = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                if line.startswith('id:'):
-                    current_id = line.split('or')[0].split('"')[1]
-                elif line.startswith('Name:'):
-                    current_name = line.split(':')[1].strip()
-                    if current_id and current_name:
-                        self.device_combo.addItem(current_name, current_id)
-                        current_id = None
-                        current_name = None
+            # 直接读取 devices.xml 中的设备定义
+            for device in device_index.devices():
+                self.device_combo.addItem(device['name'], device['id'])
             
         except Exception as e:
             self.toast.showMessage(f"加载设备列表失败：{str(e)}")
@@ -139,28 +119,10 @@ class EmulatorConfigDialog(QDialog):
     def load_system_images(self):
         """加载已安装的系统镜像"""
         try:
-            avdmanager = find_avdmanager()
-            if not avdmanager:
-                raise Exception("找不到 avdmanager 工具")
-            
-            # 获取系统镜像列表
-            list_cmd = [avdmanager, 'list', 'target']
-            result = subprocess.run(list_cmd, capture_output=True, text=True)
-            
-            # 解析输出
-            current_version = None
-            current_id = None
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                
-                if line.startswith('id:'):
-                    current_id = line.split('or')[0].split('"')[1]
-                    current_version = line.split('or')[1].split('"')[1]
-                    if current_id and current_version:
-                        self.image_combo.addItem(f"Android {current_version}", current_id)
-                        current_id = None
-                        current_version = None
+            # 直接读取 SDK 目录中的 package.xml
+            for image in installed_packages.system_images():
+                display_text = f"Android {image['version']} ({image['type']}, {image['arch']})"
+                self.image_combo.addItem(display_text, image['full_name'])
             
         except Exception as e:
-            self.toast.showMessage(f"加载系统镜像失败：{str(e)}") 
\ No newline at end of file
+            self.toast.showMessage(f"加载系统镜像失败：{str(e)}")
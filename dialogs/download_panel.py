@@ -0,0 +1,240 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                            QTableWidget, QProgressBar, QWidget)
+from PyQt6.QtCore import Qt, QTimer
+
+from core.download_queue import download_queue, DownloadTask
+
+STATE_TEXT = {
+    DownloadTask.QUEUED: "等待中",
+    DownloadTask.RUNNING: "下载中",
+    DownloadTask.PAUSED: "已暂停",
+    DownloadTask.DONE: "已完成",
+    DownloadTask.FAILED: "失败",
+    DownloadTask.CANCELLED: "已取消",
+}
+
+
+def format_size(size):
+    """格式化字节数"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} GB"
+
+
+def format_eta(seconds):
+    """格式化剩余时间"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+class DownloadPanel(QDialog):
+    """下载队列面板
+
+    非模态窗口，显示队列中每个任务的进度并可暂停、继续、取消，
+    底部显示总下载速度和预计剩余时间。关闭面板只是隐藏，不会影响下载，
+    全局只有一个面板，通过 show_download_panel 显示。
+    """
+
+    def __init__(self, queue=None, parent=None):
+        super().__init__(parent)
+        self.queue = queue or download_queue
+        self.setWindowTitle("下载队列")
+        self.setMinimumWidth(640)
+        self.setMinimumHeight(320)
+        self.setModal(False)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: white;
+            }
+            QTableWidget {
+                border: 1px solid #dcdde1;
+                border-radius: 5px;
+                background-color: white;
+                gridline-color: #f5f6fa;
+            }
+            QProgressBar {
+                border: 1px solid #dcdde1;
+                border-radius: 4px;
+                text-align: center;
+                background-color: #f5f6fa;
+            }
+            QProgressBar::chunk {
+                background-color: #2ecc71;
+                border-radius: 3px;
+            }
+            QPushButton {
+                background-color: #f5f6fa;
+                color: #2c3e50;
+                border: 1px solid #dcdde1;
+                border-radius: 4px;
+                padding: 4px 10px;
+            }
+            QPushButton:hover {
+                background-color: #dcdde1;
+            }
+            QLabel {
+                color: #2c3e50;
+                font-size: 13px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(4)
+        self.table.setHorizontalHeaderLabels(["名称", "状态", "进度", "操作"])
+        self.table.setColumnWidth(0, 220)
+        self.table.setColumnWidth(1, 80)
+        self.table.setColumnWidth(2, 200)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(40)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.rows = {}  # 任务 ID -> 行号
+        for task in self.queue.tasks():
+            self.update_task(task.id)
+        self.queue.task_changed.connect(self.update_task)
+
+        # 速度和剩余时间定时刷新，面板隐藏时停止
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_summary)
+        self.owner = None
+        self.wants_visible = False
+
+    def update_task(self, task_id):
+        """刷新一个任务所在的行"""
+        task = self.queue.get(task_id)
+        if task is None:
+            self.rebuild()
+            return
+        row = self.rows.get(task_id)
+        if row is None:
+            row = self.table.rowCount()
+            self.table.insertRow(row)
+            self.rows[task_id] = row
+            self.table.setCellWidget(row, 0, QLabel(task.name))
+            self.table.setCellWidget(row, 1, QLabel())
+            bar = QProgressBar()
+            bar.setRange(0, 1000)
+            self.table.setCellWidget(row, 2, bar)
+            self.table.setCellWidget(row, 3, self.create_actions(task_id))
+
+        state_label = self.table.cellWidget(row, 1)
+        state_label.setText(STATE_TEXT.get(task.state, task.state))
+        state_label.setToolTip(task.error)
+
+        bar = self.table.cellWidget(row, 2)
+        if task.total:
+            bar.setValue(int(task.downloaded * 1000 / task.total))
+            bar.setFormat(f"{format_size(task.downloaded)} / {format_size(task.total)}")
+        elif task.state == task.DONE:
+            bar.setValue(1000)
+            bar.setFormat("100%")
+
+        actions = self.table.cellWidget(row, 3)
+        pause_btn, resume_btn, cancel_btn, remove_btn = actions.buttons
+        pause_btn.setVisible(task.state in (task.QUEUED, task.RUNNING))
+        resume_btn.setVisible(task.state in (task.PAUSED, task.FAILED))
+        cancel_btn.setVisible(task.active)
+        remove_btn.setVisible(not task.active)
+
+    def create_actions(self, task_id):
+        """创建暂停/继续/取消/移除按钮"""
+        widget = QWidget()
+        layout = QHBoxLayout(widget)
+        layout.setContentsMargins(5, 2, 5, 2)
+        widget.buttons = []
+        for text, handler in (("暂停", self.queue.pause), ("继续", self.queue.resume),
+                              ("取消", self.queue.cancel), ("移除", self.queue.remove)):
+            button = QPushButton(text)
+            button.setCursor(Qt.CursorShape.PointingHandCursor)
+            button.clicked.connect(lambda checked=False, h=handler: h(task_id))
+            layout.addWidget(button)
+            widget.buttons.append(button)
+        layout.addStretch()
+        return widget
+
+    def rebuild(self):
+        """任务被移除后重建表格"""
+        self.table.setRowCount(0)
+        self.rows = {}
+        for task in self.queue.tasks():
+            self.update_task(task.id)
+
+    def update_summary(self):
+        stats = self.queue.stats()
+        self.summary_label.setText(
+            f"速度 {format_size(stats['speed'])}/s    剩余时间 {format_eta(stats['eta'])}    "
+            f"下载中 {stats['running']}    等待中 {stats['queued']}"
+        )
+
+    def attach(self, owner):
+        """从模态对话框中打开时挂到对话框下，否则会被模态对话框阻塞无法操作"""
+        if self.owner is owner:
+            return
+        self.detach()
+        self.setParent(owner, Qt.WindowType.Window)
+        owner.finished.connect(self.detach)
+        self.owner = owner
+
+    def detach(self, *args):
+        """对话框关闭前取下面板，面板不随对话框销毁，下载中的任务仍然可见"""
+        if self.owner is None:
+            return
+        try:
+            self.owner.finished.disconnect(self.detach)
+        except TypeError:
+            pass
+        self.owner = None
+        geometry = self.geometry()
+        self.setParent(None, Qt.WindowType.Window)
+        if self.wants_visible:
+            self.setGeometry(geometry)
+            self.show()
+
+    def showEvent(self, event):
+        self.wants_visible = True
+        self.update_summary()
+        self.timer.start(500)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def closeEvent(self, event):
+        # 用户关闭面板，对话框隐藏带走面板时不会调用
+        self.wants_visible = False
+        super().closeEvent(event)
+
+
+_panel = None
+
+
+def show_download_panel(owner=None):
+    """显示全局唯一的下载队列面板，关闭后再次调用时复用
+
+    Args:
+        owner: 当前的模态对话框，对话框关闭后面板仍然保留
+    """
+    global _panel
+    if _panel is None:
+        _panel = DownloadPanel()
+    if owner is not None:
+        _panel.attach(owner)
+    _panel.show()
+    _panel.raise_()
+    _panel.activateWindow()
+    return _panel
@@ -3,13 +3,13 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushBut
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 import os
 import subprocess
-import requests
-import zipfile
-import tempfile
-import shutil
 from ui.toast import Toast
-from utils import find_avdmanager, ANDROID_HOME
-import platform
+from utils import find_avdmanager, find_sdkmanager, sdk_tools, ANDROID_HOME
+from core.downloader import downloader, DownloadCancelled
+from core.archive_pipeline import download_and_extract
+from core.package_cache import package_cache
+from core.sdk_installer import sdk_installer
+from core.sdk_repository import sdk_repository
 
 class EnvironmentDialog(QDialog):
     def __init__(self, parent=None):
@@ -324,42 +324,14 @@ class EnvironmentDialog(QDialog):
     def get_cmdline_tools_url(self):
         """获取最新的 Command-line Tools 下载地址"""
         try:
-            # 获取系统信息
-            system = platform.system().lower()
-            machine = platform.machine().lower()
-            
-            # 构建请求 URL
-            url = "https://dl.google.com/android/repository/repository2-1.xml"
-            response = requests.get(url)
-            
-            if response.status_code != 200:
-                raise Exception("无法获取 Command-line Tools 信息")
-            
-            # 解析 XML 找到最新版本
-            from xml.etree import ElementTree
-            root = ElementTree.fromstring(response.content)
-            
-            # 根据系统选择下载链接
-            if system == "darwin":  # macOS
-                if "arm" in machine:  # Apple Silicon
-                    platform_name = "macosx"
-                else:  # Intel
-                    platform_name = "macosx"
-            elif system == "windows":
-                platform_name = "windows"
-            else:  # Linux
-                platform_name = "linux"
-            
-            # 在 XML 中查找对应的下载链接
-            for pkg in root.findall(".//remotePackage[@path='cmdline-tools;latest']"):
-                for archive in pkg.findall(f".//archive[host-os='{platform_name}']"):
-                    url = archive.find('complete/url').text
-                    checksum = archive.find('complete/checksum').text
-                    size = archive.find('complete/size').text
+            # 仓库 XML 通过共享的 HTTP 客户端获取，按顺序尝试配置的镜像
+            for package in sdk_repository.packages():
+                if package.path == 'cmdline-tools;latest':
                     return {
-                        'url': f"https://dl.google.com/android/repository/{url}",
-                        'checksum': checksum,
-                        'size': int(size)
+                        'url': package.url,
+                        'checksum': package.checksum,
+                        'checksum_type': package.checksum_type,
+                        'size': package.size
                     }
             
             raise Exception("未找到适合当前系统的下载链接")
@@ -370,10 +342,6 @@ class EnvironmentDialog(QDialog):
     def download_cmdline_tools(self):
         """下载 Command-line Tools"""
         try:
-            # 创建临时目录
-            temp_dir = tempfile.mkdtemp()
-            zip_path = os.path.join(temp_dir, "commandlinetools.zip")
-            
             # 创建并显示进度对话框
             self.progress = QProgressDialog(self)
             self.progress.setWindowTitle("下载中")
@@ -425,12 +393,18 @@ class EnvironmentDialog(QDialog):
             """)
             
             # 获取最新的下载链接
-            url = self.get_cmdline_tools_url()['url']
+            info = self.get_cmdline_tools_url()
+            url = info['url']
             
-            # 创建下载线程
-            self.download_thread = DownloadThread(url, zip_path)
+            # 下载到固定位置，中断后再次下载可以断点续传，下载时同步校验并解压
+            sdk_root = os.path.expanduser("~/Library/Android/sdk")
+            self.download_thread = DownloadThread(url, downloader.default_path(url),
+                                                  checksum=info['checksum'],
+                                                  checksum_type=info['checksum_type'],
+                                                  size=info['size'],
+                                                  extract_to=os.path.join(sdk_root, "cmdline-tools", "latest"))
             self.download_thread.progress.connect(self.update_progress)
-            self.download_thread.finished.connect(lambda path: self.handle_download_finished(path, temp_dir))
+            self.download_thread.finished.connect(self.handle_download_finished)
             self.download_thread.error.connect(self.handle_download_error)
             
             # 显示进度对话框并开始下载
@@ -440,102 +414,73 @@ class EnvironmentDialog(QDialog):
         except Exception as e:
             QMessageBox.warning(self, "下载错误", f"启动下载失败：{str(e)}")
 
-    def handle_download_finished(self, download_path, temp_dir):
-        """处理下载完成"""
+    def handle_download_finished(self, install_path):
+        """处理下载完成，解压和替换已在下载线程中完成"""
         try:
             # 恢复按钮状态
-            self.toast.showMessage(f"Command-line Tools 下载完成")
-            
-            # 创建目标目录
-            sdk_root = os.path.expanduser("~/Library/Android/sdk")
-            cmdline_tools_root = os.path.join(sdk_root, "cmdline-tools")
-            os.makedirs(cmdline_tools_root, exist_ok=True)
-            
-            # 解压文件到临时目录
-            with tempfile.TemporaryDirectory() as temp_dir:
-                with zipfile.ZipFile(download_path, 'r') as zip_ref:
-                    zip_ref.extractall(temp_dir)
-                
-                # 移动文件到正确的位置
-                cmdline_tools_latest = os.path.join(cmdline_tools_root, "latest")
-                if os.path.exists(cmdline_tools_latest):
-                    shutil.rmtree(cmdline_tools_latest)
-                
-                # 移动解压出来的 cmdline-tools 目录到 latest
-                extracted_tools = os.path.join(temp_dir, "cmdline-tools")
-                os.rename(extracted_tools, cmdline_tools_latest)
-            
-            # 设置执行权限
-            bin_dir = os.path.join(cmdline_tools_latest, "bin")
-            for file in os.listdir(bin_dir):
-                file_path = os.path.join(bin_dir, file)
-                if os.path.isfile(file_path):
-                    os.chmod(file_path, 0o755)
-            
-            # 删除下载的压缩包
-            os.remove(download_path)
-            
-            # 配置环境变量
-            shell_type = os.path.basename(os.environ.get('SHELL', '/bin/bash'))
-            shell_path = '/bin/zsh' if shell_type == 'zsh' else '/bin/bash'
-            rc_file = os.path.expanduser('~/.zshrc' if shell_type == 'zsh' else '~/.bashrc')
-            
-            # 读取现有内容
-            try:
-                with open(rc_file, 'r') as f:
-                    content = f.read()
-            except FileNotFoundError:
-                content = ''
-            
-            # 准备要添加的环境变量
-            env_vars = [
-                f'\n# Android SDK',
-                f'export ANDROID_SDK_ROOT="{sdk_root}"',
-                f'export ANDROID_HOME="{sdk_root}"',
-                f'export ANDROID_AVD_HOME="$HOME/.android/avd"',
-                f'export PATH="$PATH:{sdk_root}/cmdline-tools/latest/bin"',
-                f'export PATH="$PATH:{sdk_root}/platform-tools"',
-                f'export PATH="$PATH:{sdk_root}/emulator"'
-            ]
-            
-            # 检查是否已存在
-            if 'ANDROID_SDK_ROOT' not in content:
-                # 添加环境变量
-                with open(rc_file, 'a') as f:
-                    f.write('\n'.join(env_vars))
-                
-                # 执行 source 命令刷新环境变量
-                try:
-                    subprocess.run(
-                        [shell_path, '-c', f'source {rc_file}'],
-                        check=True,
-                        capture_output=True
-                    )
-                    self.toast.showMessage("环境变量已自动刷新")
-                except Exception as e:
-                    print(f"刷新环境变量时出错: {str(e)}")
+            self.toast.showMessage(f"Command-line Tools 安装完成")
+            self.setup_environment(os.path.dirname(os.path.dirname(install_path)))
             
             # 刷新界面状态
             self.check_environment()
             
-            # 如果在一键检测模式下，继续安装下一个组件
-            if hasattr(self, 'current_install_index') and hasattr(self, 'install_queue'):
-                self.handle_component_finished()
-            
         except Exception as e:
             QMessageBox.warning(self, "安装错误", f"安装工具失败：{str(e)}")
 
+    def setup_environment(self, sdk_root):
+        """重新查找 SDK 工具，并把环境变量写入 shell 配置文件"""
+        # 重新查找 SDK 工具
+        sdk_tools.invalidate()
+        
+        # 配置环境变量
+        shell_type = os.path.basename(os.environ.get('SHELL', '/bin/bash'))
+        shell_path = '/bin/zsh' if shell_type == 'zsh' else '/bin/bash'
+        rc_file = os.path.expanduser('~/.zshrc' if shell_type == 'zsh' else '~/.bashrc')
+        
+        # 读取现有内容
+        try:
+            with open(rc_file, 'r') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ''
+        
+        # 准备要添加的环境变量
+        env_vars = [
+            f'\n# Android SDK',
+            f'export ANDROID_SDK_ROOT="{sdk_root}"',
+            f'export ANDROID_HOME="{sdk_root}"',
+            f'export ANDROID_AVD_HOME="$HOME/.android/avd"',
+            f'export PATH="$PATH:{sdk_root}/cmdline-tools/latest/bin"',
+            f'export PATH="$PATH:{sdk_root}/platform-tools"',
+            f'export PATH="$PATH:{sdk_root}/emulator"'
+        ]
+        
+        # 检查是否已存在
+        if 'ANDROID_SDK_ROOT' not in content:
+            # 添加环境变量
+            with open(rc_file, 'a') as f:
+                f.write('\n'.join(env_vars))
+            
+            # 执行 source 命令刷新环境变量
+            try:
+                subprocess.run(
+                    [shell_path, '-c', f'source {rc_file}'],
+                    check=True,
+                    capture_output=True
+                )
+                self.toast.showMessage("环境变量已自动刷新")
+            except Exception as e:
+                print(f"刷新环境变量时出错: {str(e)}")
+
     def download_platform_tools(self):
         """下载 Platform Tools 组件"""
         try:
             # 检查是否有 sdkmanager
-            avdmanager = find_avdmanager()
-            if not avdmanager:
+            sdkmanager = find_sdkmanager()
+            if not sdkmanager:
                 QMessageBox.warning(self, "错误", "请先安装 Command-line Tools")
                 return
             
-            sdkmanager = os.path.join(os.path.dirname(avdmanager), 'sdkmanager')
-            
             # 更改按钮状态
             self.platform_tools_download_btn.setText("下载中...")
             self.platform_tools_download_btn.setEnabled(False)
@@ -589,9 +534,8 @@ class EnvironmentDialog(QDialog):
         
         if success:
             self.toast.showMessage("Platform Tools 组件安装成功")
+            sdk_tools.invalidate()
             self.check_environment()  # 更新界面
-            if hasattr(self, 'current_install_index') and hasattr(self, 'install_queue'):
-                self.handle_component_finished()
         else:
             self.platform_tools_download_btn.setText("下载组件")
             QMessageBox.warning(self, "安装错误", f"安装 Platform Tools 组件失败：{error_msg}")
@@ -600,13 +544,11 @@ class EnvironmentDialog(QDialog):
         """下载 Emulator 组件"""
         try:
             # 检查是否有 sdkmanager
-            avdmanager = find_avdmanager()
-            if not avdmanager:
+            sdkmanager = find_sdkmanager()
+            if not sdkmanager:
                 QMessageBox.warning(self, "错误", "请先安装 Command-line Tools")
                 return
             
-            sdkmanager = os.path.join(os.path.dirname(avdmanager), 'sdkmanager')
-            
             # 更改按钮状态
             self.emulator_download_btn.setText("下载中...")
             self.emulator_download_btn.setEnabled(False)
@@ -660,9 +602,8 @@ class EnvironmentDialog(QDialog):
         
         if success:
             self.toast.showMessage("Emulator 组件安装成功")
+            sdk_tools.invalidate()
             self.check_environment()  # 更新界面
-            if hasattr(self, 'current_install_index') and hasattr(self, 'install_queue'):
-                self.handle_component_finished()
         else:
             self.emulator_download_btn.setText("下载组件")
             QMessageBox.warning(self, "安装错误", f"安装 Emulator 组件失败：{error_msg}")
@@ -671,13 +612,11 @@ class EnvironmentDialog(QDialog):
         """下载 Android Platform 组件"""
         try:
             # 检查是否有 sdkmanager
-            avdmanager = find_avdmanager()
-            if not avdmanager:
+            sdkmanager = find_sdkmanager()
+            if not sdkmanager:
                 QMessageBox.warning(self, "错误", "请先安装 Command-line Tools")
                 return
             
-            sdkmanager = os.path.join(os.path.dirname(avdmanager), 'sdkmanager')
-            
             # 更改按钮状态
             self.platform_download_btn.setText("下载中...")
             self.platform_download_btn.setEnabled(False)
@@ -752,9 +691,8 @@ class EnvironmentDialog(QDialog):
         
         if success:
             self.toast.showMessage(f"Android {msg} Platform 安装成功")
+            sdk_tools.invalidate()
             self.check_environment()  # 更新界面
-            if hasattr(self, 'current_install_index') and hasattr(self, 'install_queue'):
-                self.handle_component_finished()
         else:
             self.platform_download_btn.setText("下载组件")
             QMessageBox.warning(self, "安装错误", f"安装 Android Platform 组件失败：{msg}")
@@ -762,50 +700,75 @@ class EnvironmentDialog(QDialog):
     def check_and_install_all(self):
         """一键检测并安装所有缺失组件"""
         try:
-            # 禁用所有按钮
-            self.check_all_btn.setEnabled(False)
-            self.close_btn.setEnabled(False)
-            self.tools_download_btn.setEnabled(False)
-            self.platform_tools_download_btn.setEnabled(False)
-            self.emulator_download_btn.setEnabled(False)
-            self.platform_download_btn.setEnabled(False)
-            
-            # 创建安装队列
-            self.install_queue = []
-            
             # 检查各组件
+            components = []
             if not find_avdmanager():
-                self.install_queue.append(('cmdline-tools', self.download_cmdline_tools))
+                components.append('cmdline-tools')
             
             if not os.path.exists(os.path.join(ANDROID_HOME, 'platform-tools/adb')):
-                self.install_queue.append(('platform-tools', self.download_platform_tools))
+                components.append('platform-tools')
             
             if not os.path.exists(os.path.join(ANDROID_HOME, 'emulator/emulator')):
-                self.install_queue.append(('emulator', self.download_emulator))
+                components.append('emulator')
             
             platforms_path = os.path.join(ANDROID_HOME, 'platforms')
             if not os.path.exists(platforms_path) or not os.listdir(platforms_path):
-                self.install_queue.append(('platform', self.download_platform))
+                components.append('platform')
             
-            if not self.install_queue:
+            if not components:
                 self.toast.showMessage("所有组件已安装")
-                self.enable_all_buttons()
                 return
             
+            # 禁用所有按钮
+            self.check_all_btn.setEnabled(False)
+            self.tools_download_btn.setEnabled(False)
+            self.platform_tools_download_btn.setEnabled(False)
+            self.emulator_download_btn.setEnabled(False)
+            self.platform_download_btn.setEnabled(False)
+            
             # 显示进度组
             self.progress_group.show()
-            self.progress_label.setText(f"正在安装 {self.install_queue[0][0]} 组件...")
-            self.progress_bar.setRange(0, len(self.install_queue))
+            self.progress_label.setText(f"正在安装 {'、'.join(components)} 组件...")
+            self.progress_bar.setRange(0, 100)
             self.progress_bar.setValue(0)
             
-            # 开始安装第一个组件
-            self.current_install_index = 0
-            self.install_next_component()
+            # cmdline-tools 和其他组件并行下载，需要 sdkmanager 的组件最后合并安装
+            self.download_thread = InstallAllThread(components)
+            self.download_thread.progress.connect(self.handle_install_all_progress)
+            self.download_thread.finished.connect(self.handle_install_all_finished)
+            self.download_thread.start()
             
         except Exception as e:
             self.enable_all_buttons()
             QMessageBox.warning(self, "错误", f"检测安装失败：{str(e)}")
 
+    def handle_install_all_progress(self, progress, text):
+        """更新一键安装的总进度"""
+        self.progress_bar.setValue(progress)
+        self.progress_label.setText(text)
+
+    def handle_install_all_finished(self, errors):
+        """处理一键安装完成"""
+        self.progress_group.hide()
+        self.enable_all_buttons()
+        sdk_tools.invalidate()
+        if 'cmdline-tools' in self.download_thread.components and find_avdmanager():
+            self.setup_environment(sdk_installer.sdk_root)
+        self.check_environment()  # 刷新状态
+        
+        if errors.get('cancelled'):
+            self.toast.showMessage("安装已取消")
+        elif errors:
+            details = '\n'.join(f"{name}: {error}" for name, error in errors.items())
+            QMessageBox.warning(self, "安装错误", f"部分组件安装失败：\n{details}")
+        elif self.check_all_components_installed():
+            self.toast.showMessage("所有组件安装完成")
+            # 修改关闭按钮文字
+            self.close_btn.setText("关闭")
+            self.close_btn.setProperty("cancel", False)
+            self.close_btn.style().unpolish(self.close_btn)
+            self.close_btn.style().polish(self.close_btn)
+
     def check_all_components_installed(self):
         """检查所有组件是否都已安装"""
         # 检查 Command-line Tools
@@ -827,48 +790,6 @@ class EnvironmentDialog(QDialog):
         
         return True
 
-    def handle_component_finished(self):
-        """处理组件安装完成"""
-        # 检查是否所有组件都已安装
-        if self.check_all_components_installed():
-            # 所有组件安装完成
-            self.progress_group.hide()
-            self.toast.showMessage("所有组件安装完成")
-            self.enable_all_buttons()
-            self.check_environment()  # 刷新状态
-            # 修改关闭按钮文字
-            self.close_btn.setText("关闭")
-            self.close_btn.setProperty("cancel", False)
-            self.close_btn.style().unpolish(self.close_btn)
-            self.close_btn.style().polish(self.close_btn)
-        else:
-            # 继续安装下一个组件
-            self.current_install_index += 1
-            self.install_next_component()
-
-    def install_next_component(self):
-        """安装下一个组件"""
-        if self.current_install_index >= len(self.install_queue):
-            # 所有组件安装完成
-            self.progress_group.hide()
-            self.toast.showMessage("所有组件安装完成")
-            self.enable_all_buttons()
-            self.check_environment()  # 刷新状态
-            # 修改关闭按钮文字
-            self.close_btn.setText("关闭")
-            self.close_btn.setProperty("cancel", False)
-            self.close_btn.style().unpolish(self.close_btn)
-            self.close_btn.style().polish(self.close_btn)
-            return
-        
-        # 获取当前要安装的组件
-        component_name, install_func = self.install_queue[self.current_install_index]
-        self.progress_label.setText(f"正在安装 {component_name} 组件...")
-        self.progress_bar.setValue(self.current_install_index)
-        
-        # 调用安装函数
-        install_func()
-
     def cancel_download(self):
         """取消下载"""
         if self.download_thread and self.download_thread.isRunning():
@@ -893,50 +814,79 @@ class DownloadThread(QThread):
     finished = pyqtSignal(str)  # 完成信号
     error = pyqtSignal(str)  # 错误信号
     
-    def __init__(self, url, save_path):
+    def __init__(self, url, save_path, checksum=None, checksum_type='sha1', size=None, extract_to=None):
         super().__init__()
         self.url = url
         self.save_path = save_path
+        self.checksum = checksum
+        self.checksum_type = checksum_type
+        self.size = size
+        self.extract_to = extract_to
         self._is_cancelled = False
     
     def cancel(self):
         """取消下载"""
         self._is_cancelled = True
     
+    def report_progress(self, downloaded, total_size):
+        if total_size:
+            progress = int((downloaded / total_size) * 100)
+            self.progress.emit(progress, f"正在下载 Command-line Tools... {progress}%")
+    
     def run(self):
         try:
-            # 发送请求并获取文件大小
-            response = requests.get(self.url, stream=True)
-            response.raise_for_status()  # 检查请求是否成功
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # 下载文件
-            downloaded = 0
-            with open(self.save_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if self._is_cancelled:
-                        raise Exception("下载已取消")
-                    if chunk:
-                        f.write(chunk)
-                        f.flush()  # 立即写入磁盘
-                        os.fsync(f.fileno())  # 确保写入磁盘
-                        downloaded += len(chunk)
-                        if total_size:
-                            progress = int((downloaded / total_size) * 100)
-                            self.progress.emit(progress, f"正在下载 Command-line Tools... {progress}%")
-            
-            # 验证文件大小
-            if os.path.getsize(self.save_path) != total_size:
-                raise Exception("文件下载不完整")
+            if self.extract_to:
+                # 边下载边解压，去掉压缩包中的第一级目录，校验通过后整体替换到 extract_to
+                download_and_extract(self.url, self.extract_to, strip_components=1,
+                                     progress=self.report_progress,
+                                     cancelled=lambda: self._is_cancelled,
+                                     checksum=self.checksum,
+                                     checksum_type=self.checksum_type,
+                                     size=self.size)
+                self.finished.emit(self.extract_to)
+                return
+            
+            # 先查安装包缓存，服务器支持 Range 时多连接分段下载，校验通过后才会生成 save_path
+            package_cache.download(self.url, self.save_path,
+                                   progress=self.report_progress,
+                                   cancelled=lambda: self._is_cancelled,
+                                   checksum=self.checksum,
+                                   checksum_type=self.checksum_type,
+                                   size=self.size)
             
             # 下载完成后发送信号
             self.finished.emit(self.save_path)
             
         except Exception as e:
-            # 发生错误时删除已下载的文件
-            if os.path.exists(self.save_path):
-                try:
-                    os.remove(self.save_path)
-                except:
-                    pass
-            self.error.emit(str(e)) 
\ No newline at end of file
+            # 已下载的部分会保留，下次从断点继续
+            self.error.emit(str(e))
+
+
+class InstallAllThread(QThread):
+    """一键安装线程"""
+    progress = pyqtSignal(int, str)  # 总进度, 提示文字
+    finished = pyqtSignal(dict)  # {组件名称: 错误信息}，取消时为 {'cancelled': ...}
+    
+    def __init__(self, components):
+        super().__init__()
+        self.components = components
+        self._is_cancelled = False
+    
+    def cancel(self):
+        """取消安装"""
+        self._is_cancelled = True
+    
+    def report_progress(self, downloaded, total_size, running):
+        progress = int(downloaded * 100 / total_size) if total_size else 0
+        names = '、'.join(running) if running else '组件'
+        self.progress.emit(progress, f"正在安装 {names}... {progress}%")
+    
+    def run(self):
+        try:
+            errors = sdk_installer.install_all(self.components, progress=self.report_progress,
+                                               cancelled=lambda: self._is_cancelled)
+            self.finished.emit(errors)
+        except DownloadCancelled as e:
+            self.finished.emit({'cancelled': str(e)})
+        except Exception as e:
+            self.finished.emit({'一键安装': str(e)})
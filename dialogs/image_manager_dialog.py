@@ -1,106 +1,137 @@
-from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, 
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, 
                             QPushButton,QMessageBox, QHBoxLayout, QDialog, QProgressDialog,
                             QTabWidget, QTableWidget, QTableWidgetItem)
 from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QColor
 
 import os
+import time
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from ui.toast import Toast
-from utils import find_avdmanager
+from utils import find_sdkmanager
 from ui.loading_dialog import LoadingDialog
+from core.sdk_packages import installed_packages
+from core.sdk_repository import sdk_repository
+from core.catalog_cache import catalog_cache
+from core.image_installer import image_installer
+from core.downloader import DownloadCancelled
+from core.download_queue import download_queue
+from dialogs.download_panel import show_download_panel
 
 class LoadImagesThread(QThread):
     """加载镜像数据的线程"""
     finished = pyqtSignal(list, list)  # 发送 (可用镜像列表, 已安装镜像列表)
     error = pyqtSignal(str)  # 发送错误信息
     
+    # 两个阶段共用的超时时间（秒）
+    TIMEOUT = 30
+    
     def __init__(self):
         super().__init__()
         self._is_running = True
     
     def run(self):
+        executor = ThreadPoolExecutor(max_workers=2)
         try:
-            # 创建一个定时器线程
-            timer = QTimer()
-            timer.setSingleShot(True)
-            timer.timeout.connect(self.handle_timeout)
-            timer.start(30000)  # 30秒超时
-            
-            sdkmanager = os.path.join(os.path.dirname(find_avdmanager()), 'sdkmanager')
-            if not os.path.exists(sdkmanager):
-                raise Exception("找不到 sdkmanager 工具")
-            
-            # 获取所有可用镜像
-            list_cmd = [sdkmanager, '--list']
-            result = subprocess.run(list_cmd, capture_output=True, text=True, timeout=30)
+            deadline = time.monotonic() + self.TIMEOUT
+            timings = {}
             
-            # 获取已安装镜像
-            installed_cmd = [sdkmanager, '--list_installed']
-            installed_result = subprocess.run(installed_cmd, capture_output=True, text=True, timeout=30)
+            # 同时读取已安装镜像和可用镜像
+            installed_future = executor.submit(self.timed, timings, '已安装镜像', installed_packages.system_images)
+            available_future = executor.submit(self.timed, timings, '可用镜像', self.load_available_images, deadline)
+            installed_images = installed_future.result(timeout=self.remaining(deadline))
+            available_images = available_future.result(timeout=self.remaining(deadline))
             
             # 如果线程已被终止，直接返回
             if not self._is_running:
                 return
             
-            # 解析可用镜像
-            available_images = {}
-            for line in result.stdout.split('\n'):
-                if 'system-images;android-' in line:
-                    try:
-                        parts = line.strip().split('|')[0].strip().split(';')
-                        version = parts[1].replace('android-', '')
-                        image_type = parts[2]
-                        arch = parts[3]
-                        
-                        image_id = f"{version};{image_type};{arch}"
-                        is_installed = f'system-images;android-{version};{image_type};{arch}' in installed_result.stdout
-                        
-                        if image_id not in available_images:
-                            available_images[image_id] = {
-                                'version': version,
-                                'type': image_type,
-                                'arch': arch,
-                                'installed': is_installed
-                            }
-                    except:
-                        continue
-            
-            # 解析已安装镜像
-            installed_images = []
-            for line in installed_result.stdout.split('\n'):
-                if 'system-images;android-' in line:
-                    try:
-                        parts = line.strip().split('|')[0].strip().split(';')
-                        version = parts[1].replace('android-', '')
-                        image_type = parts[2]
-                        arch = parts[3]
-                        
-                        installed_images.append({
-                            'version': version,
-                            'type': image_type,
-                            'arch': arch
-                        })
-                    except:
-                        continue
+            # 用已安装镜像路径的集合标记安装状态
+            start = time.monotonic()
+            installed_paths = {image['full_name'] for image in installed_images}
+            for image in available_images:
+                image['installed'] = image['path'] in installed_paths
+            timings['合并'] = time.monotonic() - start
             
-            # 停止定时器
-            timer.stop()
+            print("加载镜像列表耗时: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
             
             # 如果线程仍在运行，发送结果
             if self._is_running:
-                self.finished.emit(list(available_images.values()), installed_images)
+                self.finished.emit(available_images, installed_images)
             
-        except subprocess.TimeoutExpired:
-            self.error.emit("加载超时，请检查网络连接")
+        except (subprocess.TimeoutExpired, FutureTimeoutError):
+            if self._is_running:
+                self.error.emit("加载超时，请检查网络连接")
         except Exception as e:
             if self._is_running:
                 self.error.emit(str(e))
+        finally:
+            # 超时时不等待仍在运行的任务
+            executor.shutdown(wait=False)
     
-    def handle_timeout(self):
-        """处理超时"""
-        self._is_running = False
-        self.error.emit("加载超时，请检查网络连接")
+    @staticmethod
+    def remaining(deadline):
+        """距离截止时间的剩余秒数"""
+        return max(0, deadline - time.monotonic())
+    
+    @staticmethod
+    def timed(timings, name, func, *args):
+        """执行并记录耗时"""
+        start = time.monotonic()
+        try:
+            return func(*args)
+        finally:
+            timings[name] = time.monotonic() - start
+    
+    def load_available_images(self, deadline):
+        """获取所有可用镜像，直接读取仓库 XML，失败时回退到 sdkmanager"""
+        try:
+            return self.load_remote_images()
+        except Exception as e:
+            print(f"读取仓库 XML 失败，回退到 sdkmanager: {str(e)}")
+            return self.load_sdkmanager_images(self.remaining(deadline))
+    
+    def load_remote_images(self):
+        """从仓库 XML 读取可用镜像"""
+        return [{
+            'version': image.version,
+            'type': image.tag,
+            'arch': image.abi,
+            'path': image.path,
+            'size': image.size
+        } for image in sdk_repository.system_images()]
+    
+    def load_sdkmanager_images(self, timeout):
+        """通过 sdkmanager --list 读取可用镜像"""
+        sdkmanager = find_sdkmanager()
+        if not sdkmanager:
+            raise Exception("找不到 sdkmanager 工具")
+        
+        list_cmd = [sdkmanager, '--list']
+        result = subprocess.run(list_cmd, capture_output=True, text=True, timeout=timeout)
+        
+        # 解析可用镜像
+        available_images = {}
+        for line in result.stdout.split('\n'):
+            if 'system-images;android-' in line:
+                try:
+                    path = line.strip().split('|')[0].strip()
+                    parts = path.split(';')
+                    version = parts[1].replace('android-', '')
+                    image_type = parts[2]
+                    arch = parts[3]
+                    
+                    if path not in available_images:
+                        available_images[path] = {
+                            'version': version,
+                            'type': image_type,
+                            'arch': arch,
+                            'path': path
+                        }
+                except:
+                    continue
+        return list(available_images.values())
     
     def stop(self):
         """停止线程"""
@@ -205,6 +236,34 @@ class ImageManagerDialog(QDialog):
             }
         """)
         download_btn.clicked.connect(self.download_selected)
+        
+        # 刷新按钮，忽略缓存有效期重新加载
+        refresh_btn = QPushButton("刷新列表")
+        refresh_btn.setFixedHeight(35)
+        refresh_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #f5f6fa;
+                color: #2c3e50;
+                border: 2px solid #dcdde1;
+                border-radius: 5px;
+                padding: 0 20px;
+                font-size: 13px;
+                font-weight: bold;
+                min-height: 35px;
+            }
+            QPushButton:hover {
+                background-color: #dcdde1;
+            }
+        """)
+        refresh_btn.clicked.connect(lambda: self.load_images(force=True))
+        
+        # 下载队列按钮，面板关闭后可以重新打开查看进度
+        queue_btn = QPushButton("下载队列")
+        queue_btn.setFixedHeight(35)
+        queue_btn.setStyleSheet(refresh_btn.styleSheet())
+        queue_btn.clicked.connect(self.show_download_panel)
+        button_layout.addWidget(queue_btn)
+        button_layout.addWidget(refresh_btn)
         button_layout.addWidget(download_btn)
         
         available_layout.addLayout(button_layout)
@@ -244,6 +303,10 @@ class ImageManagerDialog(QDialog):
         
         # 添加加载线程属性
         self.load_thread = None
+        
+        # 下载队列，对话框关闭后下载继续进行
+        download_queue.task_finished.connect(self.handle_task_finished)
+        self.finished.connect(self.disconnect_queue)
     
     def init_data(self):
         """初始化数据"""
@@ -265,10 +328,22 @@ class ImageManagerDialog(QDialog):
         except:
             return 0  # 如果无法解析，返回0作为最低优先级
 
-    def load_images(self):
-        """加载镜像数据"""
-        # 显示加载动画
-        self.loading.show()
+    def load_images(self, force=False):
+        """加载镜像数据
+        Args:
+            force: 是否忽略缓存有效期，强制重新加载
+        """
+        # 先显示缓存的镜像目录，已安装状态每次从本地重新读取
+        cached = catalog_cache.load()
+        if cached is not None:
+            self.show_images(cached['images'], installed_packages.system_images())
+        
+        if not force and not catalog_cache.is_stale(cached):
+            return
+        
+        # 没有缓存时才显示加载动画，否则在后台重新加载
+        if cached is None:
+            self.loading.show()
         
         # 创建并启动加载线程
         if self.load_thread:
@@ -281,47 +356,8 @@ class ImageManagerDialog(QDialog):
     def handle_images_loaded(self, available_images, installed_images):
         """处理镜像数据加载完成"""
         try:
-            # 按版本号和安装状态排序可用镜像
-            available_images.sort(key=lambda x: (-int(x['installed']), -self.get_version_sort_key(x['version'])))
-            
-            # 更新可用镜像表格
-            self.available_table.setRowCount(0)
-            for image in available_images:
-                row = self.available_table.rowCount()
-                self.available_table.insertRow(row)
-                self.available_table.setItem(row, 0, QTableWidgetItem(image['version']))
-                self.available_table.setItem(row, 1, QTableWidgetItem(image['type']))
-                self.available_table.setItem(row, 2, QTableWidgetItem(image['arch']))
-                status_item = QTableWidgetItem("已下载" if image['installed'] else "未下载")
-                status_item.setForeground(QColor("#2ecc71" if image['installed'] else "#95a5a6"))
-                self.available_table.setItem(row, 3, status_item)
-            
-            # 按版本号排序已安装镜像
-            installed_images.sort(key=lambda x: -self.get_version_sort_key(x['version']))
-            
-            # 更新已安装镜像表格
-            self.installed_table.setRowCount(0)
-            for image in installed_images:
-                row = self.installed_table.rowCount()
-                self.installed_table.insertRow(row)
-                self.installed_table.setItem(row, 0, QTableWidgetItem(image['version']))
-                self.installed_table.setItem(row, 1, QTableWidgetItem(image['type']))
-                self.installed_table.setItem(row, 2, QTableWidgetItem(image['arch']))
-                
-                # 创建删除按钮容器
-                container = QWidget()
-                layout = QHBoxLayout(container)
-                layout.setContentsMargins(0, 0, 0, 0)
-                layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                
-                delete_btn = QPushButton("删除")
-                delete_btn.setProperty("version", image['version'])
-                delete_btn.setProperty("type", image['type'])
-                delete_btn.setProperty("arch", image['arch'])
-                delete_btn.clicked.connect(self.delete_image)
-                
-                layout.addWidget(delete_btn)
-                self.installed_table.setCellWidget(row, 3, container)
+            catalog_cache.save(available_images)
+            self.show_images(available_images, installed_images)
             
             # 关闭加载动画
             self.loading.hide()
@@ -329,86 +365,144 @@ class ImageManagerDialog(QDialog):
         except Exception as e:
             self.handle_load_error(str(e))
     
+    def show_images(self, available_images, installed_images):
+        """更新两个表格，只修改有变化的行"""
+        installed_keys = {self.image_key(image) for image in installed_images}
+        available_images = [dict(image, installed=self.image_key(image) in installed_keys)
+                             for image in available_images]
+        
+        # 按版本号和安装状态排序可用镜像
+        available_images.sort(key=lambda x: (-int(x['installed']), -self.get_version_sort_key(x['version'])))
+        self.patch_table(self.available_table, available_images, self.fill_available_row)
+        
+        # 按版本号排序已安装镜像
+        installed_images = sorted(installed_images, key=lambda x: -self.get_version_sort_key(x['version']))
+        self.patch_table(self.installed_table, installed_images, self.fill_installed_row)
+    
+    @staticmethod
+    def image_key(image):
+        """镜像的唯一标识"""
+        return f"{image['version']};{image['type']};{image['arch']}"
+    
+    def patch_table(self, table, images, fill_row):
+        """按镜像标识对比表格内容，保留未变化的行，避免整表重建丢失选中状态"""
+        keys = [self.image_key(image) for image in images]
+        wanted = set(keys)
+        
+        # 删除已不存在的行
+        for row in reversed(range(table.rowCount())):
+            item = table.item(row, 0)
+            if item is None or item.data(Qt.ItemDataRole.UserRole) not in wanted:
+                table.removeRow(row)
+        
+        for row, (key, image) in enumerate(zip(keys, images)):
+            item = table.item(row, 0)
+            current = item.data(Qt.ItemDataRole.UserRole) if item else None
+            if current == key:
+                # 行位置不变，仅在内容变化时更新
+                if table.item(row, 0).data(Qt.ItemDataRole.UserRole + 1) != image:
+                    fill_row(table, row, image)
+                continue
+            
+            # 顺序变化的行先从原位置删除，再插入到新位置
+            for other in range(row + 1, table.rowCount()):
+                if table.item(other, 0).data(Qt.ItemDataRole.UserRole) == key:
+                    table.removeRow(other)
+                    break
+            table.insertRow(row)
+            fill_row(table, row, image)
+        
+        # 删除多余的行
+        while table.rowCount() > len(images):
+            table.removeRow(table.rowCount() - 1)
+    
+    def fill_available_row(self, table, row, image):
+        """填充可用镜像表格的一行"""
+        version_item = QTableWidgetItem(image['version'])
+        version_item.setData(Qt.ItemDataRole.UserRole, self.image_key(image))
+        version_item.setData(Qt.ItemDataRole.UserRole + 1, image)
+        table.setItem(row, 0, version_item)
+        table.setItem(row, 1, QTableWidgetItem(image['type']))
+        table.setItem(row, 2, QTableWidgetItem(image['arch']))
+        status_item = QTableWidgetItem("已下载" if image['installed'] else "未下载")
+        status_item.setForeground(QColor("#2ecc71" if image['installed'] else "#95a5a6"))
+        table.setItem(row, 3, status_item)
+    
+    def fill_installed_row(self, table, row, image):
+        """填充已安装镜像表格的一行"""
+        version_item = QTableWidgetItem(image['version'])
+        version_item.setData(Qt.ItemDataRole.UserRole, self.image_key(image))
+        version_item.setData(Qt.ItemDataRole.UserRole + 1, image)
+        table.setItem(row, 0, version_item)
+        table.setItem(row, 1, QTableWidgetItem(image['type']))
+        table.setItem(row, 2, QTableWidgetItem(image['arch']))
+        
+        # 创建删除按钮容器
+        container = QWidget()
+        layout = QHBoxLayout(container)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        
+        delete_btn = QPushButton("删除")
+        delete_btn.setProperty("version", image['version'])
+        delete_btn.setProperty("type", image['type'])
+        delete_btn.setProperty("arch", image['arch'])
+        delete_btn.clicked.connect(self.delete_image)
+        
+        layout.addWidget(delete_btn)
+        table.setCellWidget(row, 3, container)
+    
     def handle_load_error(self, error_msg):
         """处理加载错误"""
         # 关闭加载动画
         self.loading.hide()
-        QMessageBox.warning(self, "错误", f"加载镜像列表失败：{error_msg}")
+        if self.available_table.rowCount():
+            # 已显示缓存内容时只做提示
+            self.toast.showMessage(f"刷新镜像列表失败：{error_msg}")
+        else:
+            QMessageBox.warning(self, "错误", f"加载镜像列表失败：{error_msg}")
     
     def download_selected(self):
-        """下载选中的镜像"""
+        """把选中的镜像加入下载队列"""
         # 获取选中的行
         selected_rows = set(item.row() for item in self.available_table.selectedItems())
         if not selected_rows:
             QMessageBox.warning(self, "提示", "请先选择要下载的镜像")
             return
         
-        try:
-            # 创建进度对话框
-            self.progress = QProgressDialog("正在下载系统镜像...", "取消", 0, 0, self)
-            self.progress.setWindowModality(Qt.WindowModality.WindowModal)
-            self.progress.setAutoClose(True)
-            self.progress.setStyleSheet("""
-                QProgressDialog {
-                    background-color: white;
-                    border-radius: 10px;
-                }
-                QLabel {
-                    font-size: 14px;
-                    color: #2c3e50;
-                    padding: 10px;
-                }
-                QPushButton {
-                    padding: 8px 20px;
-                    border-radius: 5px;
-                    font-size: 13px;
-                    font-weight: bold;
-                    background-color: #f5f6fa;
-                    color: #2c3e50;
-                    border: 2px solid #dcdde1;
-                }
-            """)
-            self.progress.show()
-            
-            # 获取 sdkmanager 路径
-            sdkmanager = os.path.join(os.path.dirname(find_avdmanager()), 'sdkmanager')
-            
-            # 下载每个选中的镜像
-            for row in selected_rows:
-                version = self.available_table.item(row, 0).text()
-                image_type = self.available_table.item(row, 1).text()
-                arch = self.available_table.item(row, 2).text()
-                
-                system_image = f'system-images;android-{version};{image_type};{arch}'
-                self.progress.setLabelText(f"正在下载 Android {version} 系统镜像...")
-                
-                # 创建并启动下载线程
-                self.download_thread = ImageDownloadThread(sdkmanager, system_image)
-                self.download_thread.progress.connect(self.handle_download_progress)
-                self.download_thread.finished.connect(lambda v=version: self.handle_download_finished(v))
-                self.download_thread.start()
-                
-                # 等待下载完成
-                while self.download_thread.isRunning():
-                    QApplication.processEvents()
-                    if self.progress.wasCanceled():
-                        break
-            
-            self.progress.close()
-            
-            # 刷新列表
+        for row in sorted(selected_rows):
+            version = self.available_table.item(row, 0).text()
+            image_type = self.available_table.item(row, 1).text()
+            arch = self.available_table.item(row, 2).text()
+            system_image = f'system-images;android-{version};{image_type};{arch}'
+            download_queue.add(system_image, f"Android {version} {image_type} {arch}",
+                               lambda progress, cancelled, throttle, path=system_image:
+                                   install_system_image(path, progress, cancelled, throttle),
+                               discard=lambda path=system_image: image_installer.discard(path))
+        
+        self.show_download_panel()
+    
+    def show_download_panel(self):
+        """显示下载队列面板"""
+        show_download_panel(self)
+    
+    def handle_task_finished(self, task_id, success):
+        """下载队列中的镜像安装完成"""
+        if not task_id.startswith('system-images;'):
+            return
+        task = download_queue.get(task_id)
+        if success:
+            self.toast.showMessage(f"{task.name} 安装完成")
             self.load_images()
-            
-        except Exception as e:
-            QMessageBox.warning(self, "错误", f"下载镜像失败：{str(e)}")
+            self.handle_download_finished(task_id.split(';')[1].replace('android-', ''))
+        elif task and task.error:
+            self.toast.showMessage(f"{task.name} 下载失败：{task.error}")
     
-    def handle_download_progress(self, text, error):
-        """处理下载进度"""
-        if error:
-            QMessageBox.warning(self, "错误", error)
-            self.progress.close()
-        elif text:
-            self.progress.setLabelText(text)
+    def disconnect_queue(self):
+        try:
+            download_queue.task_finished.disconnect(self.handle_task_finished)
+        except TypeError:
+            pass
     
     def handle_download_finished(self, version):
         """处理下载完成"""
@@ -551,7 +645,7 @@ class ImageManagerDialog(QDialog):
                 progress.show()
                 
                 system_image = f'system-images;android-{version};{image_type};{arch}'
-                sdkmanager = os.path.join(os.path.dirname(find_avdmanager()), 'sdkmanager')
+                sdkmanager = find_sdkmanager()
                 
                 # 修改删除命令的格式
                 delete_cmd = [sdkmanager, '--uninstall', system_image]
@@ -584,57 +678,19 @@ class ImageManagerDialog(QDialog):
         # 停止加载线程
         if self.load_thread:
             self.load_thread.stop()
+        self.disconnect_queue()
         super().closeEvent(event)
 
-class ImageDownloadThread(QThread):
-    """镜像下载线程"""
-    progress = pyqtSignal(str, str)  # 进度信号 (文本, 错误信息)
-    finished = pyqtSignal()  # 完成信号
-    
-    def __init__(self, sdkmanager, system_image):
-        super().__init__()
-        self.sdkmanager = sdkmanager
-        self.system_image = system_image
-        self._is_cancelled = False
-    
-    def run(self):
-        try:
-            # 使用 Popen 执行下载命令，并自动确认
-            process = subprocess.Popen(
-                [self.sdkmanager, '--install', self.system_image, '--verbose'],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            
-            # 自动输入 'y' 确认安装
-            process.stdin.write('y\n')
-            process.stdin.flush()
-            
-            # 读取输出并更新进度
-            while True:
-                line = process.stdout.readline()
-                if not line and process.poll() is not None:
-                    break
-                
-                if "Downloading" in line:
-                    try:
-                        # 尝试从输出中提取进度
-                        percent = line.split("%")[0].split()[-1]
-                        self.progress.emit(f"正在下载... {percent}%", "")
-                    except:
-                        pass
-                elif "Installing" in line:
-                    self.progress.emit("正在安装...", "")
-            
-            if process.returncode != 0:
-                error = process.stderr.read()
-                self.progress.emit("", f"下载失败: {error}")
-                return
-            
-            self.finished.emit()
-            
-        except Exception as e:
-            self.progress.emit("", str(e))
 
+def install_system_image(system_image, progress=None, cancelled=None, throttle=None):
+    """安装系统镜像，直接从仓库下载失败时改用 sdkmanager"""
+    try:
+        image_installer.install(system_image, progress=progress, cancelled=cancelled, throttle=throttle)
+    except DownloadCancelled:
+        raise
+    except Exception as e:
+        sdkmanager = find_sdkmanager()
+        if not sdkmanager:
+            raise
+        print(f"直接安装系统镜像失败，改用 sdkmanager: {str(e)}")
+        image_installer.install_with_sdkmanager(sdkmanager, system_image, cancelled)
@@ -0,0 +1,175 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget,
+                            QTableWidgetItem, QInputDialog, QMessageBox)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+
+from ui.toast import Toast
+from ui.styled_button import StyledButton
+from core.snapshot_manager import snapshot_manager
+from core.emulator_supervisor import emulator_supervisor
+from dialogs.download_panel import format_size
+
+
+def format_age(seconds):
+    """格式化快照保存至今的时间"""
+    if seconds < 60:
+        return "刚刚"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} 分钟前"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} 小时前"
+    return f"{int(seconds // 86400)} 天前"
+
+
+class SnapshotTaskThread(QThread):
+    """在后台执行快照操作，保存和加载快照需要几秒"""
+    finished = pyqtSignal(bool, str)  # 是否成功, 提示文字
+
+    def __init__(self, action, message):
+        super().__init__()
+        self.action = action
+        self.message = message
+
+    def run(self):
+        try:
+            self.action()
+            self.finished.emit(True, self.message)
+        except Exception as e:
+            self.finished.emit(False, str(e))
+
+
+class SnapshotDialog(QDialog):
+    """模拟器快照管理对话框
+
+    显示快照的大小和保存时间，可以保存当前状态、恢复和删除快照。
+    模拟器运行时恢复快照只需几秒，未运行时从选中的快照启动。
+    """
+
+    def __init__(self, emulator_name, parent=None):
+        super().__init__(parent)
+        self.emulator_name = emulator_name
+        self.task_thread = None
+        self.setWindowTitle(f"快照管理 - {emulator_name}")
+        self.setMinimumWidth(520)
+        self.setMinimumHeight(320)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: white;
+            }
+            QTableWidget {
+                border: 1px solid #dcdde1;
+                border-radius: 5px;
+                background-color: white;
+                gridline-color: #f5f6fa;
+            }
+            QLabel {
+                color: #2c3e50;
+                font-size: 13px;
+            }
+        """)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(3)
+        self.table.setHorizontalHeaderLabels(["名称", "大小", "保存时间"])
+        self.table.setColumnWidth(0, 220)
+        self.table.setColumnWidth(1, 100)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+        self.save_btn = StyledButton("保存当前状态")
+        self.save_btn.clicked.connect(self.save_snapshot)
+        button_layout.addWidget(self.save_btn)
+        self.load_btn = StyledButton("恢复")
+        self.load_btn.clicked.connect(self.load_snapshot)
+        button_layout.addWidget(self.load_btn)
+        self.delete_btn = StyledButton("删除", "icons/delete.png")
+        self.delete_btn.clicked.connect(self.delete_snapshot)
+        button_layout.addWidget(self.delete_btn)
+        button_layout.addStretch()
+        refresh_btn = StyledButton("刷新", "icons/refresh.png")
+        refresh_btn.clicked.connect(self.load_snapshots)
+        button_layout.addWidget(refresh_btn)
+        layout.addLayout(button_layout)
+
+        self.toast = Toast(self)
+        self.load_snapshots()
+
+    def is_running(self):
+        return emulator_supervisor.console_port(self.emulator_name) is not None
+
+    def load_snapshots(self):
+        """重新读取快照列表"""
+        try:
+            snapshots = snapshot_manager.list(self.emulator_name)
+        except Exception as e:
+            snapshots = []
+            self.toast.showMessage(f"读取快照失败：{str(e)}")
+        self.table.setRowCount(len(snapshots))
+        for row, snapshot in enumerate(snapshots):
+            name = f"{snapshot.name}（快速启动）" if snapshot.quickboot else snapshot.name
+            item = QTableWidgetItem(name)
+            item.setData(Qt.ItemDataRole.UserRole, snapshot.name)
+            self.table.setItem(row, 0, item)
+            self.table.setItem(row, 1, QTableWidgetItem(format_size(snapshot.size)))
+            self.table.setItem(row, 2, QTableWidgetItem(format_age(snapshot.age)))
+
+        running = self.is_running()
+        self.save_btn.setEnabled(running)
+        self.status_label.setText("模拟器运行中，恢复快照会立即生效" if running
+                                  else "模拟器未运行，恢复快照会从该快照启动，退出时不修改快照")
+
+    def selected_snapshot(self):
+        row = self.table.currentRow()
+        if row < 0:
+            self.toast.showMessage("请先选择快照")
+            return None
+        return self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
+
+    def save_snapshot(self):
+        tag, ok = QInputDialog.getText(self, "保存快照", "快照名称：")
+        if not ok or not tag.strip():
+            return
+        tag = tag.strip()
+        self.run_task(lambda: snapshot_manager.save(self.emulator_name, tag), f"已保存快照 {tag}")
+
+    def load_snapshot(self):
+        tag = self.selected_snapshot()
+        if tag:
+            self.run_task(lambda: snapshot_manager.load(self.emulator_name, tag), f"已恢复快照 {tag}")
+
+    def delete_snapshot(self):
+        tag = self.selected_snapshot()
+        if not tag:
+            return
+        reply = QMessageBox.question(self, "确认删除", f"确定要删除快照 {tag} 吗？")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.run_task(lambda: snapshot_manager.delete(self.emulator_name, tag), f"已删除快照 {tag}")
+
+    def run_task(self, action, message):
+        if self.task_thread and self.task_thread.isRunning():
+            self.toast.showMessage("请等待当前操作完成")
+            return
+        self.status_label.setText("正在处理...")
+        self.task_thread = SnapshotTaskThread(action, message)
+        self.task_thread.finished.connect(self.handle_task_finished)
+        self.task_thread.start()
+
+    def handle_task_finished(self, success, message):
+        self.toast.showMessage(message if success else f"操作失败：{message}")
+        self.load_snapshots()
+
+    def closeEvent(self, event):
+        # 等待正在进行的快照操作结束，避免线程对象随对话框销毁
+        if self.task_thread and self.task_thread.isRunning():
+            self.task_thread.wait()
+        super().closeEvent(event)
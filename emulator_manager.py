@@ -13,29 +13,54 @@ from ui.toast import Toast
 from ui.styled_button import StyledButton
 from dialogs.environment_dialog import EnvironmentDialog
 from dialogs.image_manager_dialog import ImageManagerDialog
-from utils import find_avdmanager,EMULATOR_PATH
+from utils import find_avdmanager,AVD_HOME
 from dialogs.config_dialog import EmulatorConfigDialog
+from dialogs.snapshot_dialog import SnapshotDialog
 from ui.loading_dialog import LoadingDialog
+from core.process_index import process_index
+from core.emulator_supervisor import emulator_supervisor
+from core.boot_tracker import boot_tracker
+from core.avd_monitor import AvdMonitor
+from core.avd_inventory import avd_inventory
+from core.sdk_packages import installed_packages
+from core.device_index import device_index
+from core.package_cache import package_cache
+from core.emulator_pool import emulator_pool
+from core.avd_builder import avd_builder, validate_avd_name, update_config_ini, DEFAULT_HARDWARE
 
 
 
 class EmulatorListItem(QWidget):
     """模拟器列表项组件"""
-    def __init__(self, name, status, parent=None):
+    def __init__(self, name, status, info=None, parent=None):
         super().__init__(parent)
         layout = QHBoxLayout(self)
         layout.setContentsMargins(10, 5, 10, 5)
         
         # 名称和状态标签
-        info = QLabel(f"{name} {status}")
-        info.setStyleSheet("font-size: 14px; color: #2c3e50;")
-        layout.addWidget(info)
+        text_layout = QVBoxLayout()
+        text_layout.setSpacing(2)
+        title = QLabel(f"{name} {status}")
+        title.setStyleSheet("font-size: 14px; color: #2c3e50;")
+        text_layout.addWidget(title)
+        
+        # 配置摘要: 系统版本、设备、内存、CPU 核数、数据分区大小
+        details = self.format_details(info or {})
+        if details:
+            detail_label = QLabel(details)
+            detail_label.setStyleSheet("font-size: 12px; font-weight: normal; color: #95a5a6;")
+            text_layout.addWidget(detail_label)
+        layout.addLayout(text_layout)
         
         layout.addStretch()
         
         # 添加控制按钮
-        if "运行中" in status:
-            # 运行中只显示停止按钮
+        snapshot_btn = StyledButton("快照")
+        snapshot_btn.clicked.connect(lambda: parent.show_snapshot_dialog(name))
+        layout.addWidget(snapshot_btn)
+        
+        if "未运行" not in status:
+            # 启动中和运行中只显示停止按钮
             stop_btn = StyledButton("停止", "icons/stop.png")
             stop_btn.setObjectName("stop-btn")
             stop_btn.clicked.connect(lambda: parent.stop_emulator(name))
@@ -50,6 +75,25 @@ class EmulatorListItem(QWidget):
             delete_btn.setObjectName("delete-btn")
             delete_btn.clicked.connect(lambda: parent.delete_emulator(name))
             layout.addWidget(delete_btn)
+    
+    @staticmethod
+    def format_details(info):
+        """生成模拟器配置摘要"""
+        parts = []
+        if info.get('api_level'):
+            image = f"Android {info['api_level']}"
+            if info.get('tag') or info.get('abi'):
+                image += f" ({', '.join(p for p in (info.get('tag'), info.get('abi')) if p)})"
+            parts.append(image)
+        if info.get('device'):
+            parts.append(info['device'])
+        if info.get('ram'):
+            parts.append(f"{info['ram']} MB")
+        if info.get('cores'):
+            parts.append(f"{info['cores']} 核")
+        if info.get('disk_size'):
+            parts.append(f"磁盘 {info['disk_size']} MB")
+        return " · ".join(parts)
 
 class QSwitch(QAbstractButton):
     def __init__(self, parent=None):
@@ -93,86 +137,71 @@ class LoadDeviceImagesThread(QThread):
             if not avdmanager:
                 raise Exception("找不到 avdmanager 工具")
             
-            # 使用 avdmanager 获取设备列表
-            cmd = [avdmanager, 'list', 'device']
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            # 解析输出获取设备列表
-            current_device = {}
-            devices = []
-            
-            for line in result.stdout.split('\n'):
-                line = line.strip()
-                if line.startswith('id:'):
-                    if current_device:
-                        devices.append(current_device)
-                    device_id = line.split('id: ')[1].strip()
-                    if ' or ' in device_id:
-                        device_id = device_id.split(' or ')[0].strip()
-                    current_device = {'id': device_id}
-                elif line.startswith('Name:') and current_device:
-                    name = line.split('Name: ')[1].strip()
-                    if ' or ' in name:
-                        name = name.split(' or ')[0].strip()
-                    current_device['name'] = name
-            
-            if current_device:
-                devices.append(current_device)
-            
-            # 如果没有找到设备，使用默认设备列表
+            # 直接读取 devices.xml 中的设备定义，读取失败时回退到 avdmanager
+            try:
+                devices = device_index.devices()
+            except Exception as e:
+                print(f"读取设备定义失败: {str(e)}")
+                devices = []
             if not devices:
-                devices = [
-                    {"name": "Pixel 6", "id": "pixel_6"},
-                    {"name": "Pixel 5", "id": "pixel_5"},
-                    {"name": "Pixel 4", "id": "pixel_4"},
-                    {"name": "Pixel 3", "id": "pixel_3"},
-                    {"name": "Pixel 2", "id": "pixel_2"},
-                    {"name": "Pixel", "id": "pixel"},
-                    {"name": "Nexus 6P", "id": "Nexus_6P"},
-                    {"name": "Nexus 6", "id": "Nexus_6"},
-                    {"name": "Nexus 5", "id": "Nexus_5"},
-                    {"name": "Pixel C", "id": "pixel_c"},
-                    {"name": "Nexus 9", "id": "Nexus_9"},
-                    {"name": "Nexus 7", "id": "Nexus_7_2013"}
-                ]
+                devices = self.load_avdmanager_devices(avdmanager)
             
             self.devices_loaded.emit(devices)
             
-            # 加载系统镜像
-            sdkmanager = os.path.join(os.path.dirname(find_avdmanager()), 'sdkmanager')
-            if not os.path.exists(sdkmanager):
-                raise Exception("找不到 sdkmanager 工具")
-            
-            # 获取已安装镜像
-            cmd = [sdkmanager, '--list_installed']
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            # 解析输出获取系统镜像
-            images = []
-            for line in result.stdout.split('\n'):
-                if 'system-images;android-' in line:
-                    try:
-                        parts = line.strip().split('|')[0].strip().split(';')
-                        version = parts[1].replace('android-', '')
-                        image_type = parts[2]
-                        arch = parts[3]
-                        
-                        images.append({
-                            'version': version,
-                            'type': image_type,
-                            'arch': arch,
-                            'full_name': f'system-images;android-{version};{image_type};{arch}'
-                        })
-                    except:
-                        continue
-            
-            # 按版本号从大到小排序
-            images.sort(key=lambda x: -int(x['version'].split('-')[0]))
+            # 加载系统镜像，直接读取 SDK 目录中的 package.xml
+            images = installed_packages.system_images()
             
             self.images_loaded.emit(images)
             
         except Exception as e:
             self.error.emit(str(e))
+    
+    def load_avdmanager_devices(self, avdmanager):
+        """通过 avdmanager list device 获取设备列表"""
+        # 使用 avdmanager 获取设备列表
+        cmd = [avdmanager, 'list', 'device']
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        
+        # 解析输出获取设备列表
+        current_device = {}
+        devices = []
+        
+        for line in result.stdout.split('\n'):
+            line = line.strip()
+            if line.startswith('id:'):
+                if current_device:
+                    devices.append(current_device)
+                device_id = line.split('id: ')[1].strip()
+                if ' or ' in device_id:
+                    device_id = device_id.split(' or ')[0].strip()
+                current_device = {'id': device_id}
+            elif line.startswith('Name:') and current_device:
+                name = line.split('Name: ')[1].strip()
+                if ' or ' in name:
+                    name = name.split(' or ')[0].strip()
+                current_device['name'] = name
+        
+        if current_device:
+            devices.append(current_device)
+        
+        # 如果没有找到设备，使用默认设备列表
+        if not devices:
+            devices = [
+                {"name": "Pixel 6", "id": "pixel_6"},
+                {"name": "Pixel 5", "id": "pixel_5"},
+                {"name": "Pixel 4", "id": "pixel_4"},
+                {"name": "Pixel 3", "id": "pixel_3"},
+                {"name": "Pixel 2", "id": "pixel_2"},
+                {"name": "Pixel", "id": "pixel"},
+                {"name": "Nexus 6P", "id": "Nexus_6P"},
+                {"name": "Nexus 6", "id": "Nexus_6"},
+                {"name": "Nexus 5", "id": "Nexus_5"},
+                {"name": "Pixel C", "id": "pixel_c"},
+                {"name": "Nexus 9", "id": "Nexus_9"},
+                {"name": "Nexus 7", "id": "Nexus_7_2013"}
+            ]
+        
+        return devices
 
 class EmulatorConfigDialog(QDialog):
     def __init__(self, parent=None):
@@ -267,6 +296,7 @@ class EmulatorConfigDialog(QDialog):
         # 设备类型
         device_label = QLabel("设备类型:")
         self.device_combo = QComboBox()
+        self.device_combo.currentIndexChanged.connect(self.on_device_changed)
         layout.addRow(device_label, self.device_combo)
         
         # 系统镜像
@@ -329,6 +359,9 @@ class EmulatorConfigDialog(QDialog):
         
         # 添加加载线程属性
         self.load_thread = None
+        
+        # 已加载的设备定义 {设备ID: 设备信息}
+        self.devices = {}
     
     def accept(self):
         """确认按钮点击事件"""
@@ -370,10 +403,33 @@ class EmulatorConfigDialog(QDialog):
     def handle_devices_loaded(self, devices):
         """处理设备列表加载完成"""
         self.device_combo.clear()
+        self.devices = {}
         for device in devices:
             if 'id' in device and 'name' in device:
-                self.device_combo.addItem(device['name'], device['id'])
+                self.devices[device['id']] = device
+                self.device_combo.addItem(self.format_device(device), device['id'])
         self.device_combo.setEnabled(True)
+        self.on_device_changed()
+    
+    @staticmethod
+    def format_device(device):
+        """设备下拉框显示文本，带上屏幕尺寸、分辨率和密度"""
+        details = []
+        if device.get('screen_size'):
+            details.append(f"{device['screen_size']:g}\"")
+        if device.get('width') and device.get('height'):
+            details.append(f"{device['width']}x{device['height']}")
+        if device.get('density'):
+            details.append(f"{device['density']}dpi")
+        if not details:
+            return device['name']
+        return f"{device['name']} ({' '.join(details)})"
+    
+    def on_device_changed(self):
+        """切换设备时使用该设备的默认内存大小"""
+        device = self.devices.get(self.device_combo.currentData())
+        if device and device.get('ram'):
+            self.ram_spin.setValue(max(self.ram_spin.minimum(), min(device['ram'], self.ram_spin.maximum())))
     
     def handle_images_loaded(self, images):
         """处理系统镜像加载完成"""
@@ -461,7 +517,7 @@ class DownloadProgressDialog(QProgressDialog):
 
 class EmulatorListThread(QThread):
     """加载模拟器列表的线程"""
-    finished = pyqtSignal(list, list)  # 发送 (模拟器列表, 运行中的模拟器列表)
+    finished = pyqtSignal(list, list)  # 发送 (模拟器信息列表, 运行中的模拟器列表)
     error = pyqtSignal(str)  # 发送错误信息
     
     def __init__(self):
@@ -475,28 +531,16 @@ class EmulatorListThread(QThread):
                 return
                 
             # 获取模拟器列表
-            result = subprocess.run([EMULATOR_PATH, '-list-avds'], 
-                                 capture_output=True, text=True)
-            emulators = [emu for emu in result.stdout.strip().split('\n') if emu]
+            emulators = avd_inventory.list_avds()
             
             # 如果线程已停止，直接返回
             if not self._is_running:
                 return
                 
-            # 获取正在运行的模拟器
-            ps_result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-            running_processes = ps_result.stdout.strip().split('\n')
-            
-            # 检查每个模拟器是否在运行
-            running_emulators = []
-            for process in running_processes:
-                if 'qemu-system-' in process:
-                    avd_parts = process.split('-avd ')
-                    if len(avd_parts) > 1:
-                        emu_part = avd_parts[1].split(' -')[0]
-                        emu_name = emu_part.strip()
-                        if emu_name in emulators:
-                            running_emulators.append(emu_name)
+            # 获取正在运行的模拟器，模拟器池中的只读实例不算
+            running = {name for name in process_index.running_avds() if emulator_supervisor.find_process(name)}
+            running |= emulator_supervisor.running()
+            running_emulators = [emu['name'] for emu in emulators if emu['name'] in running]
             
             # 如果线程仍在运行，发送结果
             if self._is_running:
@@ -510,6 +554,12 @@ class EmulatorListThread(QThread):
         """停止线程"""
         self._is_running = False
 
+class PoolStopThread(QThread):
+    """退出前关闭模拟器池中的实例"""
+    
+    def run(self):
+        emulator_pool.stop(wait=True)
+
 class EmulatorManager(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -520,6 +570,12 @@ class EmulatorManager(QMainWindow):
         # 添加加载线程属性
         self.load_thread = None
         
+        # 退出前关闭模拟器池的线程
+        self.pool_stop_thread = None
+        
+        # 列表中的模拟器条目 {名称: QListWidgetItem}
+        self.emulator_items = {}
+        
         # 初始化界面
         self.setup_ui()
         
@@ -528,6 +584,41 @@ class EmulatorManager(QMainWindow):
         
         # 刷新模拟器列表
         self.refresh_emulators()
+        
+        # 监听模拟器状态变化
+        self.monitor = AvdMonitor(AVD_HOME, self)
+        self.monitor.state_changed.connect(self.handle_state_changed)
+        self.monitor.start()
+        emulator_supervisor.exited.connect(self.handle_emulator_exited)
+        boot_tracker.booted.connect(self.monitor.report_booted)
+        
+        # 按配置在局域网中共享安装包缓存
+        package_cache.start_sharing()
+        
+        # 按配置在后台维护预先开机的模拟器池
+        if emulator_pool.start():
+            emulator_pool.start_serving()
+    
+    def closeEvent(self, event):
+        """退出时关闭模拟器池中的实例，池中的实例没有窗口，不能留在后台"""
+        if self.pool_stop_thread is None and emulator_pool.status():
+            # 在后台等待实例退出，完成后再次关闭窗口
+            event.ignore()
+            progress = QProgressDialog("正在关闭模拟器池中的实例...", None, 0, 0, self)
+            progress.setWindowTitle("正在退出")
+            progress.setWindowModality(Qt.WindowModality.WindowModal)
+            progress.show()
+            self.pool_stop_thread = PoolStopThread()
+            self.pool_stop_thread.finished.connect(progress.close)
+            self.pool_stop_thread.finished.connect(self.close)
+            self.pool_stop_thread.start()
+            return
+        if self.pool_stop_thread is None:
+            emulator_pool.stop()
+        elif self.pool_stop_thread.isRunning():
+            event.ignore()
+            return
+        super().closeEvent(event)
     
     def setup_ui(self):
         """设置界面"""
@@ -671,6 +762,11 @@ class EmulatorManager(QMainWindow):
         dialog = ImageManagerDialog(self)
         dialog.exec()
     
+    def show_snapshot_dialog(self, emulator_name):
+        """显示快照管理对话框"""
+        dialog = SnapshotDialog(emulator_name, self)
+        dialog.exec()
+    
     def show_config_dialog(self):
         """显示配置对话框"""
         dialog = EmulatorConfigDialog(self)
@@ -694,68 +790,64 @@ class EmulatorManager(QMainWindow):
                     self.toast.showMessage("请先在镜像管理中下载系统镜像")
                     return
                 
-                avdmanager = find_avdmanager()
-                if not avdmanager:
-                    raise Exception("找不到 avdmanager 工具")
-                
-                # 创建模拟器基本命令
-                create_cmd = [
-                    avdmanager, 'create', 'avd',
-                    '-n', name,  # 模拟器名称
-                    '-k', system_image,  # 系统镜像
-                    '-d', device  # 设备类型
-                ]
-
-                # 输出创建命令
-                print("Creating AVD with command:", ' '.join(create_cmd))
+                validate_avd_name(name)
+                hardware = {'hw.ramSize': str(ram)}
+                try:
+                    # 直接生成 AVD 文件，不需要启动 avdmanager
+                    avd_builder.create(name, system_image, device, hardware)
+                except Exception as e:
+                    print(f"直接创建模拟器失败，改用 avdmanager: {str(e)}")
+                    self.create_with_avdmanager(name, system_image, device, hardware)
                 
-                # 执行创建命令
-                process = subprocess.Popen(
-                    create_cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    stdin=subprocess.PIPE,  # 添加标准输入以处理交互
-                    universal_newlines=True
-                )
-                
-                # 某些版本的 avdmanager 会询问是否自定义硬件配置
-                # 我们自动回答"no"以使用默认配置
-                output, _ = process.communicate(input='no\n')
-                
-                if process.returncode != 0:
-                    raise Exception(f"创建失败: {output}")
-                
-                # 配置模拟器
-                config_path = os.path.expanduser(f'~/.android/avd/{name}.avd/config.ini')
-                with open(config_path, 'a') as f:
-                    # 设置内存大小
-                    f.write(f'\nhw.ramSize={ram}')
-                    # 添加其他有用的配置
-                    f.write('\nhw.keyboard=yes')  # 启用物理键盘
-                    f.write('\ndisk.dataPartition.size=2048M')  # 设置数据分区大小
-                    f.write('\nhw.gpu.enabled=yes')  # 启用 GPU 加速
-                    f.write('\nhw.gpu.mode=auto')
-                    f.write('\nhw.audioInput=yes')  # 启用音频输入
-                    f.write('\nhw.audioOutput=yes')  # 启用音频输出
-                    f.write('\nhw.camera.back=webcam0')  # 配置后置摄像头
-                    f.write('\nhw.camera.front=webcam0')  # 配置前置摄像头
-                
-                # 刷新模拟器列表
-                self.refresh_emulators()
-                
-                # 根据开关状态决定是否启动模拟器
+                # 根据开关状态决定是否启动模拟器，列表由状态监视器更新
                 if dialog.start_switch.isChecked():
-                    QTimer.singleShot(1000, lambda: self.start_emulator(name))
+                    self.start_emulator(name)
                 
             except Exception as e:
                 self.toast.showMessage(f"创建模拟器失败：{str(e)}")
 
+    def create_with_avdmanager(self, name, system_image, device, hardware):
+        """使用 avdmanager 创建模拟器"""
+        avdmanager = find_avdmanager()
+        if not avdmanager:
+            raise Exception("找不到 avdmanager 工具")
+        
+        # 创建模拟器基本命令
+        create_cmd = [
+            avdmanager, 'create', 'avd',
+            '-n', name,  # 模拟器名称
+            '-k', system_image,  # 系统镜像
+            '-d', device  # 设备类型
+        ]
+
+        # 输出创建命令
+        print("Creating AVD with command:", ' '.join(create_cmd))
+        
+        # 执行创建命令
+        process = subprocess.Popen(
+            create_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.PIPE,  # 添加标准输入以处理交互
+            universal_newlines=True
+        )
+        
+        # 某些版本的 avdmanager 会询问是否自定义硬件配置
+        # 我们自动回答"no"以使用默认配置
+        output, _ = process.communicate(input='no\n')
+        
+        if process.returncode != 0:
+            raise Exception(f"创建失败: {output}")
+        
+        # 合并硬件配置，已有的配置项直接覆盖
+        config_path = os.path.join(AVD_HOME, f'{name}.avd', 'config.ini')
+        update_config_ini(config_path, {**DEFAULT_HARDWARE, **hardware})
+
     def start_emulator(self, emulator_name):
         """启动指定的模拟器"""
         try:
-            subprocess.Popen([EMULATOR_PATH, '-avd', emulator_name])
+            emulator_supervisor.launch(emulator_name)
             self.toast.showMessage(f"正在启动模拟器：{emulator_name}")
-            QTimer.singleShot(2000, lambda: self.refresh_emulators())
         except Exception as e:
             self.toast.showMessage(f"启动模拟器失败：{str(e)}")
     
@@ -765,6 +857,7 @@ class EmulatorManager(QMainWindow):
             show_loading: 是否显示加载动画，默认为False
         """
         self.emulator_list.clear()
+        self.emulator_items = {}
         
         # 只在需要时显示加载动画
         if show_loading:
@@ -782,11 +875,7 @@ class EmulatorManager(QMainWindow):
         """处理模拟器列表加载完成"""
         try:
             for emu in emulators:
-                status = "（运行中）" if emu in running_emulators else "（未运行）"
-                item = QListWidgetItem(self.emulator_list)
-                item_widget = EmulatorListItem(emu, status, self)
-                item.setSizeHint(item_widget.sizeHint())
-                self.emulator_list.setItemWidget(item, item_widget)
+                self.set_emulator_item(emu['name'], emu['name'] in running_emulators, emu)
             
             # 关闭加载动画
             self.loading.hide()
@@ -799,33 +888,59 @@ class EmulatorManager(QMainWindow):
         # 关闭加载动画
         self.loading.hide()
         self.toast.showMessage(f"获取模拟器列表失败：{error_msg}")
+    
+    def set_emulator_item(self, name, running, info=None):
+        """添加或更新单个模拟器条目，新条目按名称顺序插入"""
+        # 进程已启动但系统还没开机完成时显示为启动中
+        if not running:
+            status = "（未运行）"
+        elif boot_tracker.is_booted(name):
+            status = "（运行中）"
+        else:
+            status = "（启动中）"
+        if info is None:
+            info = avd_inventory.get(name)
+        item = self.emulator_items.get(name)
+        if item is None:
+            row = sum(1 for other in self.emulator_items if other < name)
+            item = QListWidgetItem()
+            self.emulator_list.insertItem(row, item)
+            self.emulator_items[name] = item
+        item_widget = EmulatorListItem(name, status, info, self)
+        item.setSizeHint(item_widget.sizeHint())
+        self.emulator_list.setItemWidget(item, item_widget)
+    
+    def remove_emulator_item(self, name):
+        """移除单个模拟器条目"""
+        item = self.emulator_items.pop(name, None)
+        if item is not None:
+            self.emulator_list.takeItem(self.emulator_list.row(item))
+    
+    def handle_state_changed(self, name, event):
+        """处理状态监视器发出的事件"""
+        if event == AvdMonitor.DELETED:
+            self.remove_emulator_item(name)
+        elif event in (AvdMonitor.STARTED, AvdMonitor.BOOTED):
+            self.set_emulator_item(name, True)
+        else:
+            self.set_emulator_item(name, False)
+
+    def handle_emulator_exited(self, name, returncode):
+        """由本应用启动的模拟器异常退出时显示最后的输出"""
+        if returncode > 0:
+            lines = [line for line in emulator_supervisor.log_tail(name).split('\n') if line.strip()]
+            reason = lines[-1] if lines else f"退出码 {returncode}"
+            self.toast.showMessage(f"模拟器 {name} 异常退出：{reason}")
 
     def stop_emulator(self, emulator_name):
         """关闭指定的模拟器"""
         try:
-            ps_result = subprocess.run(['ps', 'aux'], capture_output=True, text=True)
-            processes = ps_result.stdout.strip().split('\n')
-            
-            target_pid = None
-            for process in processes:
-                if 'qemu-system-' in process:
-                    # 使用完整的 -avd 参数匹配
-                    avd_parts = process.split('-avd ')
-                    if len(avd_parts) > 1:
-                        # 获取模拟器名称（取到下一个参数之前的部分）
-                        emu_part = avd_parts[1].split(' -')[0]  # 获取到下一个参数之前的部分
-                        emu_name = emu_part.strip()  # 移除可能的空格
-                        if emu_name == emulator_name:  # 精确匹配
-                            target_pid = process.split()[1]
-                            break
-            
-            if target_pid:
-                subprocess.run(['kill', target_pid])
+            # 监管器和进程索引都按 -avd 参数精确匹配
+            if emulator_supervisor.stop(emulator_name):
                 self.toast.showMessage(f"正在关闭模拟器：{emulator_name}")
-                QTimer.singleShot(5000, lambda: self.refresh_emulators())
             else:
                 self.toast.showMessage(f"模拟器 {emulator_name} 未在运行")
-                self.refresh_emulators()
+                self.set_emulator_item(emulator_name, False)
             
         except Exception as e:
             self.toast.showMessage(f"关闭模拟器失败：{str(e)}")
@@ -886,8 +1001,8 @@ class EmulatorManager(QMainWindow):
                 if result.returncode != 0:
                     raise Exception(result.stderr or result.stdout)
                 
-                # 删除成功后直接刷新列表，不显示 toast
-                self.refresh_emulators()
+                # 删除成功后由状态监视器更新列表，不显示 toast
+                self.monitor.scan()
                 
             except Exception as e:
                 self.toast.showMessage(f"删除模拟器失败：{str(e)}")
@@ -1,5 +1,7 @@
 import os
-import subprocess
+import json
+import shutil
+import threading
 
 # 在文件开头更新 ANDROID_HOME 的设置
 def find_android_home():
@@ -21,66 +23,170 @@ def find_android_home():
             
     return None
 
-def find_avdmanager():
-    """查找 avdmanager 工具的路径"""
-    # 首先检查环境变量
-    android_home = os.getenv('ANDROID_HOME')
-    if not android_home:
-        # 检查常见的安装路径
-        possible_homes = [
-            os.path.expanduser('~/Library/Android/sdk'),
-            os.path.expanduser('~/Android/Sdk'),
-        ]
-        for home in possible_homes:
-            if os.path.exists(home):
-                android_home = home
-                break
+def find_emulator_home():
+    """查找 .android 目录的路径，<name>.ini 中的 path.rel 相对于该目录"""
+    emulator_home = os.getenv('ANDROID_EMULATOR_HOME')
+    if emulator_home:
+        return emulator_home
     
-    if not android_home:
-        return None
-        
-    # 在 cmdline-tools 目录下查找所有可能的版本目录
-    cmdline_tools = os.path.join(android_home, 'cmdline-tools')
-    if os.path.exists(cmdline_tools):
-        try:
-            # 列出所有子目录
-            all_dirs = [d for d in os.listdir(cmdline_tools) 
-                       if os.path.isdir(os.path.join(cmdline_tools, d))]
-            
-            for dir_name in all_dirs:
-                # 检查每个目录下的 bin/avdmanager
-                path = os.path.join(cmdline_tools, dir_name, 'bin/avdmanager')
-                if os.path.exists(path):
-                    return path
-                
-                # 有些版本可能在 tools/bin 下
-                path = os.path.join(cmdline_tools, dir_name, 'tools/bin/avdmanager')
-                if os.path.exists(path):
-                    return path
-        except Exception as e:
-            print(f"搜索 avdmanager 时出错: {str(e)}")
+    sdk_home = os.getenv('ANDROID_SDK_HOME')
+    if sdk_home:
+        return os.path.join(sdk_home, '.android')
     
-    # 检查旧版本的位置
-    old_paths = [
-        os.path.join(android_home, 'tools/bin/avdmanager'),
-        os.path.join(android_home, 'tools/avdmanager'),
-    ]
-    for path in old_paths:
-        if os.path.exists(path):
-            return path
+    return os.path.expanduser('~/.android')
+
+def find_avd_home():
+    """查找 AVD 目录的路径"""
+    # 与 emulator 的查找顺序保持一致
+    avd_home = os.getenv('ANDROID_AVD_HOME')
+    if avd_home:
+        return avd_home
     
-    # 如果还是找不到，尝试从 PATH 环境变量中查找
+    return os.path.join(find_emulator_home(), 'avd')
+
+def _read_revision(tools_dir):
+    """读取 cmdline-tools 目录中 source.properties 的 Pkg.Revision"""
     try:
-        which_result = subprocess.run(['which', 'avdmanager'], 
-                                    capture_output=True, text=True)
-        if which_result.returncode == 0:
-            return which_result.stdout.strip()
-    except:
+        with open(os.path.join(tools_dir, 'source.properties'), 'r') as f:
+            for line in f:
+                if line.startswith('Pkg.Revision='):
+                    revision = line.split('=', 1)[1].strip().split()[0]
+                    return tuple(int(p) if p.isdigit() else 0 for p in revision.split('.'))
+    except OSError:
         pass
+    return ()
+
+class SdkToolResolver:
+    """SDK 工具路径解析器
+
+    查找 avdmanager、sdkmanager、emulator 和 adb，结果缓存到 SDK 目录
+    或 cmdline-tools 目录发生变化（安装/删除组件）或手动 invalidate() 为止。
+    """
     
-    return None
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._tools = {}
+    
+    def _current_state(self):
+        """SDK 目录和 cmdline-tools 目录的 mtime，用于判断缓存是否失效"""
+        android_home = find_android_home()
+        state = [android_home]
+        if android_home:
+            for path in (android_home, os.path.join(android_home, 'cmdline-tools')):
+                try:
+                    state.append(os.stat(path).st_mtime_ns)
+                except OSError:
+                    state.append(None)
+        return tuple(state)
+    
+    def invalidate(self):
+        """清除缓存，下次调用时重新查找"""
+        with self._lock:
+            self._state = None
+            self._tools = {}
+    
+    def _resolve(self, name):
+        with self._lock:
+            state = self._current_state()
+            if state != self._state:
+                self._state = state
+                self._tools = self._discover(state[0])
+            return self._tools.get(name)
+    
+    def _discover(self, android_home):
+        """查找所有工具的路径"""
+        tools = {}
+        bin_dir = self._find_cmdline_tools_bin(android_home) if android_home else None
+        if bin_dir:
+            tools['avdmanager'] = os.path.join(bin_dir, 'avdmanager')
+            sdkmanager = os.path.join(bin_dir, 'sdkmanager')
+            if os.path.exists(sdkmanager):
+                tools['sdkmanager'] = sdkmanager
+        
+        if android_home:
+            for name, relative in (('emulator', 'emulator/emulator'), ('adb', 'platform-tools/adb')):
+                path = os.path.join(android_home, relative)
+                if os.path.exists(path):
+                    tools[name] = path
+        
+        # 如果还是找不到，尝试从 PATH 环境变量中查找
+        for name in ('avdmanager', 'sdkmanager', 'emulator', 'adb'):
+            if name not in tools:
+                path = shutil.which(name)
+                if path:
+                    tools[name] = path
+        return tools
+    
+    def _find_cmdline_tools_bin(self, android_home):
+        """在 cmdline-tools 中选择版本最新的 bin 目录，版本相同时优先 latest"""
+        candidates = []
+        cmdline_tools = os.path.join(android_home, 'cmdline-tools')
+        if os.path.exists(cmdline_tools):
+            try:
+                for dir_name in sorted(os.listdir(cmdline_tools)):
+                    tools_dir = os.path.join(cmdline_tools, dir_name)
+                    # 有些版本在 tools/bin 下
+                    for bin_dir in (os.path.join(tools_dir, 'bin'), os.path.join(tools_dir, 'tools/bin')):
+                        if os.path.exists(os.path.join(bin_dir, 'avdmanager')):
+                            candidates.append((_read_revision(tools_dir), dir_name == 'latest', dir_name, bin_dir))
+                            break
+            except Exception as e:
+                print(f"搜索 avdmanager 时出错: {str(e)}")
+        if candidates:
+            return max(candidates)[3]
+        
+        # 检查旧版本的位置
+        for bin_dir in (os.path.join(android_home, 'tools/bin'), os.path.join(android_home, 'tools')):
+            if os.path.exists(os.path.join(bin_dir, 'avdmanager')):
+                return bin_dir
+        return None
+    
+    def avdmanager(self):
+        return self._resolve('avdmanager')
+    
+    def sdkmanager(self):
+        return self._resolve('sdkmanager')
+    
+    def emulator(self):
+        return self._resolve('emulator')
+    
+    def adb(self):
+        return self._resolve('adb')
+
+# 全局共享的工具路径解析器
+sdk_tools = SdkToolResolver()
+
+def find_avdmanager():
+    """查找 avdmanager 工具的路径"""
+    return sdk_tools.avdmanager()
+
+def find_sdkmanager():
+    """查找 sdkmanager 工具的路径"""
+    return sdk_tools.sdkmanager()
 
 # 全局常量
 ANDROID_HOME = find_android_home() or os.path.expanduser('~/Library/Android/sdk')
 EMULATOR_PATH = os.path.join(ANDROID_HOME, 'emulator/emulator')
-ADB_PATH = os.path.join(ANDROID_HOME, 'platform-tools/adb') 
\ No newline at end of file
+ADB_PATH = os.path.join(ANDROID_HOME, 'platform-tools/adb')
+AVD_HOME = find_avd_home()
+
+# 应用缓存目录
+CACHE_DIR = os.path.join(os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'idroidsim')
+
+# 应用配置目录
+CONFIG_DIR = os.path.join(os.getenv('XDG_CONFIG_HOME') or os.path.expanduser('~/.config'), 'idroidsim')
+SETTINGS_PATH = os.path.join(CONFIG_DIR, 'settings.json')
+
+def load_settings():
+    """读取用户配置，文件不存在或格式错误时返回空配置"""
+    try:
+        with open(SETTINGS_PATH, 'r') as f:
+            settings = json.load(f)
+        return settings if isinstance(settings, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def get_setting(key, default=None):
+    """获取单个配置项"""
+    return load_settings().get(key, default)